@@ -0,0 +1,63 @@
+"""
+Per-request authentication overhead benchmark.
+
+Authenticates a pool of JWTs repeatedly, as successive requests from the
+same clients would, with the verified-token and user caches disabled and
+enabled. get_user_from_db is given a fixed delay to stand in for a
+Postgres round trip. Reports mean and p99 microseconds per authenticate().
+
+    python -m benchmarks.auth_overhead --tokens 100 --requests 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from jose import jwt
+
+from src.security.auth_manager import AuthManager, UserModel
+
+
+class DbBackedAuth(AuthManager):
+    db_latency = 0.001
+
+    def get_user_from_db(self, username):
+        time.sleep(self.db_latency)
+        return UserModel(username=username)
+
+
+async def run(manager, tokens, requests):
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        await manager.authenticate(tokens[i % len(tokens)])
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1e6
+    return timings.mean(), np.percentile(timings, 99)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--db-latency", type=float, default=0.001)
+    args = parser.parse_args()
+    DbBackedAuth.db_latency = args.db_latency
+
+    exp = int(time.time()) + 3600
+    tokens = [jwt.encode({"sub": f"user{i}", "exp": exp}, AuthManager.SECRET_KEY, algorithm="HS256")
+              for i in range(args.tokens)]
+
+    print(f"{'mode':<22}{'mean us':>10}{'p99 us':>10}")
+    for name, manager in (
+        ("uncached", DbBackedAuth(token_cache_size=0, user_cache_size=0)),
+        ("token cache only", DbBackedAuth(user_cache_size=0)),
+        ("token + user cache", DbBackedAuth()),
+    ):
+        mean, p99 = await run(manager, tokens, args.requests)
+        print(f"{name:<22}{mean:>10.1f}{p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+Cache codec micro-benchmark.
+
+Encodes a realistic analyze_document result with each available
+serializer/compression pair and reports stored size and encode/decode time
+against the legacy json.dumps text encoding.
+
+    python -m benchmarks.cache_codec
+"""
+
+import json
+import random
+import string
+import timeit
+
+from src.utils.cache import CacheCodec
+
+ROUNDS = 200
+
+
+def sample_analysis(pages: int = 40) -> dict:
+    rng = random.Random(7)
+    words = ["account", "holder", "income", "statement", "balance", "transfer",
+             "beneficial", "owner", "source", "funds", "risk", "jurisdiction"]
+
+    def sentence(n):
+        return " ".join(rng.choice(words) for _ in range(n))
+
+    return {
+        "status": "success",
+        "analysis": {
+            "summary": sentence(200),
+            "document_type": "bank_statement",
+            "entities": [
+                {"name": "".join(rng.choices(string.ascii_uppercase, k=8)),
+                 "role": rng.choice(["holder", "beneficiary", "director"]),
+                 "confidence": rng.random()}
+                for _ in range(25)
+            ],
+            "pages": [
+                {"page": i + 1, "text": sentence(300), "flags": [sentence(3)]}
+                for i in range(pages)
+            ],
+            "risk_indicators": {f"indicator_{i}": rng.random() for i in range(30)},
+        },
+    }
+
+
+def main():
+    value = sample_analysis()
+    legacy = json.dumps(value)
+    legacy_encode = timeit.timeit(lambda: json.dumps(value), number=ROUNDS) / ROUNDS
+    legacy_decode = timeit.timeit(lambda: json.loads(legacy), number=ROUNDS) / ROUNDS
+    print(f"{'codec':<18}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    print(f"{'legacy json text':<18}{len(legacy.encode()):>10}"
+          f"{legacy_encode * 1e6:>12.0f}{legacy_decode * 1e6:>12.0f}")
+
+    for serializer in CacheCodec.SERIALIZERS:
+        for compression in CacheCodec.COMPRESSIONS:
+            try:
+                codec = CacheCodec(serializer=serializer, compression=compression)
+                encoded = codec.encode(value)
+            except ValueError:
+                continue  # optional library not installed
+            encode = timeit.timeit(lambda: codec.encode(value), number=ROUNDS) / ROUNDS
+            decode = timeit.timeit(lambda: codec.decode(encoded), number=ROUNDS) / ROUNDS
+            name = f"{serializer}+{compression}"
+            print(f"{name:<18}{len(encoded):>10}{encode * 1e6:>12.0f}{decode * 1e6:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
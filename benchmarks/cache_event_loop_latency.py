@@ -0,0 +1,101 @@
+"""
+Event-loop latency benchmark for CacheManager.
+
+Runs a ticker coroutine that measures how late the event loop wakes it up
+while a batch of concurrent cache round trips is in flight, once with the
+legacy synchronous redis client called from inside coroutines and once with
+the asyncio client.
+
+    python -m benchmarks.cache_event_loop_latency            # fakeredis
+    REDIS_URL=redis://localhost:6379 python -m benchmarks.cache_event_loop_latency
+"""
+
+import asyncio
+import os
+import statistics
+import time
+
+from src.utils.cache import CacheManager, create_fake_client
+
+TICK = 0.001
+REQUESTS = 2000
+CONCURRENCY = 50
+
+
+class LegacySyncCache:
+    """The pre-asyncio CacheManager behaviour: sync client inside async defs"""
+
+    def __init__(self, client):
+        self.redis_client = client
+
+    async def set(self, key, value, ttl=3600):
+        self.redis_client.setex(key, ttl, value)
+
+    async def get(self, key):
+        return self.redis_client.get(key)
+
+
+async def ticker(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(TICK)
+        lags.append(loop.time() - start - TICK)
+
+
+async def run(cache) -> dict:
+    lags = []
+    stop = asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lags, stop))
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(i):
+        async with semaphore:
+            await cache.set(f"bench:{i}", "x" * 512, 60)
+            await cache.get(f"bench:{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+
+    lags.sort()
+    return {
+        "ops_per_sec": 2 * REQUESTS / elapsed,
+        "lag_p50_ms": statistics.median(lags) * 1000 if lags else 0.0,
+        "lag_max_ms": lags[-1] * 1000 if lags else 0.0,
+        "ticks": len(lags),
+    }
+
+
+def build_clients():
+    url = os.getenv("REDIS_URL")
+    if url:
+        import redis
+        import redis.asyncio as aioredis
+
+        return redis.Redis.from_url(url), aioredis.Redis.from_url(url, decode_responses=True)
+
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    return fakeredis.FakeRedis(server=server), create_fake_client(server=server)
+
+
+async def main():
+    sync_client, async_client = build_clients()
+    for name, cache in (
+        ("legacy sync client", LegacySyncCache(sync_client)),
+        ("asyncio client", CacheManager(redis_client=async_client)),
+    ):
+        result = await run(cache)
+        print(
+            f"{name:>20}: {result['ops_per_sec']:>9.0f} ops/s  "
+            f"loop lag p50={result['lag_p50_ms']:.2f}ms max={result['lag_max_ms']:.2f}ms  "
+            f"ticks={result['ticks']}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
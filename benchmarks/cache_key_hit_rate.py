@@ -0,0 +1,61 @@
+"""
+Fleet-wide cache hit-rate benchmark for document analysis keys.
+
+Simulates several replicas sharing one Redis keyspace while clients upload a
+fixed pool of documents under fresh paths. Compares the legacy
+hash(str(request)) key, which is salted per process (PYTHONHASHSEED), with
+the content-addressed key from src.utils.cache_keys.
+
+    python -m benchmarks.cache_key_hit_rate
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+
+from src.utils.cache_keys import document_analysis_key
+
+REPLICAS = 3
+DOCUMENTS = 50
+REQUESTS = 2000
+VERSION = "bench-model:1"
+
+
+def legacy_key(replica_seed: int, request: dict) -> str:
+    # Per-process hash randomisation modelled as a per-replica salt
+    return f"doc_analysis:{hash((replica_seed, str(request)))}"
+
+
+async def main():
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as workdir:
+        contents = [os.urandom(64 * 1024) for _ in range(DOCUMENTS)]
+        legacy_store, content_store = set(), set()
+        legacy_hits = content_hits = 0
+
+        for i in range(REQUESTS):
+            replica = rng.randrange(REPLICAS)
+            doc = rng.randrange(DOCUMENTS)
+            # Every upload lands under a new path, as with real client uploads
+            path = os.path.join(workdir, f"upload-{i}.pdf")
+            with open(path, "wb") as file:
+                file.write(contents[doc])
+            request = {"document_path": path, "extraction_mode": rng.choice(["kyc", "KYC"])}
+
+            key = legacy_key(replica, request)
+            legacy_hits += key in legacy_store
+            legacy_store.add(key)
+
+            key = await document_analysis_key(path, request["extraction_mode"], VERSION)
+            content_hits += key in content_store
+            content_store.add(key)
+            os.unlink(path)
+
+    print(f"replicas={REPLICAS} documents={DOCUMENTS} requests={REQUESTS}")
+    print(f"  legacy hash(str(request)) hit rate: {legacy_hits / REQUESTS:.1%} ({len(legacy_store)} keys)")
+    print(f"  content-addressed key hit rate:     {content_hits / REQUESTS:.1%} ({len(content_store)} keys)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Chat time-to-first-token benchmark, streaming vs waiting for the whole reply.
+
+Serves the stub LLM over real HTTP on localhost (in-process ASGI transport
+buffers whole responses, which would hide streaming), then sends chat
+requests from concurrent clients through the LLM gateway, once with
+complete() and once with stream(). Reports p50/p99 time to first text and
+to the full reply; in the streaming run every --abandon-th client drops
+its stream after the first token, and the number of upstream streams the
+stub saw cancelled is reported.
+
+    python -m benchmarks.chat_streaming --requests 200 --clients 16 --latency 0.3 --token-latency 0.02
+"""
+
+import argparse
+import asyncio
+import socket
+import time
+
+import numpy as np
+import uvicorn
+
+from tests.fixtures.stub_llm_server import create_app
+from src.tools.conversational_assistant import ConversationalOnboardingTool
+from src.utils.llm_gateway import LLMGateway
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(tool, args, streaming):
+    first, full = [], []
+    semaphore = asyncio.Semaphore(args.clients)
+
+    async def one(i):
+        request = {"message": f"Which documents does client {i} need?", "client_id": str(i)}
+        async with semaphore:
+            start = time.perf_counter()
+            if not streaming:
+                await tool.execute(request)
+                first.append(time.perf_counter() - start)
+                full.append(first[-1])
+                return
+            stream = tool.stream(request)
+            try:
+                await stream.__anext__()
+                first.append(time.perf_counter() - start)
+                if args.abandon and i % args.abandon == 0:
+                    return
+                async for _ in stream:
+                    pass
+                full.append(time.perf_counter() - start)
+            finally:
+                await stream.aclose()
+
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    return np.array(first) * 1000, np.array(full) * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--abandon", type=int, default=4)
+    args = parser.parse_args()
+
+    app = create_app(args.latency, token_latency=args.token_latency)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    gateway = LLMGateway(api_key="stub", base_url=f"http://127.0.0.1:{port}", max_concurrency=args.clients)
+    gateway.requests_per_minute = gateway.tokens_per_minute = 1e9
+    tool = ConversationalOnboardingTool(llm=gateway)
+    try:
+        print(f"{'mode':<10}{'first p50':>11}{'first p99':>11}{'full p50':>10}{'full p99':>10}")
+        for name, streaming in (("complete", False), ("stream", True)):
+            first, full = await run(tool, args, streaming)
+            print(f"{name:<10}{np.percentile(first, 50):>11.1f}{np.percentile(first, 99):>11.1f}"
+                  f"{np.percentile(full, 50):>10.1f}{np.percentile(full, 99):>10.1f}")
+        await asyncio.sleep(0.1)
+        print(f"abandoned streams cancelled upstream: {app.state.streams_cancelled}, "
+              f"gateway slots in use: {gateway.stats()['models'][gateway.default_model]['in_flight']}")
+    finally:
+        await gateway.close()
+        server.should_exit = True
+        await serving
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+"""
+Feature-flag evaluation benchmark.
+
+Checks every flag for a pool of users repeatedly, as list_tools and the
+per-route gates do, once by hashing user+feature on every check (the
+previous behaviour) and once through the memoized per-user bitset.
+Reports microseconds per full set of flag checks.
+
+    python -m benchmarks.feature_flags --users 1000 --requests 50000
+"""
+
+import argparse
+import time
+
+from src.utils.feature_flags import FeatureFlags
+
+
+def hashed_checks(flags, user_id):
+    result = {}
+    for feature, percentage in flags.flags.items():
+        if percentage >= 1.0:
+            result[feature] = True
+        elif percentage <= 0.0:
+            result[feature] = False
+        else:
+            result[feature] = flags._hash_user_feature(user_id, feature) < percentage
+    return result
+
+
+def bitset_checks(flags, user_id):
+    bits = flags.evaluate(user_id)
+    return {feature: flags.is_set(bits, feature) for feature in flags.flags}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=50000)
+    args = parser.parse_args()
+
+    users = [f"user{i}" for i in range(args.users)]
+    print(f"{'mode':<16}{'us/request':>12}")
+    for name, check in (("hash per check", hashed_checks), ("bitset", bitset_checks)):
+        flags = FeatureFlags()
+        start = time.perf_counter()
+        for i in range(args.requests):
+            check(flags, users[i % len(users)])
+        elapsed = time.perf_counter() - start
+        print(f"{name:<16}{elapsed / args.requests * 1e6:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
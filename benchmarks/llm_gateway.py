@@ -0,0 +1,103 @@
+"""
+LLM gateway load test against the in-process stub LLM server.
+
+Drives the three GenAI tools (document chunk analysis, risk insights and
+chat) concurrently through one shared gateway, with a latency tail on
+every --slow-every-th stub call: without hedging, with hedging, and with
+hedging plus the LLM response cache (prompts repeat over --distinct
+inputs). Reports per-call p50/p99 latency, throughput, peak provider
+concurrency, the LLM requests actually sent and the gateway's retry and
+hedge counters. No network access needed.
+
+    python -m benchmarks.llm_gateway --calls 600 --clients 16 --slow-every 50 --distinct 150
+"""
+
+import argparse
+import asyncio
+import time
+
+import fakeredis
+import httpx
+import numpy as np
+from anthropic import AsyncAnthropic
+
+from tests.fixtures.stub_llm_server import create_app
+from src.tools.conversational_assistant import ConversationalOnboardingTool
+from src.tools.document_analyzer import DocumentAnalyzerTool
+from src.tools.risk_predictor import RiskPredictorTool
+from src.utils.cache import CacheManager, create_fake_client
+from src.utils.llm_gateway import LLMGateway
+
+
+def stub_gateway(app, hedge_budget, max_concurrency, cache=None):
+    client = AsyncAnthropic(
+        api_key="stub",
+        base_url="http://stub-llm",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub-llm"),
+    )
+    gateway = LLMGateway(client=client, max_concurrency=max_concurrency, hedge_budget=hedge_budget, cache=cache)
+    gateway.requests_per_minute = gateway.tokens_per_minute = 1e9
+    return gateway
+
+
+async def run(args, hedge_budget, cached):
+    app = create_app(args.latency, args.slow_every, args.slow_latency)
+    cache = CacheManager(redis_client=create_fake_client(server=fakeredis.FakeServer())) if cached else None
+    gateway = stub_gateway(app, hedge_budget, args.concurrency, cache)
+    analyzer = DocumentAnalyzerTool(llm=gateway)
+    risk = RiskPredictorTool(llm=gateway)
+    chat = ConversationalOnboardingTool(llm=gateway)
+    calls = [
+        lambda i: analyzer.analyze_chunk({"text": f"Statement {i} for Jane Tan.", "hash": str(i)}, "kyc"),
+        lambda i: risk.get_genai_risk_insights({"client_id": i, "country": "SG", "is_pep": 1}),
+        lambda i: chat.execute({"input_query": f"What documents do I need? ({i})"}),
+    ]
+
+    timings = []
+    # Fewer clients than gateway slots leaves room for hedges, as at normal load
+    semaphore = asyncio.Semaphore(args.clients)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await calls[i % len(calls)](i % args.distinct)
+            timings.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.calls)))
+    elapsed = time.perf_counter() - start
+    timings = np.array(timings) * 1000
+    return {
+        "p50": np.percentile(timings, 50),
+        "p99": np.percentile(timings, 99),
+        "rate": args.calls / elapsed,
+        "peak": app.state.max_in_flight,
+        "sent": len(app.state.calls),
+        **gateway.counters,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=600)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow-every", type=int, default=50)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--hedge-budget", type=float, default=0.1)
+    parser.add_argument("--distinct", type=int, default=150)
+    args = parser.parse_args()
+
+    print(f"{'mode':<18}{'p50 ms':>9}{'p99 ms':>9}{'calls/s':>9}{'peak':>6}{'sent':>6}"
+          f"{'retries':>9}{'hedges':>8}{'won':>6}")
+    for name, budget, cached in (("no hedging", 0.0, False), ("hedging", args.hedge_budget, False),
+                                 ("hedging + cache", args.hedge_budget, True)):
+        r = await run(args, budget, cached)
+        print(f"{name:<18}{r['p50']:>9.1f}{r['p99']:>9.1f}{r['rate']:>9.1f}{r['peak']:>6}{r['sent']:>6}"
+              f"{r['retries']:>9}{r['hedges']:>8}{r['hedge_wins']:>6}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+"""
+Request metrics middleware overhead benchmark.
+
+Drives a FastAPI app's ASGI callable directly (no sockets) with GETs to a
+templated route, once with no metrics middleware, once with the previous
+@app.middleware("http") version labelling by raw URL path, and once with
+MetricsMiddleware. Reports mean and p99 microseconds per request, the
+overhead over the bare app, and how many http_requests_total series each
+variant created for the distinct job ids requested.
+
+    python -m benchmarks.metrics_middleware --requests 20000 --ids 1000
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+from fastapi import FastAPI
+from prometheus_client import CollectorRegistry
+
+from src.monitoring.metrics import MetricsCollector
+from src.monitoring.middleware import MetricsMiddleware
+
+
+def make_app(variant):
+    metrics = MetricsCollector(registry=CollectorRegistry(), max_endpoints=10**6)
+    app = FastAPI()
+
+    if variant == "call_next (raw path)":
+        @app.middleware("http")
+        async def metrics_middleware(request, call_next):
+            start_time = asyncio.get_event_loop().time()
+            response = await call_next(request)
+            metrics.record_request(
+                method=request.method,
+                path=request.url.path,
+                status_code=response.status_code,
+                duration=asyncio.get_event_loop().time() - start_time,
+            )
+            return response
+    elif variant == "pure ASGI (template)":
+        app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get("/mcp/jobs/{job_id}")
+    async def get_job(job_id: str):
+        return {"job_id": job_id, "status": "completed"}
+
+    return app, metrics
+
+
+async def run(app, requests, ids):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    timings = []
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": f"/mcp/jobs/job-{i % ids}",
+            "raw_path": f"/mcp/jobs/job-{i % ids}".encode(), "root_path": "",
+            "query_string": b"", "headers": [(b"host", b"bench")],
+            "client": ("127.0.0.1", 1234), "server": ("bench", 80),
+        }
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings[len(timings) // 10:]) * 1e6  # drop warm-up
+    return timings.mean(), np.percentile(timings, 99)
+
+
+def series_count(metrics):
+    return sum(1 for m in metrics.registry.collect() if m.name == "http_requests"
+               for s in m.samples if s.name.endswith("_total"))
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--ids", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'middleware':<24}{'mean us':>10}{'p99 us':>10}{'overhead us':>13}{'series':>8}")
+    baseline = None
+    for variant in ("none", "call_next (raw path)", "pure ASGI (template)"):
+        app, metrics = make_app(variant)
+        mean, p99 = await run(app, args.requests, args.ids)
+        baseline = mean if baseline is None else baseline
+        print(f"{variant:<24}{mean:>10.1f}{p99:>10.1f}{mean - baseline:>13.1f}{series_count(metrics):>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+"""
+OCR throughput benchmark on a local synthetic scanned corpus.
+
+Renders noisy, slightly rotated "scanned" statement pages as PNGs, then OCRs
+the corpus through OCREngine twice: cold (every page preprocessed) and warm
+(preprocessed images reused from the on-disk cache; the text cache is off so
+tesseract still runs). Requires the tesseract binary.
+
+    python -m benchmarks.ocr_throughput [pages] [concurrency]
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from src.utils.ocr import OCREngine
+
+
+def write_scanned_page(path: str, page: int, rng: random.Random) -> None:
+    image = Image.new("L", (2480, 3508), 240)
+    draw = ImageDraw.Draw(image)
+    for line in range(45):
+        draw.text((150, 150 + line * 70),
+                  f"Page {page} line {line}: balance {rng.randint(100, 99999)} SGD transfer",
+                  fill=30)
+    for _ in range(4000):
+        draw.point((rng.randrange(2480), rng.randrange(3508)), fill=rng.randrange(256))
+    image = image.rotate(rng.uniform(-1.0, 1.0), fillcolor=240).filter(ImageFilter.GaussianBlur(0.8))
+    image.save(path)
+
+
+async def run_pass(engine, paths, digests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(path, digest):
+        async with semaphore:
+            return await engine.ocr_image(path, digest)
+
+    start = time.perf_counter()
+    texts = await asyncio.gather(*(one(p, d) for p, d in zip(paths, digests)))
+    return time.perf_counter() - start, sum(len(t) for t in texts)
+
+
+async def main():
+    if shutil.which("tesseract") is None:
+        print("tesseract is not installed; skipping OCR benchmark")
+        return
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rng = random.Random(3)
+    with tempfile.TemporaryDirectory() as workdir:
+        paths, digests = [], []
+        for page in range(pages):
+            path = os.path.join(workdir, f"scan-{page}.png")
+            write_scanned_page(path, page, rng)
+            paths.append(path)
+            with open(path, "rb") as file:
+                digests.append(hashlib.sha256(file.read()).hexdigest())
+
+        engine = OCREngine(cache_dir=os.path.join(workdir, "cache"), max_queue=pages)
+        try:
+            for label in ("cold", "warm"):
+                elapsed, chars = await run_pass(engine, paths, digests, concurrency)
+                print(f"{label}: {pages / elapsed:6.2f} pages/s  ({chars} chars, "
+                      f"{engine.max_workers} workers, concurrency {concurrency})")
+        finally:
+            engine.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+"""
+PDF extraction benchmark: pages/sec and event-loop lag.
+
+Compares the legacy inline PyPDF2 loop (string concatenation inside a
+coroutine) with PdfExtractionPool on a large synthetic PDF, while a ticker
+coroutine measures how long the event loop is blocked.
+
+    python -m benchmarks.pdf_extraction [pages]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import PyPDF2
+
+from tests.fixtures.synthetic_pdf import write_text_pdf
+from src.utils.pdf_extraction import PdfExtractionPool
+
+TICK = 0.005
+
+
+async def legacy_extract(path: str) -> str:
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        text = ""
+        for page in reader.pages:
+            text += page.extract_text()
+        return text
+
+
+async def measure(name, extract, path, pages):
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            start = loop.time()
+            await asyncio.sleep(TICK)
+            lags.append(loop.time() - start - TICK)
+
+    tick_task = asyncio.create_task(ticker())
+    await asyncio.sleep(TICK * 2)
+    start = time.perf_counter()
+    text = await extract(path)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    print(f"{name:>22}: {pages / elapsed:8.1f} pages/s  {len(text):>9} chars  "
+          f"max loop lag={max(lags) * 1000:8.1f}ms")
+
+
+async def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "statement.pdf")
+        write_text_pdf(path, pages)
+        pool = PdfExtractionPool(max_pages=pages)
+        # Warm the pool so process start-up is not counted
+        await pool.extract_text(path)
+        try:
+            await measure("legacy inline", legacy_extract, path, pages)
+            await measure(f"process pool x{pool.max_workers}", pool.extract_text, path, pages)
+        finally:
+            pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+"""
+Risk model inference latency benchmark.
+
+Trains a RandomForest on synthetic client profiles through the serving
+feature schema, flattens it with export_forest, and compares sklearn's
+predict_proba against the flat-array engine at several batch sizes.
+Reports p50/p99 latency per call in milliseconds.
+
+    python -m benchmarks.risk_inference --trees 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from benchmarks.risk_features import synthetic_profiles
+from src.tools.risk_predictor import RISK_FEATURE_SCHEMA
+from src.utils.tree_ensemble import export_forest
+
+BATCH_SIZES = (1, 8, 64, 512)
+
+
+def latencies(fn, X, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(X)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    profiles = synthetic_profiles(20000)
+    X = RISK_FEATURE_SCHEMA.transform(profiles)
+    y = np.array([
+        int(p["is_pep"] or p["sanctions_match"] or p["industry"] in ("crypto", "gambling")
+            and p["transaction_volume_30d"] > 50000)
+        for p in profiles
+    ])
+    model = RandomForestClassifier(n_estimators=args.trees, random_state=0, n_jobs=1).fit(X, y)
+    start = time.perf_counter()
+    forest = export_forest(model)
+    print(f"{args.trees} trees, {len(forest.feature)} nodes, exported in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+    X_test = RISK_FEATURE_SCHEMA.transform(synthetic_profiles(max(BATCH_SIZES), seed=1))
+    assert np.allclose(forest.predict_proba(X_test), model.predict_proba(X_test), atol=1e-12)
+
+    print(f"{'batch':>6}{'sklearn p50':>13}{'p99':>9}{'flat p50':>11}{'p99':>9}")
+    for batch in BATCH_SIZES:
+        rows = X_test[:batch]
+        repeats = max(10, args.repeats // batch)
+        sk50, sk99 = latencies(model.predict_proba, rows, repeats)
+        fl50, fl99 = latencies(forest.predict_proba, rows, repeats)
+        print(f"{batch:>6}{sk50:>13.2f}{sk99:>9.2f}{fl50:>11.2f}{fl99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
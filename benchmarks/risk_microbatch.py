@@ -0,0 +1,69 @@
+"""
+Risk scoring micro-batching benchmark.
+
+Trains a RandomForest on synthetic profiles, then fires single-row scoring
+requests at several concurrency levels, once calling predict_proba per
+request (in a worker thread, as an async server would) and once through
+MicroBatcher. Reports p50/p99 latency and rows/sec.
+
+    python -m benchmarks.risk_microbatch
+"""
+
+import asyncio
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from src.utils.micro_batcher import MicroBatcher
+
+FEATURES = 24
+REQUESTS = 2000
+CONCURRENCY_LEVELS = (1, 8, 32, 128)
+
+
+def train_model() -> RandomForestClassifier:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5000, FEATURES)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0.5).astype(int)
+    return RandomForestClassifier(n_estimators=100, max_depth=12, n_jobs=1, random_state=0).fit(X, y)
+
+
+async def run(score, rows, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(row):
+        async with semaphore:
+            start = time.perf_counter()
+            await score(row)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(row) for row in rows))
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), len(rows) / elapsed
+
+
+async def main():
+    model = train_model()
+    rows = np.random.default_rng(1).normal(size=(REQUESTS, FEATURES)).astype(np.float32).tolist()
+
+    def predict(matrix):
+        return model.predict_proba(matrix)[:, 1]
+
+    async def per_request(row):
+        return await asyncio.to_thread(predict, np.asarray([row], dtype=np.float32))
+
+    batcher = MicroBatcher(predict, max_batch_size=64, max_wait=0.002)
+    print(f"{'mode':<14}{'concurrency':>12}{'p50 ms':>10}{'p99 ms':>10}{'rows/s':>10}")
+    for concurrency in CONCURRENCY_LEVELS:
+        for name, score in (("per-request", per_request), ("micro-batch", batcher.submit)):
+            p50, p99, throughput = await run(score, rows, concurrency)
+            print(f"{name:<14}{concurrency:>12}{p50:>10.2f}{p99:>10.2f}{throughput:>10.0f}")
+    await batcher.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Risk model registry startup and memory benchmark.
+
+Publishes a RandomForest and its compiled FlatForest to a temporary
+registry, then starts several worker processes that each load one of them
+(memory-mapped and fully read) and stay alive together, so PSS shows how
+much of each worker's memory is shared. Reports load time and RSS/PSS/USS per worker in MB. Linux only,
+as the figures come from /proc/self/smaps_rollup.
+
+    python -m benchmarks.risk_model_memory --workers 4 --trees 300
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from src.utils.model_registry import COMPILED_DIR, ModelRegistry
+from src.utils.tree_ensemble import NODE_ARRAYS, FlatForest, export_forest
+
+
+def memory_mb():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[0].endswith(':'):
+                fields[parts[0][:-1]] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "uss": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def worker(root, target, mmap_mode, loaded, release, results):
+    import sklearn.ensemble  # noqa: F401  (keep import cost out of the load time)
+
+    baseline = memory_mb()
+    start = time.perf_counter()
+    if target == "forest":
+        forest = FlatForest.load(os.path.join(root, "bench", COMPILED_DIR),
+                                 mmap_mode=mmap_mode or None)
+        load_time = time.perf_counter() - start
+        # Read every node array so lazily mapped pages are resident
+        for name in NODE_ARRAYS:
+            getattr(forest, name).sum()
+    else:
+        registry = ModelRegistry(root=root, mmap_mode=mmap_mode)
+        registry.refresh()
+        load_time = time.perf_counter() - start
+        # Touch every tree so lazily mapped pages are resident
+        registry.active.model.predict_proba(
+            np.zeros((1, registry.active.model.n_features_in_)))
+    loaded.wait()
+    after = memory_mb()
+    results.put({"load": load_time, **{k: after[k] - baseline[k] for k in after}})
+    release.wait()
+
+
+def run(root, target, mmap_mode, workers):
+    ctx = multiprocessing.get_context('spawn')
+    loaded, release, results = ctx.Barrier(workers), ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=worker,
+                         args=(root, target, mmap_mode, loaded, release, results))
+             for _ in range(workers)]
+    for proc in procs:
+        proc.start()
+    rows = [results.get(timeout=300) for _ in procs]
+    release.set()
+    for proc in procs:
+        proc.join()
+    return {key: float(np.mean([row[key] for row in rows])) for key in rows[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--trees", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20000, 93)).astype(np.float32)
+    y = (X[:, 0] + X[:, 1] * X[:, 2] > 0.5).astype(int)
+    model = RandomForestClassifier(n_estimators=args.trees, random_state=0, n_jobs=-1).fit(X, y)
+
+    with tempfile.TemporaryDirectory() as root:
+        ModelRegistry(root=root).publish(model, version="bench",
+                                         compiled=export_forest(model))
+        print(f"{args.workers} workers, {args.trees} trees")
+        print(f"{'load':<16}{'load s':>10}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}")
+        for target in ("model", "forest"):
+            for name, mode in (("read", ""), ("mmap", "r")):
+                stats = run(root, target, mode, args.workers)
+                print(f"{target + ' ' + name:<16}{stats['load']:>10.3f}"
+                      f"{stats['rss']:>10.1f}{stats['pss']:>10.1f}{stats['uss']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
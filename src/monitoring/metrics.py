@@ -1,49 +1,230 @@
-import asyncio
-from typing import Dict, Any
-from prometheus_client import Counter, Histogram, Gauge, generate_latest
+import os
+from typing import Dict, Any, Optional, Tuple
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    Gauge,
+    generate_latest,
+)
+
+from .windows import SlidingWindowStats
+
+HTTP_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# Endpoint label once METRICS_MAX_ENDPOINTS distinct endpoints have been seen
+OVERFLOW_LABEL = "other"
+
+# From cached lookups and risk scoring (ms) to multi-chunk LLM analysis (minutes)
+REQUEST_DURATION_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+)
+
 
 class MetricsCollector:
-    def __init__(self):
+    def __init__(
+        self,
+        registry: CollectorRegistry = REGISTRY,
+        max_endpoints: Optional[int] = None,
+    ):
+        self.registry = registry
         # Initialize Prometheus metrics
-        self.document_processed = Counter('documents_processed_total', 'Total documents processed')
-        self.compliance_check = Counter('compliance_checks_total', 'Total compliance checks')
-        self.risk_prediction = Counter('risk_predictions_total', 'Total risk predictions')
-        self.chat_interaction = Counter('chat_interactions_total', 'Total chat interactions')
-        
-        self.processing_time = Histogram('processing_duration_seconds', 'Time to process requests')
-        self.active_sessions = Gauge('active_onboarding_sessions', 'Currently active sessions')
-        
-        # Request metrics
-        self.request_counter = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status_code'])
-        self.request_duration = Histogram('http_request_duration_seconds', 'Request duration')
-
-    def record_request(self, method: str, path: str, status_code: int, duration: float):
-        """Record HTTP request metrics"""
-        self.request_counter.labels(method=method, endpoint=path, status_code=str(status_code)).inc()
-        self.request_duration.observe(duration)
+        self.document_processed = Counter(
+            "documents_processed_total", "Total documents processed", registry=registry
+        )
+        self.compliance_check = Counter(
+            "compliance_checks_total", "Total compliance checks", registry=registry
+        )
+        self.risk_prediction = Counter(
+            "risk_predictions_total", "Total risk predictions", registry=registry
+        )
+        self.chat_interaction = Counter(
+            "chat_interactions_total", "Total chat interactions", registry=registry
+        )
+
+        self.processing_time = Histogram(
+            "processing_duration_seconds", "Time to process requests", registry=registry
+        )
+        self.active_sessions = Gauge(
+            "active_onboarding_sessions", "Currently active sessions", registry=registry
+        )
+
+        # Request metrics by route template and tool, so the series count stays bounded
+        self.request_counter = Counter(
+            "http_requests_total",
+            "Total HTTP requests",
+            ["method", "endpoint", "status_code"],
+            registry=registry,
+        )
+        self.request_duration = Histogram(
+            "http_request_duration_seconds",
+            "Request duration by tool",
+            ["tool"],
+            buckets=REQUEST_DURATION_BUCKETS,
+            registry=registry,
+        )
+        self.max_endpoints = max_endpoints or int(
+            os.getenv("METRICS_MAX_ENDPOINTS", "100")
+        )
+        self._endpoints: set = set()
+        # Labelled children are looked up once per label set, not on every request
+        self._request_series: Dict[Tuple[str, str, int], Any] = {}
+        self._duration_series: Dict[str, Any] = {}
+        # Rolling per-tool latency, throughput and error rate for the dashboard
+        self.windows = SlidingWindowStats()
+
+        # Cache metrics, labelled by tier ('l1' in-process, 'redis')
+        self.cache_hits = Counter(
+            "cache_hits_total", "Cache hits", ["tier"], registry=registry
+        )
+        self.cache_misses = Counter(
+            "cache_misses_total", "Cache misses", ["tier"], registry=registry
+        )
+        self.cache_evictions = Counter(
+            "cache_evictions_total", "Cache evictions", ["tier"], registry=registry
+        )
+        self._cache_counters = {
+            "hit": self.cache_hits,
+            "miss": self.cache_misses,
+            "eviction": self.cache_evictions,
+        }
+
+        # Streamed responses: latency to the client's first token, and how streams end
+        self.time_to_first_token = Histogram(
+            "time_to_first_token_seconds",
+            "Time from request to first streamed token",
+            ["tool"],
+            buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0, 10.0),
+            registry=registry,
+        )
+        self.streams = Counter(
+            "streamed_responses_total",
+            "Streamed responses by outcome",
+            ["tool", "outcome"],
+            registry=registry,
+        )
+
+        # LLM response cache, labelled by calling tool
+        self.llm_cache_requests = Counter(
+            "llm_cache_requests_total",
+            "LLM response cache lookups",
+            ["tool", "result"],
+            registry=registry,
+        )
+        self.llm_tokens_saved = Counter(
+            "llm_cache_tokens_saved_total",
+            "LLM tokens not spent thanks to cache hits",
+            ["tool", "kind"],
+            registry=registry,
+        )
+
+    def record_time_to_first_token(self, tool: str, seconds: float):
+        """Record how long a streamed response took to send its first token"""
+        self.time_to_first_token.labels(tool=tool).observe(seconds)
+
+    def record_stream(self, tool: str, outcome: str):
+        """Record how a stream ended: completed, disconnected, stalled or error"""
+        self.streams.labels(tool=tool, outcome=outcome).inc()
+
+    def record_request(
+        self,
+        method: str,
+        path: str,
+        status_code: int,
+        duration: float,
+        tool: str = "none",
+    ):
+        """Record HTTP request metrics; path is a route template, not a raw URL"""
+        if method not in HTTP_METHODS:
+            # Normalised before the memo lookup so arbitrary methods cannot grow it
+            method = "OTHER"
+        key = (method, path, status_code)
+        counter = self._request_series.get(key)
+        if counter is None:
+            counter = self._request_child(method, path, status_code)
+        counter.inc()
+
+        histogram = self._duration_series.get(tool)
+        if histogram is None:
+            if len(self._duration_series) >= self.max_endpoints:
+                tool = OVERFLOW_LABEL
+            histogram = self._duration_series.get(tool)
+            if histogram is None:
+                histogram = self._duration_series[tool] = self.request_duration.labels(
+                    tool=tool
+                )
+        histogram.observe(duration)
+        self.windows.record(tool, duration, status_code)
+
+    def _request_child(self, method: str, path: str, status_code: int):
+        key = (method, path, status_code)
+        if path not in self._endpoints:
+            if len(self._endpoints) >= self.max_endpoints:
+                # Past the cap, new endpoints share one series and are not memoized
+                return self.request_counter.labels(
+                    method=method, endpoint=OVERFLOW_LABEL, status_code=str(status_code)
+                )
+            self._endpoints.add(path)
+        child = self.request_counter.labels(
+            method=method, endpoint=path, status_code=str(status_code)
+        )
+        self._request_series[key] = child
+        return child
+
+    def record_cache_event(self, tier: str, event: str):
+        """Record a cache hit, miss or eviction for a cache tier"""
+        self._cache_counters[event].labels(tier=tier).inc()
+
+    def record_llm_cache(
+        self, tool: str, result: str, input_tokens: int = 0, output_tokens: int = 0
+    ):
+        """Record an LLM cache lookup result; hits also count the tokens they saved"""
+        self.llm_cache_requests.labels(tool=tool, result=result).inc()
+        if result == "hit":
+            self.llm_tokens_saved.labels(tool=tool, kind="input").inc(input_tokens)
+            self.llm_tokens_saved.labels(tool=tool, kind="output").inc(output_tokens)
 
     def get_metrics(self) -> str:
         """Get Prometheus metrics in text format"""
-        return generate_latest()
+        return generate_latest(self.registry)
 
     async def get_dashboard_data(self) -> Dict[str, Any]:
         """Get dashboard data for monitoring"""
         return {
-            "documents_processed": self.document_processed._value.get(),
-            "compliance_checks": self.compliance_check._value.get(),
-            "risk_predictions": self.risk_prediction._value.get(),
-            "chat_interactions": self.chat_interaction._value.get(),
-            "active_sessions": self.active_sessions._value.get(),
+            "documents_processed": self._current(self.document_processed),
+            "compliance_checks": self._current(self.compliance_check),
+            "risk_predictions": self._current(self.risk_prediction),
+            "chat_interactions": self._current(self.chat_interaction),
+            "active_sessions": self._current(self.active_sessions),
             "avg_processing_time": self.get_avg_processing_time(),
-            "success_rate": self.get_success_rate()
+            "success_rate": self.get_success_rate(),
+            "requests": self.windows.snapshot(),
         }
 
-    def get_avg_processing_time(self) -> float:
-        """Calculate average processing time"""
-        # This would typically be calculated from the histogram
-        return 1.5  # placeholder
+    @staticmethod
+    def _current(metric) -> float:
+        """Value of an unlabelled counter or gauge"""
+        return metric.collect()[0].samples[0].value
+
+    def get_avg_processing_time(self, window: str = "5m") -> Optional[float]:
+        """Mean request duration in seconds over the window, None without traffic"""
+        return self.windows.stats("all", window)["mean"]
 
-    def get_success_rate(self) -> float:
-        """Calculate success rate"""
-        # This would be calculated from request metrics
-        return 0.99  # placeholder
+    def get_success_rate(self, window: str = "5m") -> Optional[float]:
+        """Share of requests in the window without a 5xx, None without traffic"""
+        stats = self.windows.stats("all", window)
+        return 1.0 - stats["error_rate"] if stats["requests"] else None
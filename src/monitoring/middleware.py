@@ -0,0 +1,65 @@
+import time
+from typing import Dict, Optional, Tuple
+
+TOOL_PREFIX = "/mcp/tools/"
+
+# Endpoint label for requests that matched no route (404s, scanners probing random URLs)
+UNMATCHED_ENDPOINT = "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request count and latency.
+
+    Requests are labelled with the matched route's path template
+    ("/mcp/jobs/{job_id}", never the raw URL) and with the tool name taken
+    from "/mcp/tools/<tool>/...", so the number of series is fixed by the
+    routes the app declares. Unlike @app.middleware("http") it does not
+    wrap the request and response in extra objects and tasks; it only
+    watches send for the status code. The duration covers the whole
+    response, including streamed bodies.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+        self._labels: Dict[Optional[str], Tuple[str, str]] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            endpoint, tool = self.labels_for(getattr(scope.get("route"), "path", None))
+            self.metrics.record_request(
+                method=scope["method"],
+                path=endpoint,
+                status_code=status_code,
+                duration=time.perf_counter() - started,
+                tool=tool,
+            )
+
+    def labels_for(self, template: Optional[str]) -> Tuple[str, str]:
+        """(endpoint, tool) labels for a route template, computed once per template"""
+        labels = self._labels.get(template)
+        if labels is None:
+            if template is None:
+                labels = (UNMATCHED_ENDPOINT, "none")
+            elif template.startswith(TOOL_PREFIX):
+                labels = (template, template.removeprefix(TOOL_PREFIX).split("/", 1)[0])
+            else:
+                labels = (template, "none")
+            self._labels[template] = labels
+        return labels
@@ -0,0 +1,159 @@
+import math
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# Latency bins grow geometrically, so a quantile read from a bin is within
+# (GAMMA - 1) / (GAMMA + 1) ~ 2.4% of the true value, from 1 ms to hours
+LATENCY_GAMMA = 1.05
+LATENCY_MIN = 0.001
+_LOG_GAMMA = math.log(LATENCY_GAMMA)
+
+# name -> (span, slot width) in seconds; each window is its own ring so a
+# request touches one slot per window however long the window is
+DEFAULT_WINDOWS = {
+    "1m": (60, 1),
+    "5m": (300, 10),
+    "1h": (3600, 60),
+}
+
+QUANTILES = {"p50": 0.5, "p95": 0.95, "p99": 0.99}
+
+
+def latency_bin(seconds: float) -> int:
+    if seconds <= LATENCY_MIN:
+        return 0
+    return math.ceil(math.log(seconds / LATENCY_MIN) / _LOG_GAMMA)
+
+
+def bin_value(index: int) -> float:
+    """Representative latency of a bin, its geometric midpoint"""
+    if index == 0:
+        return LATENCY_MIN
+    return LATENCY_MIN * 2 * LATENCY_GAMMA**index / (LATENCY_GAMMA + 1)
+
+
+class _Slot:
+    __slots__ = ("epoch", "count", "errors", "total", "bins")
+
+    def __init__(self):
+        self.epoch = -1
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.bins: Dict[int, int] = {}
+
+
+class RollingWindow:
+    """Ring of fixed-width time slots covering the last span seconds.
+
+    A slot is reset lazily when the ring wraps onto it, so there is no
+    timer and record() is a handful of increments.
+    """
+
+    def __init__(self, span: int, width: int):
+        self.span = span
+        self.width = width
+        self.slots = [_Slot() for _ in range(max(1, span // width))]
+
+    def record(self, now: float, duration: float, error: bool, index: int) -> None:
+        epoch = int(now // self.width)
+        slot = self.slots[epoch % len(self.slots)]
+        if slot.epoch != epoch:
+            slot.epoch = epoch
+            slot.count = slot.errors = 0
+            slot.total = 0.0
+            slot.bins = {}
+        slot.count += 1
+        slot.errors += error
+        slot.total += duration
+        slot.bins[index] = slot.bins.get(index, 0) + 1
+
+    def live_slots(self, now: float) -> List[_Slot]:
+        oldest = int(now // self.width) - len(self.slots)
+        return [slot for slot in self.slots if slot.epoch > oldest]
+
+
+def summarize(slots: List[_Slot], elapsed: float) -> Dict[str, Any]:
+    """Count, throughput (requests/s), error rate, mean and quantile latencies (s)"""
+    count = sum(slot.count for slot in slots)
+    stats: Dict[str, Any] = {
+        "requests": count,
+        "throughput": count / elapsed if elapsed > 0 else 0.0,
+        "error_rate": sum(slot.errors for slot in slots) / count if count else 0.0,
+        "mean": sum(slot.total for slot in slots) / count if count else None,
+    }
+    merged: Dict[int, int] = {}
+    for slot in slots:
+        for index, n in slot.bins.items():
+            merged[index] = merged.get(index, 0) + n
+    ordered = sorted(merged.items())
+    for name, q in QUANTILES.items():
+        stats[name] = None
+        if not count:
+            continue
+        rank = max(1, math.ceil(q * count))
+        seen = 0
+        for index, n in ordered:
+            seen += n
+            if seen >= rank:
+                stats[name] = bin_value(index)
+                break
+    return stats
+
+
+class SlidingWindowStats:
+    """Per-tool request latency, throughput and error rate over rolling windows.
+
+    Every request is added to its tool's rings and to the "all" rings, one
+    slot per window, so the cost per request does not depend on traffic or
+    window length. Latencies go into log-spaced bins, which makes
+    quantiles mergeable across slots with bounded relative error. Errors
+    are responses with a 5xx status.
+    """
+
+    def __init__(
+        self,
+        windows: Optional[Dict[str, tuple]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.windows = windows or DEFAULT_WINDOWS
+        self.clock = clock
+        self.started = clock()
+        self._tools: Dict[str, Dict[str, RollingWindow]] = {}
+        self._targets: Dict[str, List[RollingWindow]] = {}
+
+    def _rings(self, tool: str) -> List[RollingWindow]:
+        rings = self._tools.get(tool)
+        if rings is None:
+            rings = self._tools[tool] = {
+                name: RollingWindow(span, width)
+                for name, (span, width) in self.windows.items()
+            }
+            # The tool's rings and the "all" rings, flattened for record()
+            self._targets[tool] = list(rings.values()) + (
+                [] if tool == "all" else self._rings("all")
+            )
+        return self._targets[tool]
+
+    def record(self, tool: str, duration: float, status_code: int) -> None:
+        rings = self._targets.get(tool) or self._rings(tool)
+        now = self.clock()
+        error = status_code >= 500
+        index = latency_bin(duration)
+        for ring in rings:
+            ring.record(now, duration, error, index)
+
+    def stats(self, tool: str = "all", window: str = "5m") -> Dict[str, Any]:
+        now = self.clock()
+        span = self.windows[window][0]
+        elapsed = min(span, now - self.started)
+        rings = self._tools.get(tool)
+        slots = rings[window].live_slots(now) if rings else []
+        return summarize(slots, elapsed)
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """{window: {tool: stats}} for every tool seen, "all" included"""
+        return {
+            window: {tool: self.stats(tool, window) for tool in sorted(self._tools)}
+            for window in self.windows
+        }
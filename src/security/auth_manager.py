@@ -1,17 +1,93 @@
+import asyncio
+import hashlib
+import logging
 import os
-from typing import Optional
+import time
+from typing import Any, Dict, Optional
 from fastapi import HTTPException
 from jose import JWTError, jwt
 from pydantic import BaseModel
 
+from ..utils.cache import LocalCache, subscribe_forever
+
+logger = logging.getLogger(__name__)
+
+DENYLIST_PREFIX = "auth:revoked:"
+REVOCATION_CHANNEL = "auth:revoked"
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 class AuthManager:
+    """JWT authentication with verified-token and user caches.
+
+    A verified token's claims are cached by token digest until the
+    token's exp (capped at AUTH_TOKEN_CACHE_TTL), so repeat requests skip
+    signature verification. Users are cached for AUTH_USER_CACHE_TTL and
+    concurrent misses for the same user share one database load.
+    Revocation writes the digest to a Redis deny-list, checked whenever a
+    token is verified, and is broadcast so every replica drops it from
+    its token cache straight away.
+    """
+
     SECRET_KEY = os.getenv("JWT_SECRET_KEY", "default_secret")
     ALGORITHM = "HS256"
 
     class TokenData(BaseModel):
         username: Optional[str] = None
 
+    def __init__(
+        self,
+        redis_client=None,
+        token_cache_size: Optional[int] = None,
+        token_cache_ttl: Optional[float] = None,
+        user_cache_size: Optional[int] = None,
+        user_cache_ttl: Optional[float] = None,
+    ):
+        self.redis_client = redis_client
+        self.token_cache = LocalCache(
+            max_entries=(
+                token_cache_size
+                if token_cache_size is not None
+                else int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+            ),
+            ttl=token_cache_ttl or float(os.getenv("AUTH_TOKEN_CACHE_TTL", "300")),
+        )
+        self.user_cache = LocalCache(
+            max_entries=(
+                user_cache_size
+                if user_cache_size is not None
+                else int(os.getenv("AUTH_USER_CACHE_SIZE", "10000"))
+            ),
+            ttl=user_cache_ttl or float(os.getenv("AUTH_USER_CACHE_TTL", "30")),
+        )
+        self._user_loads: Dict[str, asyncio.Future] = {}
+        self._listener_task: Optional[asyncio.Task] = None
+
     async def authenticate(self, token: str) -> "UserModel":
+        digest = token_digest(token)
+        found, claims = self.token_cache.get(digest)
+        if not found:
+            claims = self.verify_token(token)
+            if await self.is_revoked(digest):
+                raise self.credentials_exception()
+            ttl = (
+                claims["exp"] - time.time()
+                if claims.get("exp") is not None
+                else self.token_cache.ttl
+            )
+            if ttl > 0:
+                self.token_cache.set(digest, claims, ttl)
+
+        user = await self.get_user(claims["sub"])
+        if user is None:
+            raise self.credentials_exception()
+        return user
+
+    def verify_token(self, token: str) -> Dict[str, Any]:
+        """Decode and verify a JWT, returning the claims the server relies on"""
         try:
             payload = jwt.decode(token, self.SECRET_KEY, algorithms=[self.ALGORITHM])
             username: str = payload.get("sub")
@@ -20,11 +96,7 @@ class AuthManager:
             token_data = self.TokenData(username=username)
         except JWTError:
             raise self.credentials_exception()
-
-        user = self.get_user_from_db(username=token_data.username)
-        if user is None:
-            raise self.credentials_exception()
-        return user
+        return {"sub": token_data.username, "exp": payload.get("exp")}
 
     def credentials_exception(self) -> HTTPException:
         return HTTPException(
@@ -33,11 +105,104 @@ class AuthManager:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    async def is_revoked(self, digest: str) -> bool:
+        if self.redis_client is None:
+            return False
+        try:
+            return bool(await self.redis_client.exists(f"{DENYLIST_PREFIX}{digest}"))
+        except Exception as e:
+            # Fail closed: a token we cannot check against the deny-list is not accepted
+            logger.error(f"Token deny-list lookup failed: {e}")
+            raise HTTPException(
+                status_code=503, detail="Authentication temporarily unavailable"
+            )
+
+    async def revoke(self, token: str) -> None:
+        """Deny a token until it expires, on every replica"""
+        digest = token_digest(token)
+        self.token_cache.delete(digest)
+        if self.redis_client is None:
+            return
+        try:
+            exp = jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            exp = None
+        ttl = int(exp - time.time()) + 1 if exp else int(self.token_cache.ttl) + 1
+        if ttl <= 0:
+            return
+        await self.redis_client.set(f"{DENYLIST_PREFIX}{digest}", 1, ex=ttl)
+        await self.redis_client.publish(REVOCATION_CHANNEL, digest)
+
+    async def get_user(self, username: str) -> Optional["UserModel"]:
+        """Cached user lookup; concurrent misses share one load"""
+        found, user = self.user_cache.get(username)
+        if found:
+            return user
+
+        pending = self._user_loads.get(username)
+        if pending is None:
+            # Load in a task of its own so cancelling one caller does not fail the rest
+            pending = asyncio.ensure_future(self._load_user(username))
+            self._user_loads[username] = pending
+            pending.add_done_callback(lambda task: self._finish_load(username, task))
+        return await asyncio.shield(pending)
+
+    async def _load_user(self, username: str) -> Optional["UserModel"]:
+        user = await asyncio.to_thread(self.get_user_from_db, username=username)
+        if user is not None:
+            self.user_cache.set(username, user)
+        return user
+
+    def _finish_load(self, username: str, task: asyncio.Future) -> None:
+        if self._user_loads.get(username) is task:
+            del self._user_loads[username]
+        if not task.cancelled():
+            # Mark it retrieved so a failure nobody awaited is not logged
+            task.exception()
+
+    def invalidate_user(self, username: str) -> None:
+        self.user_cache.delete(username)
 
     def get_user_from_db(self, username: str) -> Optional["UserModel"]:
         # Example: query user from database
         return UserModel(username=username)
 
+    def start_revocation_listener(self) -> None:
+        """Subscribe to revocations from other replicas in a background task"""
+        if self.redis_client is None:
+            return
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_for_revocations())
+
+    async def _listen_for_revocations(self) -> None:
+        await subscribe_forever(
+            self.redis_client,
+            REVOCATION_CHANNEL,
+            self._apply_revocation,
+            on_subscribed=self._on_revocations_subscribed,
+            name="Token revocation",
+        )
+
+    def _apply_revocation(self, data) -> None:
+        self.token_cache.delete(data.decode() if isinstance(data, bytes) else data)
+
+    def _on_revocations_subscribed(self, reconnected: bool) -> None:
+        if reconnected:
+            # Revocations may have been missed while disconnected
+            self.token_cache.clear()
+
+    async def close(self) -> None:
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
+
 class UserModel:
     def __init__(self, username: str):
         self.username = username
+        # Feature flag rollouts are keyed by user.id
+        self.id = username
@@ -5,12 +5,14 @@ Production-ready server for financial services onboarding automation
 
 import os
 import asyncio
+import json
 import logging
-from typing import Dict, Any, List, Optional
-from contextlib import asynccontextmanager
+import time
+from typing import Dict, Any
 
 from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
@@ -23,15 +25,26 @@ from .tools.conversational_assistant import ConversationalOnboardingTool
 from .security.auth_manager import AuthManager
 from .security.input_validator import InputValidator
 from .monitoring.metrics import MetricsCollector
-from .utils.cache import CacheManager
+from .monitoring.middleware import MetricsMiddleware
+from .utils.batch_jobs import BatchJobManager
+from .utils.cache import CacheManager, close_shared_pools
+from .utils.cache_keys import document_analysis_key, document_analysis_namespace
+from .utils.chat_sessions import ChatSessionStore
 from .utils.database import DatabaseManager
 from .utils.feature_flags import FeatureFlags
+from .utils.llm_gateway import close_shared_gateway, get_shared_gateway
+from .utils.ocr import OCRQueueFullError
+from .utils.streaming import STREAM_MEDIA_TYPES, StreamStalled, encode_event, relay
 from .agents.multi_agent_system import MultiAgentSystem
 
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Streamed chat: text pieces buffered per client, and how long a client may stop reading
+CHAT_STREAM_MAX_PENDING = int(os.getenv("CHAT_STREAM_MAX_PENDING", "64"))
+CHAT_STREAM_STALL_TIMEOUT = float(os.getenv("CHAT_STREAM_STALL_TIMEOUT", "30"))
+
 # Initialize Sentry for error tracking
 if os.getenv("SENTRY_DSN"):
     sentry_sdk.init(
@@ -44,38 +57,49 @@ if os.getenv("SENTRY_DSN"):
         environment=os.getenv("NODE_ENV", "development"),
     )
 
+
 class OnboardingMCPServer:
     """Main MCP Server for Onboarding Intelligence Hub"""
-    
+
     def __init__(self):
         self.app = FastAPI(
             title="Onboarding Intelligence Hub",
             description="AI-powered financial services onboarding automation",
             version="1.0.0",
             docs_url="/docs",
-            redoc_url="/redoc"
+            redoc_url="/redoc",
         )
-        
+
         # Initialize core components
-        self.auth_manager = AuthManager()
         self.input_validator = InputValidator()
         self.metrics = MetricsCollector()
-        self.cache = CacheManager()
+        self.cache = CacheManager(metrics=self.metrics)
+        self.auth_manager = AuthManager(redis_client=self.cache.redis_client)
         self.db = DatabaseManager()
-        self.feature_flags = FeatureFlags()
+        self.feature_flags = FeatureFlags(redis_client=self.cache.redis_client)
         self.multi_agent_system = MultiAgentSystem()
-        
+        # One pooled, rate-limited LLM client for every tool
+        self.llm = get_shared_gateway(cache=self.cache, metrics=self.metrics)
+        self.chat_sessions = ChatSessionStore(
+            self.cache.redis_client, llm=self.llm, metrics=self.metrics
+        )
+
         # Initialize tools
         self.tools = {
-            "document_analyzer": DocumentAnalyzerTool(),
-            "compliance_validator": ComplianceValidatorTool(),
-            "risk_predictor": RiskPredictorTool(),
-            "conversational_assistant": ConversationalOnboardingTool(),
+            "document_analyzer": DocumentAnalyzerTool(cache=self.cache, llm=self.llm),
+            "compliance_validator": ComplianceValidatorTool(cache=self.cache),
+            "risk_predictor": RiskPredictorTool(llm=self.llm),
+            "conversational_assistant": ConversationalOnboardingTool(
+                llm=self.llm, sessions=self.chat_sessions
+            ),
         }
-        
+
+        self.batch_jobs = BatchJobManager(self.cache.redis_client, self.run_batch_item)
+
         self.setup_middleware()
         self.setup_routes()
-        
+        self.setup_events()
+
     def setup_middleware(self):
         """Setup FastAPI middleware"""
         self.app.add_middleware(
@@ -85,183 +109,400 @@ class OnboardingMCPServer:
             allow_methods=["*"],
             allow_headers=["*"],
         )
-        
-        # Add metrics middleware
-        @self.app.middleware("http")
-        async def metrics_middleware(request, call_next):
-            start_time = asyncio.get_event_loop().time()
-            response = await call_next(request)
-            process_time = asyncio.get_event_loop().time() - start_time
-            
-            self.metrics.record_request(
-                method=request.method,
-                path=request.url.path,
-                status_code=response.status_code,
-                duration=process_time
-            )
-            
-            return response
-    
+
+        # Request metrics by route template and tool
+        self.app.add_middleware(MetricsMiddleware, metrics=self.metrics)
+
+    def setup_events(self):
+        """Setup application lifecycle handlers"""
+
+        @self.app.on_event("startup")
+        async def startup():
+            self.cache.start_invalidation_listener()
+            self.auth_manager.start_revocation_listener()
+            self.feature_flags.start_listener()
+            self.chat_sessions.start()
+            self.batch_jobs.start_workers()
+            await self.tools["risk_predictor"].start()
+
+        @self.app.on_event("shutdown")
+        async def shutdown():
+            await self.batch_jobs.stop()
+            await self.tools["risk_predictor"].close()
+            self.tools["document_analyzer"].pdf_pool.shutdown()
+            self.tools["document_analyzer"].ocr.shutdown()
+            await self.auth_manager.close()
+            await self.feature_flags.close()
+            await self.chat_sessions.close()
+            await close_shared_gateway()
+            await self.cache.close()
+            await close_shared_pools()
+
+    async def analyze_document_cached(
+        self, request: Dict[str, Any], user
+    ) -> Dict[str, Any]:
+        """Run document analysis through the content-addressed result cache"""
+        cache_version = self.tools["document_analyzer"].cache_version
+        cache_key = await document_analysis_key(
+            request["document_path"],
+            request.get("extraction_mode"),
+            cache_version,
+            await self.cache.get_generation(document_analysis_namespace(cache_version)),
+        )
+        return await self.cache.get_or_compute(
+            cache_key,
+            lambda: self.tools["document_analyzer"].execute(request, user),
+            ttl=3600,
+            stale_ttl=600,
+            early_refresh_beta=1.0,
+            # Failures may be transient; never serve them from the cache
+            cache_if=lambda result: result.get("status") != "error",
+        )
+
+    async def run_batch_item(
+        self, request: Dict[str, Any], username: str
+    ) -> Dict[str, Any]:
+        """Process one document of a batch job on behalf of the submitting user"""
+        user = await self.auth_manager.get_user(username)
+        self.input_validator.validate_document_analysis_request(request)
+        result = await self.analyze_document_cached(request, user)
+        if result.get("status") == "error":
+            # Error results are not cached, so the worker's retry reruns the analysis
+            raise RuntimeError(result.get("message") or "Document analysis failed")
+        self.metrics.document_processed.inc()
+        return result
+
+    async def stream_chat(
+        self, request: Dict[str, Any], user, fmt: str, started: float
+    ):
+        """Encode the assistant's reply as stream events, timing the first token"""
+        outcome = "completed"
+        first = True
+        try:
+            source = self.tools["conversational_assistant"].stream(request, user)
+            async for text in relay(
+                source, CHAT_STREAM_MAX_PENDING, CHAT_STREAM_STALL_TIMEOUT
+            ):
+                if first:
+                    self.metrics.record_time_to_first_token(
+                        "chat", time.monotonic() - started
+                    )
+                    first = False
+                yield encode_event(fmt, "token", {"text": text})
+            yield encode_event(fmt, "done", {})
+        except StreamStalled as e:
+            # The client stopped reading; the upstream LLM stream is already closed
+            outcome = "stalled"
+            logger.warning(f"Chat stream abandoned: {e}")
+        except (asyncio.CancelledError, GeneratorExit):
+            outcome = "disconnected"
+            raise
+        except Exception as e:
+            outcome = "error"
+            logger.error(f"Chat stream failed: {str(e)}")
+            sentry_sdk.capture_exception(e)
+            yield encode_event(fmt, "error", {"message": "Chat failed"})
+        finally:
+            self.metrics.record_stream("chat", outcome)
+
     def setup_routes(self):
         """Setup API routes"""
-        
+
         @self.app.get("/health")
         async def health_check():
             """Health check endpoint"""
             return {
                 "status": "healthy",
                 "version": "1.0.0",
-                "timestamp": asyncio.get_event_loop().time()
+                "timestamp": asyncio.get_event_loop().time(),
             }
-        
+
         @self.app.post("/mcp/tools/analyze_document")
         async def analyze_document(
             request: Dict[str, Any],
             background_tasks: BackgroundTasks,
-            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
         ):
             """Analyze onboarding documents using GenAI"""
             try:
                 # Authenticate user
                 user = await self.auth_manager.authenticate(auth.credentials)
-                
+
                 # Validate input
                 self.input_validator.validate_document_analysis_request(request)
-                
+
                 # Check feature flag
                 if not self.feature_flags.is_enabled("genai_analysis", user.id):
                     raise HTTPException(status_code=403, detail="Feature not enabled")
-                
+
                 # Process with caching
-                cache_key = f"doc_analysis:{hash(str(request))}"
-                result = await self.cache.get_or_compute(
-                    cache_key,
-                    lambda: self.tools["document_analyzer"].execute(request, user),
-                    ttl=3600
-                )
-                
+                result = await self.analyze_document_cached(request, user)
+
                 # Record metrics
                 self.metrics.document_processed.inc()
-                
+
                 return result
-                
+
+            except OCRQueueFullError:
+                raise HTTPException(
+                    status_code=503, detail="OCR capacity exceeded, retry later"
+                )
             except Exception as e:
                 logger.error(f"Document analysis failed: {str(e)}")
                 sentry_sdk.capture_exception(e)
                 raise HTTPException(status_code=500, detail="Analysis failed")
-        
+
+        @self.app.post("/mcp/jobs/analyze_documents")
+        async def submit_batch_analysis(
+            request: Dict[str, Any],
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+        ):
+            """Queue many documents for asynchronous analysis"""
+            try:
+                user = await self.auth_manager.authenticate(auth.credentials)
+
+                if not self.feature_flags.is_enabled("batch_processing", user.id):
+                    raise HTTPException(status_code=403, detail="Feature not enabled")
+
+                self.input_validator.validate_batch_request(request)
+
+                tenant = getattr(user, "tenant_id", None) or user.username
+                job_id = await self.batch_jobs.submit(
+                    tenant, user.username, request["documents"]
+                )
+                return {
+                    "job_id": job_id,
+                    "total": len(request["documents"]),
+                    "status": "queued",
+                }
+
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Batch submission failed: {str(e)}")
+                sentry_sdk.capture_exception(e)
+                raise HTTPException(status_code=500, detail="Batch submission failed")
+
+        async def get_owned_job(
+            job_id: str, username: str, include_results: bool = False
+        ):
+            job = await self.batch_jobs.get_job(job_id, include_results=include_results)
+            if job is None or job["username"] != username:
+                raise HTTPException(status_code=404, detail="Job not found")
+            return job
+
+        @self.app.get("/mcp/jobs/{job_id}")
+        async def get_batch_job(
+            job_id: str, auth: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+        ):
+            """Poll batch job status and results"""
+            user = await self.auth_manager.authenticate(auth.credentials)
+            return await get_owned_job(job_id, user.username, include_results=True)
+
+        @self.app.get("/mcp/jobs/{job_id}/events")
+        async def stream_batch_job(
+            job_id: str, auth: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+        ):
+            """Stream batch job progress as Server-Sent Events"""
+            user = await self.auth_manager.authenticate(auth.credentials)
+            await get_owned_job(job_id, user.username)
+
+            async def events():
+                async for job in self.batch_jobs.iter_progress(job_id):
+                    yield f"event: progress\ndata: {json.dumps(job)}\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
         @self.app.post("/mcp/tools/validate_compliance")
         async def validate_compliance(
             request: Dict[str, Any],
-            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
         ):
             """Validate regulatory compliance"""
             try:
                 user = await self.auth_manager.authenticate(auth.credentials)
                 self.input_validator.validate_compliance_request(request)
-                
+
+                # Incremental re-validation on save is part of the real-time rollout
+                request = {
+                    **request,
+                    "incremental": self.feature_flags.is_enabled(
+                        "real_time_compliance", user.id
+                    ),
+                }
                 result = await self.tools["compliance_validator"].execute(request, user)
-                
+
                 self.metrics.compliance_check.inc()
                 return result
-                
+
             except Exception as e:
                 logger.error(f"Compliance validation failed: {str(e)}")
                 sentry_sdk.capture_exception(e)
                 raise HTTPException(status_code=500, detail="Validation failed")
-        
+
         @self.app.post("/mcp/tools/predict_risk")
         async def predict_risk(
             request: Dict[str, Any],
-            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
         ):
             """Predict onboarding risk using ML and GenAI"""
             try:
                 user = await self.auth_manager.authenticate(auth.credentials)
                 self.input_validator.validate_risk_prediction_request(request)
-                
+
                 # Use multi-agent system for comprehensive analysis
                 if self.feature_flags.is_enabled("multi_agent_system", user.id):
                     result = await self.multi_agent_system.analyze_risk(request, user)
                 else:
                     result = await self.tools["risk_predictor"].execute(request, user)
-                
+
                 self.metrics.risk_prediction.inc()
                 return result
-                
+
             except Exception as e:
                 logger.error(f"Risk prediction failed: {str(e)}")
                 sentry_sdk.capture_exception(e)
                 raise HTTPException(status_code=500, detail="Prediction failed")
-        
+
+        @self.app.post("/mcp/tools/predict_risk/bulk")
+        async def predict_risk_bulk(
+            request: Dict[str, Any],
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+        ):
+            """Score many client profiles in one call"""
+            try:
+                user = await self.auth_manager.authenticate(auth.credentials)
+                self.input_validator.validate_bulk_risk_prediction_request(request)
+
+                result = await self.tools["risk_predictor"].execute_many(request, user)
+
+                if result["status"] == "success":
+                    self.metrics.risk_prediction.inc(len(result["results"]))
+                return result
+
+            except HTTPException:
+                raise
+            except Exception as e:
+                logger.error(f"Bulk risk prediction failed: {str(e)}")
+                sentry_sdk.capture_exception(e)
+                raise HTTPException(status_code=500, detail="Prediction failed")
+
+        @self.app.get("/mcp/tools/predict_risk/model")
+        async def risk_model_status(
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+        ):
+            """Active and candidate risk model versions with shadow scoring agreement"""
+            await self.auth_manager.authenticate(auth.credentials)
+            return self.tools["risk_predictor"].model_status()
+
         @self.app.post("/mcp/tools/chat")
         async def conversational_interface(
             request: Dict[str, Any],
-            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
         ):
             """Conversational onboarding assistant"""
             try:
                 user = await self.auth_manager.authenticate(auth.credentials)
-                
+
                 if not self.feature_flags.is_enabled("conversational_ui", user.id):
                     raise HTTPException(status_code=403, detail="Feature not enabled")
-                
+
                 self.input_validator.validate_chat_request(request)
-                
-                result = await self.tools["conversational_assistant"].execute(request, user)
-                
+
+                result = await self.tools["conversational_assistant"].execute(
+                    request, user
+                )
+
                 self.metrics.chat_interaction.inc()
                 return result
-                
+
+            except Exception as e:
+                logger.error(f"Chat interaction failed: {str(e)}")
+                sentry_sdk.capture_exception(e)
+                raise HTTPException(status_code=500, detail="Chat failed")
+
+        @self.app.post("/mcp/tools/chat/stream")
+        async def conversational_stream(
+            request: Dict[str, Any],
+            format: str = "sse",
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
+        ):
+            """Conversational onboarding assistant, streamed as SSE or NDJSON"""
+            started = time.monotonic()
+            try:
+                user = await self.auth_manager.authenticate(auth.credentials)
+
+                if not self.feature_flags.is_enabled("conversational_ui", user.id):
+                    raise HTTPException(status_code=403, detail="Feature not enabled")
+
+                self.input_validator.validate_chat_request(request)
+                if format not in STREAM_MEDIA_TYPES:
+                    raise HTTPException(
+                        status_code=400, detail="Unsupported stream format"
+                    )
+
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"Chat interaction failed: {str(e)}")
                 sentry_sdk.capture_exception(e)
                 raise HTTPException(status_code=500, detail="Chat failed")
-        
+
+            self.metrics.chat_interaction.inc()
+            return StreamingResponse(
+                self.stream_chat(request, user, format, started),
+                media_type=STREAM_MEDIA_TYPES[format],
+                # Keep proxies from buffering the stream
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         @self.app.get("/mcp/tools")
         async def list_tools(
-            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer())
+            auth: HTTPAuthorizationCredentials = Depends(HTTPBearer()),
         ):
             """List available MCP tools"""
             try:
                 user = await self.auth_manager.authenticate(auth.credentials)
-                
+
+                enabled_flags = self.feature_flags.evaluate(user.id)
                 tools_info = []
                 for tool_name, tool in self.tools.items():
-                    if hasattr(tool, 'get_info'):
-                        tools_info.append({
-                            "name": tool_name,
-                            "description": tool.get_info().get("description", ""),
-                            "parameters": tool.get_info().get("parameters", {}),
-                            "enabled": self.feature_flags.is_enabled(tool_name, user.id)
-                        })
-                
+                    if hasattr(tool, "get_info"):
+                        tools_info.append(
+                            {
+                                "name": tool_name,
+                                "description": tool.get_info().get("description", ""),
+                                "parameters": tool.get_info().get("parameters", {}),
+                                "enabled": self.feature_flags.is_set(
+                                    enabled_flags, tool_name
+                                ),
+                            }
+                        )
+
                 return {"tools": tools_info}
-                
+
             except Exception as e:
                 logger.error(f"Failed to list tools: {str(e)}")
                 raise HTTPException(status_code=500, detail="Failed to list tools")
-        
+
         @self.app.get("/metrics")
         async def get_metrics():
             """Prometheus metrics endpoint"""
             return self.metrics.get_metrics()
-        
+
         @self.app.get("/dashboard")
         async def get_dashboard():
             """Real-time monitoring dashboard"""
             return await self.metrics.get_dashboard_data()
 
+
 # Global server instance
 server = OnboardingMCPServer()
 app = server.app
 
 if __name__ == "__main__":
     import uvicorn
+
     uvicorn.run(
-        "src.server:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+        "src.server:app", host="0.0.0.0", port=8000, reload=True, log_level="info"
     )
@@ -1,86 +1,260 @@
 from mcp import Tool
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional
+import asyncio
 import logging
+import os
 import sentry_sdk
 
+from ..utils.cache import LocalCache
+from ..utils.rule_engine import Rule, RulePack, changed_fields, load_rule_packs
+
 logger = logging.getLogger(__name__)
 
+RULES_DIR = os.getenv(
+    "COMPLIANCE_RULES_DIR", os.path.join(os.path.dirname(__file__), "compliance_rules")
+)
+CHECK_TIMEOUT = float(os.getenv("COMPLIANCE_CHECK_TIMEOUT", "2.0"))
+STATE_PREFIX = "compliance_state:"
+STATE_TTL = int(os.getenv("COMPLIANCE_STATE_TTL", str(7 * 86400)))
+
+# Worst status wins when consolidating
+STATUS_ORDER = ("compliant", "incomplete", "non_compliant")
+
+
 class ComplianceValidatorTool(Tool):
-    def __init__(self):
+    def __init__(self, cache=None):
         super().__init__(
             name="validate_compliance",
-            description="Validate regulatory compliance using preset frameworks for financial services onboarding",
+            description=(
+                "Validate regulatory compliance using preset frameworks for "
+                "financial services onboarding"
+            ),
             inputSchema={
                 "type": "object",
                 "properties": {
                     "jurisdictions": {
                         "type": "array",
-                        "items": {
-                            "type": "string",
-                            "enum": ["MAS", "HKMA", "SEC"]
-                        },
-                        "description": "List of jurisdictions to validate against"
+                        "items": {"type": "string", "enum": ["MAS", "HKMA", "SEC"]},
+                        "description": "List of jurisdictions to validate against",
                     },
                     "client_data": {
                         "type": "object",
-                        "description": "Client data to validate"
-                    }
+                        "description": "Client data to validate",
+                    },
+                    "client_id": {
+                        "type": "string",
+                        "description": (
+                            "Re-validate incrementally "
+                            "against this client's last result"
+                        ),
+                    },
                 },
-                "required": ["jurisdictions", "client_data"]
-            }
+                "required": ["jurisdictions", "client_data"],
+            },
         )
+        # Rule packs are compiled once into per-field indexes
         self.frameworks = {
-            "MAS": MASComplianceChecker(),
-            "HKMA": HKMAComplianceChecker(),
-            "SEC": SECComplianceChecker()
+            jurisdiction: JurisdictionChecker(pack)
+            for jurisdiction, pack in load_rule_packs(RULES_DIR).items()
         }
+        # Last result per client for re-validation; process-local without a shared cache
+        self.cache = cache
+        self.local_state = LocalCache(
+            max_entries=int(os.getenv("COMPLIANCE_STATE_MAX_CLIENTS", "10000")),
+            ttl=STATE_TTL,
+        )
 
     async def execute(self, arguments: Dict[str, Any], user=None) -> Dict[str, Any]:
         """Execute compliance validation with proper error handling."""
         try:
             jurisdictions = arguments.get("jurisdictions", [])
             client_data = arguments.get("client_data", {})
-            
+
             if not jurisdictions:
                 return {"status": "error", "message": "No jurisdictions specified"}
-            
-            results = []
-            for jurisdiction in jurisdictions:
+
+            checkers = []
+            for jurisdiction in dict.fromkeys(jurisdictions):
                 checker = self.frameworks.get(jurisdiction)
                 if checker:
-                    result = await checker.check(client_data)
-                    results.append(result)
+                    checkers.append(checker)
                 else:
                     logger.warning(f"Unsupported jurisdiction: {jurisdiction}")
-            
+
+            client_id = arguments.get("client_id")
+            incremental = client_id is not None and arguments.get("incremental", True)
+            previous = await self.load_state(client_id) if incremental else {}
+
+            results = await asyncio.gather(
+                *(
+                    self.run_incremental_check(
+                        checker, client_data, previous.get(checker.jurisdiction)
+                    )
+                    for checker in checkers
+                )
+            )
             consolidated_result = self.consolidate_results(results)
-            
-            logger.info(f"Compliance validation completed for jurisdictions: {jurisdictions}")
-            return {"status": "success", "results": consolidated_result}
-            
+
+            if client_id is not None:
+                await self.save_state(client_id, previous, client_data, results)
+
+            logger.info(
+                f"Compliance validation completed for jurisdictions: {jurisdictions}"
+            )
+            return {
+                "status": "success",
+                "overall_status": self.overall_status(consolidated_result),
+                "results": consolidated_result,
+            }
+
         except Exception as e:
             logger.error(f"Compliance validation failed: {str(e)}")
             sentry_sdk.capture_exception(e)
             return {"status": "error", "message": str(e)}
 
+    async def run_incremental_check(
+        self,
+        checker: "JurisdictionChecker",
+        client_data: Dict,
+        previous: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Re-run only the rules that read fields changed since the previous result."""
+        if not previous or previous["version"] != checker.pack.version:
+            return await self.run_check(checker, client_data)
+        rules = checker.pack.rules_depending_on(
+            changed_fields(previous["client_data"], client_data)
+        )
+        result = await self.run_check(checker, client_data, rules)
+        if result.get("error"):
+            return result
+        reevaluated = {rule.id for rule in rules}
+        findings = {
+            rule_id: finding
+            for rule_id, finding in previous["findings"].items()
+            if rule_id not in reevaluated
+        }
+        findings.update(result["findings"])
+        return {**result, "findings": findings, "rules_reevaluated": len(reevaluated)}
+
+    async def load_state(self, client_id: str) -> Dict[str, Any]:
+        key = f"{STATE_PREFIX}{client_id}"
+        if self.cache is not None:
+            return await self.cache.get(key) or {}
+        found, state = self.local_state.get(key)
+        return state if found else {}
+
+    async def save_state(
+        self,
+        client_id: str,
+        previous: Dict[str, Any],
+        client_data: Dict,
+        results: List[Dict],
+    ) -> None:
+        """Store each completed jurisdiction's findings with the data they came from."""
+        state = dict(previous)
+        for result in results:
+            if not result.get("error"):
+                state[result["jurisdiction"]] = {
+                    "version": result["version"],
+                    "client_data": client_data,
+                    "findings": result["findings"],
+                }
+        key = f"{STATE_PREFIX}{client_id}"
+        if self.cache is not None:
+            await self.cache.set(key, state, ttl=STATE_TTL)
+        else:
+            self.local_state.set(key, state)
+
+    async def run_check(
+        self,
+        checker: "JurisdictionChecker",
+        client_data: Dict,
+        rules: Optional[Iterable[Rule]] = None,
+    ) -> Dict[str, Any]:
+        """Run one jurisdiction under the per-check deadline."""
+        try:
+            return await asyncio.wait_for(
+                checker.check(client_data, rules), CHECK_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"{checker.jurisdiction} compliance check timed out")
+            return checker.incomplete_result("timeout")
+        except Exception as e:
+            logger.error(f"{checker.jurisdiction} compliance check failed: {str(e)}")
+            sentry_sdk.capture_exception(e)
+            return checker.incomplete_result("error")
+
     def consolidate_results(self, results: List[Dict]) -> Dict[str, Any]:
-        # Consolidate results from various checkers
+        """Per-jurisdiction status with every rule finding kept."""
         consolidated = {}
         for result in results:
-            consolidated.update(result)
+            findings = sorted(
+                result["findings"].values(), key=lambda finding: finding["rule_id"]
+            )
+            if result.get("error"):
+                status = "incomplete"
+            elif any(not finding["passed"] for finding in findings):
+                status = "non_compliant"
+            elif result.get("missing_fields"):
+                # Rules that could not run for lack of data are not a pass
+                status = "incomplete"
+            else:
+                status = "compliant"
+            consolidated[result["jurisdiction"]] = {
+                "status": status,
+                "rule_pack_version": result["version"],
+                "rules_evaluated": len(findings),
+                "failed_rules": [
+                    finding["rule_id"] for finding in findings if not finding["passed"]
+                ],
+                "findings": findings,
+                **(
+                    {"rules_reevaluated": result["rules_reevaluated"]}
+                    if "rules_reevaluated" in result
+                    else {}
+                ),
+                **(
+                    {"missing_fields": result["missing_fields"]}
+                    if result.get("missing_fields")
+                    else {}
+                ),
+                **({"error": result["error"]} if result.get("error") else {}),
+            }
         return consolidated
 
-class MASComplianceChecker:
-    async def check(self, client_data: Dict) -> Dict[str, Any]:
-        # Logic for MAS compliance check
-        return {"MAS": "compliant"}
+    def overall_status(self, consolidated: Dict[str, Any]) -> str:
+        statuses = [result["status"] for result in consolidated.values()] or [
+            "compliant"
+        ]
+        return max(statuses, key=STATUS_ORDER.index)
+
+
+class JurisdictionChecker:
+    """Evaluates one jurisdiction's rule pack against client data.
 
-class HKMAComplianceChecker:
-    async def check(self, client_data: Dict) -> Dict[str, Any]:
-        # Logic for HKMA compliance check
-        return {"HKMA": "compliant"}
+    check() is a coroutine so rules backed by external lookups (sanctions or
+    registry screening) can be awaited under the same per-check deadline.
+    """
 
-class SECComplianceChecker:
-    async def check(self, client_data: Dict) -> Dict[str, Any]:
-        # Logic for SEC compliance check
-        return {"SEC": "compliant"}
+    def __init__(self, pack: RulePack):
+        self.pack = pack
+        self.jurisdiction = pack.jurisdiction
+
+    async def check(
+        self, client_data: Dict, rules: Optional[Iterable[Rule]] = None
+    ) -> Dict[str, Any]:
+        return {
+            "jurisdiction": self.jurisdiction,
+            "version": self.pack.version,
+            "findings": self.pack.evaluate(client_data, rules),
+            # Always over the whole pack, so incremental runs report every gap
+            "missing_fields": self.pack.missing_fields(client_data),
+        }
+
+    def incomplete_result(self, error: str) -> Dict[str, Any]:
+        return {
+            "jurisdiction": self.jurisdiction,
+            "version": self.pack.version,
+            "findings": {},
+            "error": error,
+        }
@@ -1,13 +1,30 @@
 from mcp import Tool
-from typing import Any, Dict
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Optional
 import logging
-import os
 import sentry_sdk
 
+from ..utils.chat_sessions import ChatSessionStore, session_id
+from ..utils.llm_gateway import LLMGateway, get_shared_gateway
+
 logger = logging.getLogger(__name__)
 
+# Bump when the chat prompt changes so cached replies are not reused
+CHAT_PROMPT_VERSION = "1"
+CHAT_SYSTEM_PROMPT = (
+    "You are an onboarding assistant for a financial services firm. Answer the "
+    "client's question about the onboarding process concisely and ask for any "
+    "missing information."
+)
+STUB_RESPONSE = "Sample conversational response using GenAI"
+
+
 class ConversationalOnboardingTool(Tool):
-    def __init__(self):
+    def __init__(
+        self,
+        llm: Optional[LLMGateway] = None,
+        sessions: Optional[ChatSessionStore] = None,
+    ):
         super().__init__(
             name="conversational_onboarding",
             description="Conversational assistant for onboarding using GenAI",
@@ -16,35 +33,109 @@ class ConversationalOnboardingTool(Tool):
                 "properties": {
                     "input_query": {
                         "type": "string",
-                        "description": "User input query for conversational assistance"
-                    }
+                        "description": "User input query for conversational assistance",
+                    },
+                    "client_id": {
+                        "type": "string",
+                        "description": (
+                            "Client whose conversation (with the calling user) "
+                            "this turn continues"
+                        ),
+                    },
                 },
-                "required": ["input_query"]
-            }
+                "required": ["input_query"],
+            },
         )
+        self.llm = llm if llm is not None else get_shared_gateway()
+        # Without a session store every turn is answered on its own
+        self.sessions = sessions
+
+    @staticmethod
+    def get_query(arguments: Dict[str, Any]) -> str:
+        # The chat route validates "message"; MCP callers send "input_query"
+        return arguments.get("input_query") or arguments.get("message") or ""
+
+    def session_for(self, arguments: Dict[str, Any], user=None) -> Optional[str]:
+        """The caller's own session for the client, or None when turns are not kept"""
+        client_id = arguments.get("client_id")
+        owner = getattr(user, "id", None)
+        if self.sessions is None or not client_id or not owner:
+            return None
+        return session_id(owner, client_id)
+
+    async def llm_params(
+        self, input_query: str, session: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Request for this turn, with the session's summarized, budgeted history"""
+        system, history = CHAT_SYSTEM_PROMPT, []
+        if session is not None:
+            summary, history = await self.sessions.get_context(session)
+            if summary:
+                system = (
+                    f"{CHAT_SYSTEM_PROMPT}\n\n"
+                    f"Summary of the conversation so far:\n{summary}"
+                )
+        # Greedy decoding makes repeated FAQ-style questions cacheable
+        return {
+            "tool": "chat",
+            "prompt_version": CHAT_PROMPT_VERSION,
+            "max_tokens": 1024,
+            "temperature": 0,
+            "system": system,
+            "messages": [*history, {"role": "user", "content": input_query}],
+        }
+
+    async def record_turn(
+        self, session: Optional[str], input_query: str, response: str
+    ) -> None:
+        if session is not None:
+            await self.sessions.append(session, input_query, response)
 
     async def execute(self, arguments: Dict[str, Any], user=None) -> Dict[str, Any]:
         """Execute conversational assistance with error handling."""
         try:
-            input_query = arguments.get("input_query", "")
+            input_query = self.get_query(arguments)
 
             if not input_query:
                 return {"status": "error", "message": "No input query provided"}
 
-            # Example GenAI response (stubbed)
-            response = "Sample conversational response using GenAI"
+            session = self.session_for(arguments, user)
+            if self.llm.available:
+                response = await self.llm.complete(
+                    **await self.llm_params(input_query, session)
+                )
+            else:
+                response = STUB_RESPONSE
+            await self.record_turn(session, input_query, response)
 
             logger.info(f"Conversational response generated for query: {input_query}")
-            return {
-                "status": "success",
-                "response": response
-            }
+            return {"status": "success", "response": response}
 
         except Exception as e:
             logger.error(f"Conversational assistance failed: {str(e)}")
             sentry_sdk.capture_exception(e)
             return {"status": "error", "message": str(e)}
 
+    async def stream(self, arguments: Dict[str, Any], user=None) -> AsyncIterator[str]:
+        """Yield the reply in pieces as the LLM produces them; errors propagate."""
+        input_query = self.get_query(arguments)
+        if not input_query:
+            raise ValueError("No input query provided")
+        session = self.session_for(arguments, user)
+        if not self.llm.available:
+            yield STUB_RESPONSE
+            await self.record_turn(session, input_query, STUB_RESPONSE)
+            return
+        params = await self.llm_params(input_query, session)
+        parts = []
+        # Close the upstream stream as soon as our consumer goes away, not at GC time
+        async with aclosing(self.llm.stream(**params)) as pieces:
+            async for text in pieces:
+                parts.append(text)
+                yield text
+        # Only a reply the client received in full becomes part of the conversation
+        await self.record_turn(session, input_query, "".join(parts))
+
     def get_info(self) -> Dict[str, Any]:
         """Return tool information for MCP protocol."""
         return {
@@ -54,7 +145,7 @@ class ConversationalOnboardingTool(Tool):
                 "input_query": {
                     "type": "string",
                     "description": "User input query for conversational assistance",
-                    "required": True
+                    "required": True,
                 }
-            }
+            },
         }
@@ -1,100 +1,311 @@
 from mcp import Tool
-from typing import Any, Dict, Optional
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Union,
+)
 import os
 import asyncio
+import hashlib
+import json
 import logging
-from anthropic import AsyncAnthropic
-import PyPDF2
+from collections import deque
 import sentry_sdk
 
+from ..utils.cache_keys import file_sha256, normalize_extraction_mode
+from ..utils.llm_gateway import LLMGateway, get_shared_gateway
+from ..utils.ocr import IMAGE_EXTENSIONS, OCREngine, OCRQueueFullError
+from ..utils.pdf_extraction import PdfExtractionPool
+from ..utils.text_chunker import iter_chunks
+
 logger = logging.getLogger(__name__)
 
+# Bump when prompts or the output format change so cached results are not reused
+PROMPT_VERSION = "1"
+
+# Image pages with less extracted text than this are treated as scanned and OCR'd
+MIN_TEXT_LAYER_CHARS = int(os.getenv("MIN_TEXT_LAYER_CHARS", "20"))
+
+ANALYSIS_SYSTEM_PROMPT = (
+    "You are a financial services onboarding analyst reviewing an excerpt of a client "
+    "document. Respond with only a JSON object with these keys: "
+    '"summary" (string), "document_types" (list of strings), '
+    '"entities" (list of objects with "name" and "type"), '
+    '"risk_flags" (list of strings) and "missing_information" (list of strings).'
+)
+
+MODE_INSTRUCTIONS = {
+    "general": "Summarize the excerpt and note anything relevant to onboarding.",
+    "kyc": (
+        "Focus on identity, address, beneficial ownership and sanctions/PEP indicators."
+    ),
+    "wealth_management": (
+        "Focus on source of wealth, source of funds, assets and investment profile."
+    ),
+    "risk_assessment": "Focus on indicators of financial crime, fraud and credit risk.",
+}
+
+
+async def _aiter(items: Iterable[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    for item in items:
+        yield item
+
+
 class DocumentAnalyzerTool(Tool):
-    def __init__(self):
+    def __init__(self, cache=None, llm: Optional[LLMGateway] = None):
         super().__init__(
             name="analyze_onboarding_document",
-            description="Analyze financial documents using GenAI for onboarding compliance and risk assessment",
+            description=(
+                "Analyze financial documents using GenAI for onboarding compliance "
+                "and risk assessment"
+            ),
             inputSchema={
                 "type": "object",
                 "properties": {
                     "document_path": {
                         "type": "string",
-                        "description": "Path to the document to analyze"
+                        "description": "Path to the document to analyze",
                     },
                     "extraction_mode": {
                         "type": "string",
                         "description": "Mode for document analysis",
-                        "enum": ["wealth_management", "kyc", "risk_assessment", "general"]
-                    }
+                        "enum": [
+                            "wealth_management",
+                            "kyc",
+                            "risk_assessment",
+                            "general",
+                        ],
+                    },
                 },
-                "required": ["document_path"]
-            }
+                "required": ["document_path"],
+            },
         )
-        # Initialize Anthropic client if API key is available
-        api_key = os.getenv("ANTHROPIC_API_KEY")
-        if api_key:
-            try:
-                self.llm_client = AsyncAnthropic(api_key=api_key)
-            except Exception as e:
-                logger.warning(f"Failed to initialize Anthropic client: {e}")
-                self.llm_client = None
-        else:
-            self.llm_client = None
-        
+        # Rate limits, concurrency, retries and hedging are the shared gateway's job
+        self.llm = llm if llm is not None else get_shared_gateway()
+        self.model = self.llm.default_model
+        self.max_chunk_tokens = int(os.getenv("LLM_CHUNK_TOKENS", "6000"))
+        # OCR text for scanned pages is cached by page fingerprint
+        self.cache = cache
+        self.pdf_pool = PdfExtractionPool()
+        self.ocr = OCREngine(cache=cache)
+
+    @property
+    def cache_version(self) -> str:
+        """Model/prompt version tag that scopes cached analyses"""
+        return f"{self.model}:{PROMPT_VERSION}"
+
     async def load_document(self, path: str):
-        with open(path, 'rb') as file:
+        with open(path, "rb") as file:
             return file.read()
-        
-    async def extract_text(self, document_path: str) -> str:
-        """Extract text from document using appropriate method."""
+
+    async def extract_text(self, document_path: str) -> AsyncIterator[Dict[str, Any]]:
+        """Extract text from document, yielding {"page", "text", "hash"} records."""
         try:
-            if document_path.endswith('.pdf'):
-                # PDF text extraction using PyPDF2
-                with open(document_path, 'rb') as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    text = ""
-                    for page in pdf_reader.pages:
-                        text += page.extract_text()
-                    return text
+            if document_path.endswith(".pdf"):
+                # PyPDF2 extraction runs page-parallel in worker processes
+                async for record in self._extract_pdf(document_path):
+                    yield record
+            elif document_path.lower().endswith(IMAGE_EXTENSIONS):
+                digest = await file_sha256(document_path)
+                text = await self.ocr.ocr_image(document_path, digest)
+                await asyncio.to_thread(self.ocr.prune_image_cache)
+                yield {"page": 1, "text": text, "hash": digest, "ocr": True}
             else:
                 # For other formats, return placeholder
-                return "Text extraction for this format not implemented yet"
+                text = "Text extraction for this format not implemented yet"
+                yield {
+                    "page": 1,
+                    "text": text,
+                    "hash": hashlib.sha256(text.encode()).hexdigest(),
+                }
         except Exception as e:
             logger.error(f"Error extracting text from {document_path}: {str(e)}")
             raise
 
-    async def analyze_with_llm(self, text: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
-        """Perform GenAI analysis on text."""
-        # Use the LLM client (e.g., Anthropic or OpenAI's GPT)
-        analysis = "Analysis results based on the text"
+    async def _extract_pdf(self, document_path: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield PDF pages in order, OCR'ing image pages without a usable text layer.
+
+        OCR for scanned pages starts as soon as each page is seen, so several
+        pages are recognized concurrently while earlier ones are yielded.
+        """
+
+        async def ocr_record(record):
+            record["text"] = await self.ocr.ocr_pdf_page(
+                document_path, record["page"] - 1, record["hash"]
+            )
+            record["ocr"] = True
+            return record
+
+        window = self.ocr.max_workers * 2
+        pending: deque = deque()
+        used_ocr = False
+        try:
+            async for record in self.pdf_pool.iter_pages(document_path):
+                # Blank, cover and short signature pages have no images to read
+                if (
+                    record.get("images")
+                    and len(record["text"].strip()) < MIN_TEXT_LAYER_CHARS
+                ):
+                    used_ocr = True
+                    task = asyncio.ensure_future(ocr_record(record))
+                else:
+                    task = asyncio.get_running_loop().create_future()
+                    task.set_result(record)
+                pending.append(task)
+                while pending and (pending[0].done() or len(pending) > window):
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for task in pending:
+                task.cancel()
+        if used_ocr:
+            await asyncio.to_thread(self.ocr.prune_image_cache)
+
+    async def analyze_with_llm(
+        self,
+        pages: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+        arguments: Dict[str, Any],
+    ) -> Dict[str, Any]:
+        """Perform GenAI analysis as a map-reduce over token-budgeted chunks.
+
+        Pages may be an async stream: chunks are packed and sent to the LLM
+        while later pages are still being extracted, and at most a few
+        chunks per gateway slot are held at once, so memory does not grow
+        with page count. Each reply is cached by content hash, then all are
+        merged into one structured analysis.
+        """
+        if not hasattr(pages, "__aiter__"):
+            pages = _aiter(pages)
+        if not self.llm.available:
+            # Still read the document so extraction errors surface as before
+            async for _ in pages:
+                pass
+            analysis = "Analysis results based on the text"
+            return {"status": "success", "analysis": analysis}
+
+        mode = normalize_extraction_mode(arguments.get("extraction_mode"))
+        window = self.llm.max_concurrency * 2
+        spans: List[Dict[str, Any]] = []
+        results: List[Dict[str, Any]] = []
+        pending: deque = deque()
+        try:
+            async for chunk in iter_chunks(pages, self.max_chunk_tokens):
+                # Only the page span is kept once the chunk text has been sent
+                spans.append(
+                    {"first_page": chunk["first_page"], "last_page": chunk["last_page"]}
+                )
+                pending.append(asyncio.ensure_future(self.analyze_chunk(chunk, mode)))
+                while len(pending) >= window:
+                    results.append(await pending.popleft())
+            while pending:
+                results.append(await pending.popleft())
+        finally:
+            for task in pending:
+                task.cancel()
         return {
             "status": "success",
-            "analysis": analysis
+            "analysis": self.merge_chunk_analyses(spans, results),
+            "chunks": len(spans),
+        }
+
+    async def analyze_chunk(self, chunk: Dict[str, Any], mode: str) -> Dict[str, Any]:
+        """Map step: analyze one chunk; the gateway's cache reuses identical chunks."""
+        instructions = MODE_INSTRUCTIONS.get(mode, MODE_INSTRUCTIONS["general"])
+        text = await self.llm.complete(
+            tool="document_analysis",
+            prompt_version=PROMPT_VERSION,
+            model=self.model,
+            max_tokens=1024,
+            temperature=0,
+            system=f"{ANALYSIS_SYSTEM_PROMPT} {instructions}",
+            messages=[{"role": "user", "content": chunk["text"]}],
+        )
+        return self.parse_chunk_analysis(text)
+
+    @staticmethod
+    def parse_chunk_analysis(text: str) -> Dict[str, Any]:
+        """Parse the model's JSON reply, keeping free text as the summary otherwise."""
+        start, stop = text.find("{"), text.rfind("}") + 1
+        try:
+            parsed = json.loads(text[start:stop]) if start != -1 else None
+        except ValueError:
+            parsed = None
+        if not isinstance(parsed, dict):
+            return {"summary": text.strip()}
+        return parsed
+
+    @staticmethod
+    def merge_chunk_analyses(
+        chunks: List[Dict[str, Any]], results: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Reduce step: merge per-chunk analyses, de-duplicating, keeping page refs."""
+        merged = {
+            "summary": [],
+            "document_types": [],
+            "entities": [],
+            "risk_flags": [],
+            "missing_information": [],
         }
+        seen_entities = set()
+        risk_flags: Dict[str, Dict[str, Any]] = {}
+        for chunk, result in zip(chunks, results):
+            pages = [chunk["first_page"], chunk["last_page"]]
+            if result.get("summary"):
+                merged["summary"].append({"pages": pages, "text": result["summary"]})
+            for document_type in result.get("document_types") or []:
+                if document_type not in merged["document_types"]:
+                    merged["document_types"].append(document_type)
+            for entity in result.get("entities") or []:
+                if not isinstance(entity, dict):
+                    entity = {"name": str(entity), "type": None}
+                identity = (str(entity.get("name", "")).lower(), entity.get("type"))
+                if identity not in seen_entities:
+                    seen_entities.add(identity)
+                    merged["entities"].append(entity)
+            for flag in result.get("risk_flags") or []:
+                risk_flags.setdefault(str(flag), {"flag": str(flag), "pages": []})[
+                    "pages"
+                ].append(pages)
+            for item in result.get("missing_information") or []:
+                if item not in merged["missing_information"]:
+                    merged["missing_information"].append(item)
+        merged["risk_flags"] = list(risk_flags.values())
+        return merged
 
     async def execute(self, arguments: Dict[str, Any], user=None) -> Dict[str, Any]:
         """Execute document analysis with proper error handling and monitoring."""
         try:
             document_path = arguments["document_path"]
-            
+
             # Validate file exists
             if not os.path.exists(document_path):
-                return {"status": "error", "message": f"Document not found: {document_path}"}
-            
-            # Extract text from document
-            text = await self.extract_text(document_path)
-            
-            # Analyze with LLM
-            analysis = await self.analyze_with_llm(text, arguments)
-            
+                return {
+                    "status": "error",
+                    "message": f"Document not found: {document_path}",
+                }
+
+            # Extract text and analyze it with the LLM as pages arrive
+            analysis = await self.analyze_with_llm(
+                self.extract_text(document_path), arguments
+            )
+
             logger.info(f"Document analysis completed successfully for {document_path}")
             return analysis
-            
+
+        except OCRQueueFullError:
+            # Transient overload: let the caller retry rather than cache an error result
+            raise
         except Exception as e:
             logger.error(f"Document analysis failed: {str(e)}")
             sentry_sdk.capture_exception(e)
             return {"status": "error", "message": str(e)}
-    
+
     def get_info(self) -> Dict[str, Any]:
         """Return tool information for MCP protocol."""
         return {
@@ -104,13 +315,16 @@ class DocumentAnalyzerTool(Tool):
                 "document_path": {
                     "type": "string",
                     "description": "Path to the document to analyze",
-                    "required": True
+                    "required": True,
                 },
                 "extraction_mode": {
                     "type": "string",
-                    "description": "Mode for document analysis (e.g., 'wealth_management', 'kyc', 'risk_assessment')",
+                    "description": (
+                        "Mode for document analysis (e.g., 'wealth_management', "
+                        "'kyc', 'risk_assessment')"
+                    ),
                     "required": False,
-                    "default": "general"
-                }
-            }
+                    "default": "general",
+                },
+            },
         }
@@ -1,15 +1,84 @@
 from mcp import Tool
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
 import joblib
 import logging
 import os
+import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 import sentry_sdk
 
+from ..utils.feature_schema import (
+    CategoricalFeature,
+    DateDeltaFeature,
+    FeatureSchema,
+    HashedFeature,
+    NumericFeature,
+)
+from ..utils.llm_gateway import LLMGateway, get_shared_gateway
+from ..utils.micro_batcher import MicroBatcher
+from ..utils.model_registry import LoadedModel, ModelRegistry, ShadowScorer
+from ..utils.tree_ensemble import FlatForest, try_export_forest
+
 logger = logging.getLogger(__name__)
 
+# "flat" scores small batches with the compiled node-array engine; sklearn's own
+# traversal is faster beyond FLAT_FOREST_MAX_BATCH rows
+INFERENCE_ENGINE = os.getenv("RISK_INFERENCE_ENGINE", "flat")
+FLAT_FOREST_MAX_BATCH = int(os.getenv("FLAT_FOREST_MAX_BATCH", "128"))
+
+# Bump when the insights prompt changes so cached replies are not reused
+RISK_INSIGHTS_PROMPT_VERSION = "1"
+RISK_INSIGHTS_SYSTEM_PROMPT = (
+    "You are a financial crime risk analyst. Given a client profile as JSON, briefly "
+    "explain the main risk drivers and any follow-up checks an onboarding analyst "
+    "should make."
+)
+
+# Pre-registry location, still served when nothing has been published
+LEGACY_MODEL_PATH = "models/risk_model.pkl"
+
+# Single source of truth for model inputs; training and serving both go through it
+RISK_FEATURE_SCHEMA = FeatureSchema(
+    [
+        NumericFeature("age", default=40.0),
+        NumericFeature("annual_income"),
+        NumericFeature("net_worth"),
+        NumericFeature("account_balance"),
+        NumericFeature("transaction_count_30d"),
+        NumericFeature("transaction_volume_30d"),
+        NumericFeature("credit_score", default=650.0),
+        NumericFeature("is_pep"),
+        NumericFeature("sanctions_match"),
+        NumericFeature("adverse_media"),
+        CategoricalFeature("customer_type", ["individual", "corporate", "trust"]),
+        CategoricalFeature(
+            "industry",
+            [
+                "banking",
+                "crypto",
+                "gambling",
+                "real_estate",
+                "retail",
+                "technology",
+                "precious_metals",
+            ],
+        ),
+        CategoricalFeature(
+            "source_of_funds",
+            ["salary", "business_income", "investments", "inheritance"],
+        ),
+        HashedFeature("country", buckets=32),
+        HashedFeature("address.country", buckets=32, name="residence_country"),
+        DateDeltaFeature("account_opened_at"),
+        DateDeltaFeature("last_kyc_review_at", default=3650.0),
+    ]
+)
+
+
 class RiskPredictorTool(Tool):
-    def __init__(self):
+    def __init__(self, llm: Optional[LLMGateway] = None):
         super().__init__(
             name="predict_risk",
             description="Predict financial risk based on client data",
@@ -18,59 +87,219 @@ class RiskPredictorTool(Tool):
                 "properties": {
                     "client_profile": {
                         "type": "object",
-                        "description": "Client profile data for risk assessment"
+                        "description": "Client profile data for risk assessment",
                     }
                 },
-                "required": ["client_profile"]
-            }
+                "required": ["client_profile"],
+            },
         )
-        self.model = self.load_or_train_model()
         self.feature_extractor = FeatureExtractor()
-    
-    def load_or_train_model(self) -> RandomForestClassifier:
-        try:
-            model = joblib.load('models/risk_model.pkl')
-        except FileNotFoundError:
-            model = RandomForestClassifier()
-            # Train the model with historical data (example)
-            logger.info("Training new RandomForest model.")
-            # Create models directory if it doesn't exist
-            os.makedirs('models', exist_ok=True)
+        # Versioned models are loaded at startup and hot-swapped by the registry watcher
+        self.registry = ModelRegistry(on_load=self.prepare_model)
+        self.shadow = ShadowScorer(self.score)
+        # Concurrent requests are scored together in one vectorized predict_proba call
+        self.batcher = MicroBatcher(self.predict_batch)
+        self.llm = llm if llm is not None else get_shared_gateway()
+
+    @property
+    def model(self) -> RandomForestClassifier:
+        return self.get_active_model().model
+
+    def prepare_model(self, loaded: LoadedModel) -> None:
+        """Reject models trained on a different feature layout and compile the rest."""
+        trained_on = loaded.metadata.get("feature_schema") or getattr(
+            loaded.model, "feature_schema_", None
+        )
+        if trained_on is None:
+            logger.warning(
+                f"Risk model {loaded.version} does not record its feature schema"
+            )
+        elif trained_on != self.feature_extractor.fingerprint:
+            raise ValueError(
+                f"Risk model {loaded.version} was trained on feature schema "
+                f"{trained_on}, serving with {self.feature_extractor.fingerprint}"
+            )
+        if INFERENCE_ENGINE != "flat":
+            return
+        if loaded.compiled_dir is not None:
+            # Memory-mapped node arrays, shared by every worker serving this version
+            loaded.compiled = FlatForest.load(
+                loaded.compiled_dir, mmap_mode=self.registry.mmap_mode
+            )
+        else:
+            loaded.compiled = try_export_forest(loaded.model)
+
+    def load_or_train_model(self) -> LoadedModel:
+        self.registry.refresh()
+        if self.registry.active is None:
             try:
-                joblib.dump(model, 'models/risk_model.pkl')
-            except Exception as e:
-                logger.warning(f"Failed to save model: {e}")
+                model = joblib.load(LEGACY_MODEL_PATH)
+                version = "legacy"
+            except FileNotFoundError:
+                logger.info(
+                    "No risk model published; serving an untrained RandomForest."
+                )
+                model = RandomForestClassifier()
+                version = "untrained"
+            loaded = LoadedModel(version, model, {})
+            if INFERENCE_ENGINE == "flat":
+                loaded.compiled = try_export_forest(model)
+            self.registry.active = loaded
+        return self.registry.active
+
+    def get_active_model(self) -> LoadedModel:
+        return self.registry.active or self.load_or_train_model()
+
+    async def start(self) -> None:
+        """Load models off the event loop and start watching for new versions."""
+        await asyncio.to_thread(self.load_or_train_model)
+        self.registry.start_watching()
+
+    async def close(self) -> None:
+        await self.registry.stop_watching()
+        await self.batcher.close()
+        self.shadow.shutdown()
+
+    def train(
+        self,
+        client_profiles: List[Dict],
+        labels: List[int],
+        as_of=None,
+        stage: Optional[str] = "active",
+    ) -> RandomForestClassifier:
+        """Fit a model through the serving feature schema and publish it."""
+        features = self.feature_extractor.extract_many(client_profiles, as_of)
+        model = RandomForestClassifier()
+        model.fit(features, np.asarray(labels))
+        model.feature_schema_ = self.feature_extractor.fingerprint
+        self.registry.publish(
+            model,
+            compiled=try_export_forest(model),
+            metadata={
+                "feature_schema": self.feature_extractor.fingerprint,
+                "training_rows": len(labels),
+            },
+            stage=stage,
+        )
+        self.registry.refresh()
         return model
-    
+
+    def score(self, loaded: LoadedModel, features: np.ndarray) -> np.ndarray:
+        """Positive-class probability for each row with one loaded model version."""
+        if loaded.compiled is not None and len(features) <= FLAT_FOREST_MAX_BATCH:
+            return loaded.compiled.predict_proba(features)[:, 1]
+        return loaded.model.predict_proba(features)[:, 1]
+
+    def predict_batch(self, features: np.ndarray) -> np.ndarray:
+        """Positive-class probability for each row of a feature matrix."""
+        scores = self.score(self.get_active_model(), features)
+        candidate = self.registry.candidate
+        if candidate is not None:
+            self.shadow.submit(candidate, features, scores)
+        return scores
+
+    def model_status(self) -> Dict[str, Any]:
+        active, candidate = self.registry.active, self.registry.candidate
+        return {
+            "active": active.version if active else None,
+            "candidate": candidate.version if candidate else None,
+            "shadow": self.shadow.stats(),
+        }
+
     async def execute(self, arguments: Dict[str, Any], user=None) -> Dict[str, Any]:
         """Execute risk prediction with proper error handling."""
         try:
             client_profile = arguments.get("client_profile", {})
-            
+
             if not client_profile:
                 return {"status": "error", "message": "No client profile data provided"}
-            
+
             features = self.feature_extractor.extract(client_profile)
-            ml_risk_score = self.model.predict_proba([features])[0][1]
+            ml_risk_score = await self.batcher.submit(features)
             genai_insights = await self.get_genai_risk_insights(client_profile)
-            
-            logger.info(f"Risk prediction completed successfully for profile: {client_profile}")
+
+            logger.info(
+                f"Risk prediction completed successfully for profile: {client_profile}"
+            )
             return {
                 "status": "success",
                 "risk_score": ml_risk_score,
                 "risk_level": self.categorize_risk(ml_risk_score),
-                "genai_insights": genai_insights
+                "genai_insights": genai_insights,
             }
-            
+
         except Exception as e:
             logger.error(f"Risk prediction failed: {str(e)}")
             sentry_sdk.capture_exception(e)
             return {"status": "error", "message": str(e)}
 
-    async def get_genai_risk_insights(self, client_profile: Dict) -> Dict[str, Any]:
-        # Call an LLM to enhance risk insights
-        insights = "Insights based on GenAI analysis"
-        return insights
+    async def execute_many(
+        self, arguments: Dict[str, Any], user=None
+    ) -> Dict[str, Any]:
+        """Score many client profiles in vectorized batches."""
+        try:
+            client_profiles = arguments.get("client_profiles", [])
+
+            if not client_profiles:
+                return {"status": "error", "message": "No client profiles provided"}
+
+            features = self.feature_extractor.extract_many(client_profiles)
+            scores = await self.batcher.submit_many(features)
+
+            if arguments.get("include_genai_insights", False):
+                insights = await asyncio.gather(
+                    *(
+                        self.get_genai_risk_insights(profile)
+                        for profile in client_profiles
+                    )
+                )
+            else:
+                insights = [None] * len(client_profiles)
+
+            logger.info(
+                f"Bulk risk prediction completed for {len(client_profiles)} profiles"
+            )
+            return {
+                "status": "success",
+                "results": [
+                    {
+                        "risk_score": float(score),
+                        "risk_level": self.categorize_risk(score),
+                        "genai_insights": insight,
+                    }
+                    for score, insight in zip(scores, insights)
+                ],
+            }
+
+        except Exception as e:
+            logger.error(f"Bulk risk prediction failed: {str(e)}")
+            sentry_sdk.capture_exception(e)
+            return {"status": "error", "message": str(e)}
+
+    async def get_genai_risk_insights(self, client_profile: Dict) -> Optional[str]:
+        if not self.llm.available:
+            return "Insights based on GenAI analysis"
+        try:
+            return await self.llm.complete(
+                tool="risk_insights",
+                prompt_version=RISK_INSIGHTS_PROMPT_VERSION,
+                max_tokens=512,
+                temperature=0,
+                system=RISK_INSIGHTS_SYSTEM_PROMPT,
+                # Sorted keys so the same profile always hashes to the same cache entry
+                messages=[
+                    {
+                        "role": "user",
+                        "content": json.dumps(
+                            client_profile, sort_keys=True, default=str
+                        ),
+                    }
+                ],
+            )
+        except Exception as e:
+            # Insights are supplementary; the model score is still returned
+            logger.warning(f"GenAI risk insights failed: {e}")
+            return None
 
     def categorize_risk(self, risk_score: float) -> str:
         # Classify risk level based on score
@@ -81,7 +310,23 @@ class RiskPredictorTool(Tool):
         else:
             return "high"
 
+
 class FeatureExtractor:
-    def extract(self, client_profile: Dict) -> List[float]:
-        # Feature extraction logic for model
-        return []  # Return list of extracted features
+    """Compiled view of a FeatureSchema for client profiles."""
+
+    def __init__(self, schema: FeatureSchema = RISK_FEATURE_SCHEMA):
+        self.schema = schema
+
+    @property
+    def fingerprint(self) -> str:
+        return self.schema.fingerprint
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.schema.column_names
+
+    def extract(self, client_profile: Dict, as_of=None) -> np.ndarray:
+        return self.schema.transform_one(client_profile, as_of)
+
+    def extract_many(self, client_profiles: List[Dict], as_of=None) -> np.ndarray:
+        return self.schema.transform(client_profiles, as_of)
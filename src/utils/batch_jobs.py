@@ -0,0 +1,323 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+JOB_PREFIX = "batch:job:"
+QUEUE_PREFIX = "batch:queue:"
+TENANTS_KEY = "batch:tenants"
+DEAD_LETTER_STREAM = "batch:dead"
+CONSUMER_GROUP = "batch-workers"
+
+# Counts one finished item and derives the job status in the same step, so
+# two workers finishing the last items cannot leave it at "running", and a
+# finished job is never reopened. ARGV[1] is the counter to bump, or "" when
+# the item was only re-queued.
+RECORD_OUTCOME_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return false
+end
+if ARGV[1] ~= "" then
+    redis.call("HINCRBY", KEYS[1], ARGV[1], 1)
+end
+local job = redis.call("HMGET", KEYS[1], "total", "completed", "failed", "status")
+if job[4] == "completed" or job[4] == "completed_with_errors" then
+    return job[4]
+end
+local status = "running"
+if tonumber(job[2]) + tonumber(job[3]) >= tonumber(job[1]) then
+    status = tonumber(job[3]) == 0 and "completed" or "completed_with_errors"
+end
+redis.call("HSET", KEYS[1], "status", status)
+return status
+"""
+
+# Drops a tenant from the worker read set once its stream is drained. Atomic
+# with respect to submit(), which adds the tenant and its items in one MULTI.
+PRUNE_TENANT_SCRIPT = """
+if redis.call("XLEN", KEYS[2]) == 0 then
+    return redis.call("SREM", KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+# Called with (request, username) and returns the tool result dict
+ItemHandler = Callable[[Dict[str, Any], str], Awaitable[Dict[str, Any]]]
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class BatchJobManager:
+    """Redis-stream backed batch jobs with per-tenant fairness.
+
+    Every tenant gets its own stream. Workers read all tenant streams in one
+    XREADGROUP with COUNT 1, so each round takes at most one item per tenant
+    and a tenant submitting a 10k-document back-book cannot starve others.
+    Failed items are re-queued up to max_attempts, then moved to the dead
+    letter stream. Items a crashed worker left pending are reclaimed with
+    XAUTOCLAIM once idle for longer than visibility_timeout; a live worker
+    re-claims its running item every visibility_timeout / 3 so long items
+    are not taken over. Tenants with drained streams are dropped from the
+    read set on the same cycle as reclaiming.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        handler: ItemHandler,
+        max_attempts: Optional[int] = None,
+        visibility_timeout: Optional[float] = None,
+        job_ttl: Optional[int] = None,
+    ):
+        self.redis_client = redis_client
+        self.handler = handler
+        self.max_attempts = max_attempts or int(os.getenv("BATCH_MAX_ATTEMPTS", "3"))
+        self.visibility_timeout = visibility_timeout or float(
+            os.getenv("BATCH_VISIBILITY_TIMEOUT", "300")
+        )
+        self.job_ttl = job_ttl or int(os.getenv("BATCH_JOB_TTL", str(7 * 86400)))
+        self.consumer_prefix = (
+            f"{os.getenv('HOSTNAME', 'worker')}-{uuid.uuid4().hex[:6]}"
+        )
+        self.block_ms = self._block_ms()
+        self._record_outcome = redis_client.register_script(RECORD_OUTCOME_SCRIPT)
+        self._prune_tenant = redis_client.register_script(PRUNE_TENANT_SCRIPT)
+        self._workers: List[asyncio.Task] = []
+
+    def _block_ms(self) -> int:
+        """XREADGROUP block time, kept well below the client's socket timeout.
+
+        A read blocked past socket_timeout fails as a timeout and drops the
+        connection, so an idle worker would error on every cycle.
+        """
+        block = float(os.getenv("BATCH_READ_BLOCK", "0.5"))
+        pool = getattr(self.redis_client, "connection_pool", None)
+        socket_timeout = getattr(pool, "connection_kwargs", {}).get("socket_timeout")
+        if socket_timeout:
+            block = min(block, socket_timeout / 2)
+        # BLOCK 0 would wait forever
+        return max(1, int(block * 1000))
+
+    async def submit(
+        self, tenant: str, username: str, requests: List[Dict[str, Any]]
+    ) -> str:
+        """Queue one item per request and return the new job id"""
+        job_id = uuid.uuid4().hex
+        job_key = f"{JOB_PREFIX}{job_id}"
+        stream = f"{QUEUE_PREFIX}{tenant}"
+        await self._ensure_group(stream)
+
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                job_key,
+                mapping={
+                    "tenant": tenant,
+                    "username": username,
+                    "total": len(requests),
+                    "completed": 0,
+                    "failed": 0,
+                    "status": "queued",
+                    "created_at": time.time(),
+                },
+            )
+            pipe.expire(job_key, self.job_ttl)
+            pipe.sadd(TENANTS_KEY, tenant)
+            for index, request in enumerate(requests):
+                pipe.xadd(
+                    stream,
+                    {
+                        "job": job_id,
+                        "index": index,
+                        "attempt": 1,
+                        "username": username,
+                        "request": json.dumps(request),
+                    },
+                )
+            await pipe.execute()
+        return job_id
+
+    async def get_job(
+        self, job_id: str, include_results: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        job_key = f"{JOB_PREFIX}{job_id}"
+        raw = await self.redis_client.hgetall(job_key)
+        if not raw:
+            return None
+        job = {_text(k): _text(v) for k, v in raw.items()}
+        for field in ("total", "completed", "failed"):
+            job[field] = int(job[field])
+        job["created_at"] = float(job["created_at"])
+        job["job_id"] = job_id
+        if include_results:
+            results = await self.redis_client.hgetall(f"{job_key}:results")
+            job["results"] = [
+                json.loads(value)
+                for _, value in sorted(results.items(), key=lambda item: int(item[0]))
+            ]
+        return job
+
+    async def iter_progress(
+        self, job_id: str, interval: float = 1.0
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield job snapshots whenever progress changes, until the job finishes"""
+        last = None
+        while True:
+            job = await self.get_job(job_id)
+            if job is None:
+                return
+            snapshot = (job["completed"], job["failed"], job["status"])
+            if snapshot != last:
+                last = snapshot
+                yield job
+            if job["status"] in ("completed", "completed_with_errors"):
+                return
+            await asyncio.sleep(interval)
+
+    async def _ensure_group(self, stream: str) -> None:
+        try:
+            await self.redis_client.xgroup_create(
+                stream, CONSUMER_GROUP, id="0", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def start_workers(self, count: Optional[int] = None) -> None:
+        count = count or int(os.getenv("BATCH_WORKERS", "4"))
+        for i in range(count):
+            self._workers.append(
+                asyncio.create_task(self._worker_loop(f"{self.consumer_prefix}-{i}"))
+            )
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker_loop(self, consumer: str) -> None:
+        streams: Dict[str, str] = {}
+        next_reclaim = 0.0
+        while True:
+            try:
+                tenants = [
+                    _text(t) for t in await self.redis_client.smembers(TENANTS_KEY)
+                ]
+                if not tenants:
+                    await asyncio.sleep(1.0)
+                    continue
+                streams = {f"{QUEUE_PREFIX}{tenant}": ">" for tenant in sorted(tenants)}
+                if time.monotonic() >= next_reclaim:
+                    await self._reclaim(streams, consumer)
+                    await self._prune_tenants(tenants)
+                    next_reclaim = time.monotonic() + min(
+                        30.0, self.visibility_timeout / 2
+                    )
+                response = await self.redis_client.xreadgroup(
+                    CONSUMER_GROUP, consumer, streams, count=1, block=self.block_ms
+                )
+                for stream, entries in response or []:
+                    for entry_id, fields in entries:
+                        await self.process_entry(
+                            _text(stream), entry_id, fields, consumer
+                        )
+            except asyncio.CancelledError:
+                raise
+            except ResponseError as e:
+                if "NOGROUP" in str(e):
+                    # A tenant stream was created elsewhere without our group
+                    for stream in streams:
+                        await self._ensure_group(stream)
+                    continue
+                logger.error(f"Batch worker {consumer} error: {e}")
+                await asyncio.sleep(1.0)
+            except Exception as e:
+                logger.error(f"Batch worker {consumer} error: {e}")
+                await asyncio.sleep(1.0)
+
+    async def _reclaim(self, streams: Dict[str, str], consumer: str) -> None:
+        """Take over items whose worker died before acknowledging them"""
+        min_idle = int(self.visibility_timeout * 1000)
+        for stream in streams:
+            try:
+                result = await self.redis_client.xautoclaim(
+                    stream, CONSUMER_GROUP, consumer, min_idle, start_id="0-0", count=10
+                )
+            except ResponseError:
+                continue
+            for entry_id, fields in result[1]:
+                if fields:
+                    await self.process_entry(stream, entry_id, fields, consumer)
+
+    async def _prune_tenants(self, tenants: List[str]) -> None:
+        for tenant in tenants:
+            await self._prune_tenant(
+                keys=[TENANTS_KEY, f"{QUEUE_PREFIX}{tenant}"], args=[tenant]
+            )
+
+    async def _heartbeat(self, stream: str, consumer: str, entry_id) -> None:
+        """Reset the entry's idle time while its item runs, so _reclaim skips it"""
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            try:
+                await self.redis_client.xclaim(
+                    stream, CONSUMER_GROUP, consumer, 0, [entry_id], justid=True
+                )
+            except Exception as e:
+                logger.warning(f"Batch heartbeat for {stream}/{entry_id} failed: {e}")
+
+    async def process_entry(
+        self, stream: str, entry_id, fields: Dict, consumer: str
+    ) -> None:
+        fields = {_text(k): _text(v) for k, v in fields.items()}
+        job_id, index, attempt = fields["job"], fields["index"], int(fields["attempt"])
+        job_key = f"{JOB_PREFIX}{job_id}"
+        request = json.loads(fields["request"])
+
+        heartbeat = asyncio.create_task(self._heartbeat(stream, consumer, entry_id))
+        try:
+            result = await self.handler(request, fields["username"])
+            error = result.get("message") if result.get("status") == "error" else None
+        except Exception as e:
+            result, error = None, str(e)
+        finally:
+            heartbeat.cancel()
+
+        counter = ""
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            if error is None:
+                pipe.hset(f"{job_key}:results", index, json.dumps(result))
+                counter = "completed"
+            elif attempt < self.max_attempts:
+                logger.warning(
+                    f"Batch item {job_id}/{index} failed (attempt {attempt}): {error}"
+                )
+                pipe.xadd(stream, {**fields, "attempt": attempt + 1})
+            else:
+                logger.error(f"Batch item {job_id}/{index} dead-lettered: {error}")
+                pipe.xadd(
+                    DEAD_LETTER_STREAM,
+                    {**fields, "error": error, "stream": stream},
+                    maxlen=10000,
+                    approximate=True,
+                )
+                pipe.hset(
+                    f"{job_key}:results",
+                    index,
+                    json.dumps({"status": "error", "message": error}),
+                )
+                counter = "failed"
+            await self._record_outcome(keys=[job_key], args=[counter], client=pipe)
+            pipe.expire(f"{job_key}:results", self.job_ttl)
+            pipe.xack(stream, CONSUMER_GROUP, entry_id)
+            pipe.xdel(stream, entry_id)
+            await pipe.execute()
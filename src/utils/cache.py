@@ -1,64 +1,787 @@
-import redis
+import redis.asyncio as redis
 import json
 import asyncio
-from typing import Any, Optional, Callable
+import fnmatch
+import logging
+import math
+import random
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Optional, Callable, Dict, Iterable, Tuple
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+LOCK_PREFIX = "lock:"
+GENERATION_PREFIX = "gen:"
+UNLINK_CHUNK = 100
+# Marks values written by get_or_compute, which carry freshness metadata
+ENVELOPE_MARKER = "__cache_envelope__"
+
+# Delete the lease only if we still own it
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# One bounded pool per Redis URL, shared by every CacheManager in the process
+_shared_pools: Dict[str, redis.BlockingConnectionPool] = {}
+
+
+def _redis_url() -> str:
+    """Resolve the Redis URL from REDIS_URL or REDIS_HOST/REDIS_PORT"""
+    url = os.getenv("REDIS_URL")
+    if url:
+        return url
+    host = os.getenv("REDIS_HOST", "localhost")
+    port = os.getenv("REDIS_PORT", "6379")
+    return f"redis://{host}:{port}/0"
+
+
+def get_shared_pool(url: Optional[str] = None) -> redis.BlockingConnectionPool:
+    """Get (or create) the process-wide bounded connection pool for a URL"""
+    url = url or _redis_url()
+    pool = _shared_pools.get(url)
+    if pool is None:
+        pool = redis.BlockingConnectionPool.from_url(
+            url,
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+            timeout=float(os.getenv("REDIS_POOL_TIMEOUT", "2.0")),
+            socket_timeout=float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0")),
+            socket_connect_timeout=float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0")),
+            health_check_interval=30,
+        )
+        _shared_pools[url] = pool
+    return pool
+
+
+async def close_shared_pools() -> None:
+    """Disconnect every shared pool, e.g. on application shutdown"""
+    pools = list(_shared_pools.values())
+    _shared_pools.clear()
+    for pool in pools:
+        await pool.disconnect()
+
+
+def create_fake_client(**kwargs):
+    """Create an in-memory asyncio Redis client for tests and benchmarks"""
+    from fakeredis import aioredis as fake_aioredis
+
+    return fake_aioredis.FakeRedis(**kwargs)
+
+
+async def subscribe_forever(
+    redis_client,
+    channel: str,
+    on_message: Callable,
+    on_subscribed: Optional[Callable] = None,
+    name: str = "Pub/sub",
+) -> None:
+    """Deliver every message on a channel to on_message until cancelled.
+
+    Messages are polled with get_message(timeout=...) rather than a blocking
+    listen(): the shared pool's short socket_timeout would otherwise turn
+    every idle second into a read timeout and a reconnect. After each
+    (re)subscribe on_subscribed(reconnected) is called; reconnected is True
+    only when the previous connection actually failed, i.e. when messages
+    may have been missed. Callbacks may be plain functions or coroutines.
+    """
+    poll_timeout = float(os.getenv("REDIS_PUBSUB_POLL_TIMEOUT", "0.5"))
+    backoff = 0.5
+    reconnected = False
+    while True:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel)
+            if on_subscribed is not None:
+                await _maybe_await(on_subscribed(reconnected))
+            backoff = 0.5
+            reconnected = False
+            while True:
+                message = await pubsub.get_message(timeout=poll_timeout)
+                if message is not None:
+                    await _maybe_await(on_message(message["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"{name} listener error: {e}")
+            reconnected = True
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+        finally:
+            await pubsub.reset()
+
+
+async def _maybe_await(result: Any) -> Any:
+    if asyncio.iscoroutine(result):
+        return await result
+    return result
+
+
+class CacheCodec:
+    """Compact, versioned encoding for cached values.
+
+    Encoded values are CODEC_MAGIC, one format byte (serializer id in the
+    high nibble, compression id in the low nibble), then the payload.
+    Anything not starting with CODEC_MAGIC is a legacy plain-JSON entry and
+    is still decoded, so a rollout never strands existing cache entries.
+    """
+
+    CODEC_MAGIC = 0x01
+
+    SERIALIZERS = {"json": 0, "orjson": 1, "msgpack": 2}
+    COMPRESSIONS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+
+    def __init__(
+        self,
+        serializer: Optional[str] = None,
+        compression: Optional[str] = None,
+        compress_threshold: Optional[int] = None,
+    ):
+        serializer = (
+            serializer
+            or os.getenv("CACHE_SERIALIZER")
+            or ("orjson" if orjson is not None else "json")
+        )
+        compression = (
+            compression
+            or os.getenv("CACHE_COMPRESSION")
+            or ("zstd" if zstandard is not None else "zlib")
+        )
+        if serializer not in self.SERIALIZERS:
+            raise ValueError(f"Unknown cache serializer: {serializer}")
+        if compression not in self.COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression: {compression}")
+        missing = {
+            "orjson": orjson,
+            "msgpack": msgpack,
+            "zstd": zstandard,
+            "lz4": lz4_frame,
+        }
+        for name in (serializer, compression):
+            if name in missing and missing[name] is None:
+                raise ValueError(
+                    f"Cache codec '{name}' requires an optional package "
+                    "that is not installed"
+                )
+
+        self.serializer = serializer
+        self.compression = compression
+        self.compress_threshold = (
+            compress_threshold
+            if compress_threshold is not None
+            else int(os.getenv("CACHE_COMPRESS_THRESHOLD", "4096"))
+        )
+        self._serializer_id = self.SERIALIZERS[serializer]
+        self._compression_id = self.COMPRESSIONS[compression]
+        self._zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard else None
+        self._zstd_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+    def encode(self, value: Any) -> bytes:
+        payload = self._dumps(self._serializer_id, value)
+        compression_id = 0
+        if self._compression_id and len(payload) >= self.compress_threshold:
+            payload = self._compress(self._compression_id, payload)
+            compression_id = self._compression_id
+        header = bytes((self.CODEC_MAGIC, (self._serializer_id << 4) | compression_id))
+        return header + payload
+
+    def decode(self, data: bytes) -> Any:
+        if isinstance(data, str):
+            return json.loads(data)
+        if not data or data[0] != self.CODEC_MAGIC:
+            return json.loads(data)
+        serializer_id, compression_id = data[1] >> 4, data[1] & 0x0F
+        payload = memoryview(data)[2:]
+        if compression_id:
+            payload = self._decompress(compression_id, payload)
+        return self._loads(serializer_id, payload)
+
+    @staticmethod
+    def _dumps(serializer_id: int, value: Any) -> bytes:
+        if serializer_id == 1:
+            return orjson.dumps(
+                value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            )
+        if serializer_id == 2:
+            return msgpack.packb(value, use_bin_type=True)
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    @staticmethod
+    def _loads(serializer_id: int, payload) -> Any:
+        if serializer_id == 1:
+            return orjson.loads(payload)
+        if serializer_id == 2:
+            return msgpack.unpackb(payload, raw=False)
+        return json.loads(bytes(payload))
+
+    def _compress(self, compression_id: int, payload: bytes) -> bytes:
+        if compression_id == 2:
+            return self._zstd_compressor.compress(payload)
+        if compression_id == 3:
+            return lz4_frame.compress(payload)
+        return zlib.compress(payload, 6)
+
+    def _decompress(self, compression_id: int, payload) -> bytes:
+        if compression_id == 2:
+            return self._zstd_decompressor.decompress(payload)
+        if compression_id == 3:
+            return lz4_frame.decompress(payload)
+        return zlib.decompress(payload)
+
+
+class LocalCache:
+    """Bounded in-process LRU cache with per-entry expiry.
+
+    Values are kept decoded and returned by reference, so callers must not
+    mutate what they get back.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 30.0,
+        on_evict: Optional[Callable[[], None]] = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value), dropping the entry if it has expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._evicted()
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evicted()
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def clear_pattern(self, pattern: str) -> None:
+        for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def _evicted(self) -> None:
+        if self.on_evict:
+            self.on_evict()
+
+
 class CacheManager:
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=os.getenv('REDIS_HOST', 'localhost'),
-            port=int(os.getenv('REDIS_PORT', '6379')),
-            decode_responses=True
+    """Two-tier cache: a per-process LocalCache (L1) in front of Redis (L2).
+
+    delete/clear_pattern are broadcast over Redis pub/sub so every replica
+    drops its L1 copy; overwrites via set are bounded by the short L1 TTL.
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        metrics=None,
+        l1_max_entries: Optional[int] = None,
+        l1_ttl: Optional[float] = None,
+        codec: Optional[CacheCodec] = None,
+    ):
+        if redis_client is not None:
+            self.redis_client = redis_client
+        elif os.getenv("CACHE_BACKEND", "redis") == "fakeredis":
+            self.redis_client = create_fake_client()
+        else:
+            self.redis_client = redis.Redis(connection_pool=get_shared_pool())
+
+        self.metrics = metrics
+        self.codec = codec or CacheCodec()
+        self.local = LocalCache(
+            max_entries=(
+                l1_max_entries
+                if l1_max_entries is not None
+                else int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+            ),
+            ttl=(
+                l1_ttl if l1_ttl is not None else float(os.getenv("CACHE_L1_TTL", "30"))
+            ),
+            on_evict=lambda: self._record("l1", "eviction"),
         )
+        self.instance_id = uuid.uuid4().hex
+        self.lock_timeout = float(os.getenv("CACHE_LOCK_TIMEOUT", "60"))
+        self._listener_task: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: set = set()
+
+    def _record(self, tier: str, event: str) -> None:
+        if self.metrics is not None:
+            self.metrics.record_cache_event(tier, event)
+
+    @staticmethod
+    def _unwrap(stored: Any) -> Any:
+        if isinstance(stored, dict) and ENVELOPE_MARKER in stored:
+            return stored["value"]
+        return stored
 
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
+        stored = await self._get_stored(key)
+        return None if stored is None else self._unwrap(stored)
+
+    async def _get_stored(self, key: str) -> Optional[Any]:
+        found, value = self.local.get(key)
+        if found:
+            self._record("l1", "hit")
+            return value
+        self._record("l1", "miss")
+
         try:
-            cached = self.redis_client.get(key)
-            if cached:
-                return json.loads(cached)
+            cached = await self.redis_client.get(key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {key}: {e}")
             return None
-        except Exception:
+
+        value = self._decode(key, cached)
+        if value is not None:
+            self._record("redis", "hit")
+            self.local.set(key, value)
+            return value
+        self._record("redis", "miss")
+        return None
+
+    def _decode(self, key: str, cached: Optional[bytes]) -> Optional[Any]:
+        """Decode a Redis payload, treating unreadable entries as misses"""
+        if not cached:
+            return None
+        try:
+            return self.codec.decode(cached)
+        except Exception as e:
+            logger.warning(f"Cache decode failed for {key}: {e}")
             return None
 
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Get several values in one round trip; missing keys are omitted"""
+        found = {}
+        remote_keys = []
+        for key in keys:
+            hit, value = self.local.get(key)
+            if hit:
+                self._record("l1", "hit")
+                found[key] = self._unwrap(value)
+            else:
+                self._record("l1", "miss")
+                remote_keys.append(key)
+        if not remote_keys:
+            return found
+
+        try:
+            values = await self.redis_client.mget(remote_keys)
+        except Exception as e:
+            logger.warning(f"Cache get_many failed: {e}")
+            return found
+
+        for key, cached in zip(remote_keys, values):
+            stored = self._decode(key, cached)
+            if stored is not None:
+                self._record("redis", "hit")
+                self.local.set(key, stored)
+                found[key] = self._unwrap(stored)
+            else:
+                self._record("redis", "miss")
+        return found
+
     async def set(self, key: str, value: Any, ttl: int = 3600) -> bool:
         """Set value in cache with TTL"""
+        self.local.set(key, value, ttl)
         try:
-            self.redis_client.setex(key, ttl, json.dumps(value))
+            await self.redis_client.setex(key, ttl, self.codec.encode(value))
             return True
-        except Exception:
+        except Exception as e:
+            logger.warning(f"Cache set failed for {key}: {e}")
+            return False
+
+    async def set_many(self, mapping: Dict[str, Any], ttl: int = 3600) -> bool:
+        """Set several values with the same TTL in one pipelined round trip"""
+        if not mapping:
+            return True
+        for key, value in mapping.items():
+            self.local.set(key, value, ttl)
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.setex(key, ttl, self.codec.encode(value))
+                await pipe.execute()
+            return True
+        except Exception as e:
+            logger.warning(f"Cache set_many failed: {e}")
             return False
 
-    async def get_or_compute(self, key: str, compute_func: Callable, ttl: int = 3600) -> Any:
-        """Get from cache or compute and store"""
-        # Check cache first
-        cached = await self.get(key)
-        if cached is not None:
-            return cached
-        
-        # Compute value
-        result = await compute_func()
-        
-        # Store in cache
-        await self.set(key, result, ttl)
-        
-        return result
+    async def get_or_compute(
+        self,
+        key: str,
+        compute_func: Callable,
+        ttl: int = 3600,
+        stale_ttl: int = 0,
+        early_refresh_beta: float = 0.0,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Get from cache or compute and store.
+
+        Concurrent misses for the same key share one compute per process, and
+        a Redis lease lock keeps other replicas waiting for that result rather
+        than computing it again. With stale_ttl, an expired value is still
+        served for that long while it is refreshed in the background. With
+        early_refresh_beta > 0, hits randomly trigger a background refresh
+        shortly before expiry (XFetch), weighted by how long compute takes.
+        Results for which cache_if returns False (e.g. error envelopes) are
+        returned to the callers waiting on this compute but not stored, and
+        never replace a stale value.
+        """
+        stored = await self._get_stored(key)
+        if isinstance(stored, dict) and ENVELOPE_MARKER in stored:
+            now = time.time()
+            fresh_until = stored["fresh_until"]
+            if now >= fresh_until:
+                self._refresh_in_background(key, compute_func, ttl, stale_ttl, cache_if)
+            elif early_refresh_beta > 0:
+                # -log(U) is exponential, so the refresh point is jittered per caller
+                jitter = (
+                    -stored["delta"]
+                    * early_refresh_beta
+                    * math.log(1.0 - random.random())
+                )
+                if now + jitter >= fresh_until:
+                    self._refresh_in_background(
+                        key, compute_func, ttl, stale_ttl, cache_if
+                    )
+            return stored["value"]
+        if stored is not None:
+            return stored
+
+        return await self._single_flight(key, compute_func, ttl, stale_ttl, cache_if)
+
+    async def _single_flight(
+        self,
+        key: str,
+        compute_func: Callable,
+        ttl: int,
+        stale_ttl: int,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            # The compute runs in its own task, so a cancelled caller (e.g. a
+            # disconnected client) neither cancels it nor fails the others
+            inflight = asyncio.ensure_future(
+                self._compute_with_lease(key, compute_func, ttl, stale_ttl, cache_if)
+            )
+            self._inflight[key] = inflight
+            inflight.add_done_callback(lambda task: self._finish_inflight(key, task))
+        return await asyncio.shield(inflight)
+
+    def _finish_inflight(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a failure nobody is left waiting for is not logged again
+            task.exception()
+
+    async def _compute_with_lease(
+        self,
+        key: str,
+        compute_func: Callable,
+        ttl: int,
+        stale_ttl: int,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        lock_key = f"{LOCK_PREFIX}{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = bool(
+                await self.redis_client.set(
+                    lock_key, token, nx=True, px=int(self.lock_timeout * 1000)
+                )
+            )
+            contended = not acquired
+        except Exception as e:
+            logger.warning(f"Cache lease unavailable for {key}: {e}")
+            acquired = contended = False
+
+        if contended:
+            # Another replica is computing; wait for it to publish the result
+            stored = await self._wait_for_remote(key, lock_key)
+            if stored is not None:
+                return self._unwrap(stored)
+            logger.warning(
+                f"No result from cache lease holder for {key}, computing locally"
+            )
+
+        try:
+            started = time.time()
+            result = await compute_func()
+            if cache_if is None or cache_if(result):
+                await self._store_envelope(
+                    key, result, ttl, stale_ttl, time.time() - started
+                )
+            return result
+        finally:
+            if acquired:
+                try:
+                    await self.redis_client.eval(
+                        _RELEASE_LOCK_SCRIPT, 1, lock_key, token
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to release cache lease for {key}: {e}")
+
+    async def _wait_for_remote(self, key: str, lock_key: str) -> Optional[Any]:
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.05
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 1.0)
+            try:
+                if await self.redis_client.exists(lock_key):
+                    continue
+                cached = await self.redis_client.get(key)
+            except Exception:
+                return None
+            stored = self._decode(key, cached)
+            if stored is not None:
+                self.local.set(key, stored)
+            return stored
+        return None
+
+    async def _store_envelope(
+        self, key: str, value: Any, ttl: int, stale_ttl: int, delta: float
+    ) -> None:
+        envelope = {
+            ENVELOPE_MARKER: 1,
+            "value": value,
+            "fresh_until": time.time() + ttl,
+            "delta": delta,
+        }
+        await self.set(key, envelope, ttl + stale_ttl)
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        compute_func: Callable,
+        ttl: int,
+        stale_ttl: int,
+        cache_if: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        if key in self._inflight:
+            return
+
+        async def refresh():
+            try:
+                await self._single_flight(key, compute_func, ttl, stale_ttl, cache_if)
+            except Exception as e:
+                logger.warning(f"Background cache refresh failed for {key}: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
 
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
+        self.local.delete(key)
         try:
-            self.redis_client.delete(key)
+            await self.redis_client.delete(key)
+            await self._publish_invalidation({"op": "delete", "key": key})
             return True
         except Exception:
             return False
 
-    async def clear_pattern(self, pattern: str) -> bool:
+    async def clear_pattern(
+        self, pattern: str, batch_size: int = 500, time_budget: float = 0.05
+    ) -> bool:
         """Clear all keys matching pattern"""
+        progress = await self._clear_pattern(
+            pattern, self._new_progress(pattern), batch_size, time_budget
+        )
+        return progress["error"] is None
+
+    def start_clear_pattern(
+        self, pattern: str, batch_size: int = 500, time_budget: float = 0.05
+    ) -> Dict[str, Any]:
+        """Clear keys matching pattern in a background task.
+
+        Returns a progress dict that is updated in place as batches complete.
+        """
+        progress = self._new_progress(pattern)
+        task = asyncio.create_task(
+            self._clear_pattern(pattern, progress, batch_size, time_budget)
+        )
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return progress
+
+    @staticmethod
+    def _new_progress(pattern: str) -> Dict[str, Any]:
+        return {
+            "pattern": pattern,
+            "batches": 0,
+            "deleted": 0,
+            "elapsed": 0.0,
+            "done": False,
+            "error": None,
+        }
+
+    async def _clear_pattern(
+        self,
+        pattern: str,
+        progress: Dict[str, Any],
+        batch_size: int,
+        time_budget: float,
+    ) -> Dict[str, Any]:
+        """SCAN + pipelined UNLINK in small batches so Redis is never blocked.
+
+        The SCAN COUNT hint halves whenever a batch overruns time_budget (and
+        we pause for as long as it took), then grows back towards batch_size.
+        """
+        self.local.clear_pattern(pattern)
+        started = time.monotonic()
+        cursor = 0
+        count = batch_size
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                self.redis_client.delete(*keys)
-            return True
-        except Exception:
-            return False
+            while True:
+                batch_started = time.monotonic()
+                cursor, keys = await self.redis_client.scan(
+                    cursor=cursor, match=pattern, count=count
+                )
+                if keys:
+                    async with self.redis_client.pipeline(transaction=False) as pipe:
+                        for i in range(0, len(keys), UNLINK_CHUNK):
+                            stop = i + UNLINK_CHUNK
+                            pipe.unlink(*keys[i:stop])
+                        progress["deleted"] += sum(await pipe.execute())
+                progress["batches"] += 1
+                progress["elapsed"] = time.monotonic() - started
+                if cursor == 0:
+                    break
+
+                batch_time = time.monotonic() - batch_started
+                if batch_time > time_budget:
+                    count = max(10, count // 2)
+                    await asyncio.sleep(batch_time)
+                else:
+                    count = min(batch_size, count * 2)
+                    await asyncio.sleep(0)
+
+            # Replicas may have refilled L1 from Redis while we were scanning
+            self.local.clear_pattern(pattern)
+            await self._publish_invalidation({"op": "pattern", "pattern": pattern})
+        except Exception as e:
+            logger.warning(f"Cache clear_pattern failed for {pattern}: {e}")
+            progress["error"] = str(e)
+        finally:
+            progress["elapsed"] = time.monotonic() - started
+            progress["done"] = True
+        return progress
+
+    async def get_generation(self, namespace: str) -> int:
+        """Current generation of a namespace, to be embedded in its keys"""
+        generation = await self.get(f"{GENERATION_PREFIX}{namespace}")
+        return int(generation or 0)
+
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """Invalidate every key built with the namespace's generation in O(1).
+
+        Bumps the generation counter so new keys no longer match old entries,
+        which then age out by TTL instead of being enumerated.
+        """
+        gen_key = f"{GENERATION_PREFIX}{namespace}"
+        generation = await self.redis_client.incr(gen_key)
+        self.local.delete(gen_key)
+        await self._publish_invalidation({"op": "delete", "key": gen_key})
+        return generation
+
+    async def _publish_invalidation(self, message: Dict[str, str]) -> None:
+        message["origin"] = self.instance_id
+        await self.redis_client.publish(INVALIDATION_CHANNEL, json.dumps(message))
+
+    def _apply_invalidation(self, data) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed cache invalidation: {data!r}")
+            return
+        if message.get("origin") == self.instance_id:
+            return
+        if message.get("op") == "delete":
+            self.local.delete(message["key"])
+        elif message.get("op") == "pattern":
+            self.local.clear_pattern(message["pattern"])
+
+    def start_invalidation_listener(self) -> None:
+        """Subscribe to cross-replica invalidations in a background task"""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self) -> None:
+        await subscribe_forever(
+            self.redis_client,
+            INVALIDATION_CHANNEL,
+            self._apply_invalidation,
+            on_subscribed=self._on_invalidations_subscribed,
+            name="Cache invalidation",
+        )
+
+    def _on_invalidations_subscribed(self, reconnected: bool) -> None:
+        if reconnected:
+            # Invalidations may have been missed while disconnected
+            self.local.clear()
+
+    async def close(self) -> None:
+        """Stop the invalidation listener and release pooled connections"""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        await self.redis_client.close()
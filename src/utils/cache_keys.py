@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+import os
+from typing import Optional
+
+from .cache import LocalCache
+
+DOC_ANALYSIS_PREFIX = "doc_analysis"
+DEFAULT_EXTRACTION_MODE = "general"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Digests keyed by file identity, so re-submitting the same file skips rehashing
+_digest_cache = LocalCache(max_entries=4096, ttl=3600)
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def file_sha256(path: str) -> str:
+    """Stream a file through SHA-256 off the event loop"""
+    stat = os.stat(path)
+    identity = (
+        f"{os.path.realpath(path)}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+    )
+    found, digest = _digest_cache.get(identity)
+    if found:
+        return digest
+
+    digest = await asyncio.to_thread(_hash_file, path)
+    _digest_cache.set(identity, digest)
+    return digest
+
+
+def normalize_extraction_mode(extraction_mode: Optional[str]) -> str:
+    """Normalize extraction_mode so equivalent requests share a key"""
+    mode = (extraction_mode or "").strip().lower()
+    return mode or DEFAULT_EXTRACTION_MODE
+
+
+def document_analysis_namespace(version: str) -> str:
+    """Key prefix shared by every analysis produced under one model/prompt version"""
+    return f"{DOC_ANALYSIS_PREFIX}:{version}"
+
+
+async def document_analysis_key(
+    document_path: str,
+    extraction_mode: Optional[str],
+    version: str,
+    generation: int = 0,
+) -> str:
+    """Build a replica-stable cache key from document content, mode and version.
+
+    The key ignores the document path, so the same bytes uploaded under
+    different names share one analysis, while changed bytes never hit a
+    stale entry. generation comes from CacheManager.get_generation for the
+    version's namespace, so a whole version can be invalidated at once.
+    """
+    digest = await file_sha256(document_path)
+    mode = normalize_extraction_mode(extraction_mode)
+    return f"{document_analysis_namespace(version)}:{generation}:{mode}:{digest}"
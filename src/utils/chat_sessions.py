@@ -0,0 +1,271 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from redis.exceptions import WatchError
+
+from .text_chunker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+SESSION_PREFIX = "chat:session:"
+ACTIVE_SESSIONS_KEY = "chat:sessions:active"
+
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of an onboarding conversation between a client "
+    "and an assistant. Merge the new turns into the existing summary. Keep every "
+    "fact the client has provided, open questions and documents still outstanding; "
+    "drop pleasantries. Reply with the updated summary only."
+)
+SUMMARY_PROMPT_VERSION = "1"
+
+ROLES = {"u": "user", "a": "assistant"}
+
+
+def session_id(owner: str, client_id: str) -> str:
+    """Session a client's conversation is stored under, scoped to the calling user.
+
+    A caller passing someone else's client_id gets a separate, empty
+    conversation. Both parts are quoted so ("a:b", "c") and ("a", "b:c")
+    cannot collide.
+    """
+    return f"{quote(owner, safe='')}:{quote(client_id, safe='')}"
+
+
+class ChatSessionStore:
+    """Conversation history per session_id in Redis, bounded by a token budget.
+
+    Each session is a list of compact turns ({"r": "u"|"a", "t": text,
+    "n": tokens}) appended with RPUSH, plus a hash holding a rolling
+    summary of turns that have been compacted away. A prompt gets the
+    summary and as many of the newest turns as fit in
+    CHAT_HISTORY_TOKEN_BUDGET. When the stored turns outgrow the budget,
+    the oldest ones are folded into the summary (by the LLM when one is
+    available) and trimmed from the list in a background task, so both
+    storage and prompts stay bounded however long the conversation runs.
+
+    Sessions expire after CHAT_SESSION_IDLE_TTL seconds without a turn. A
+    sorted set of last-activity times backs the active_onboarding_sessions
+    gauge, refreshed on every turn and by a periodic sweep.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        llm=None,
+        metrics=None,
+        token_budget: Optional[int] = None,
+        idle_ttl: Optional[int] = None,
+    ):
+        self.redis_client = redis_client
+        self.llm = llm
+        self.metrics = metrics
+        self.token_budget = token_budget or int(
+            os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000")
+        )
+        # After compaction, summary (<= 1/4) plus kept turns (<= 1/2) leave room to grow
+        self.summary_max_tokens = min(
+            int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400")), self.token_budget // 4
+        )
+        self.idle_ttl = idle_ttl or int(os.getenv("CHAT_SESSION_IDLE_TTL", "1800"))
+        self.sweep_interval = float(os.getenv("CHAT_SESSION_SWEEP_INTERVAL", "60"))
+        self._compacting: set = set()
+        self._background: set = set()
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _turns_key(client_id: str) -> str:
+        return f"{SESSION_PREFIX}{client_id}:turns"
+
+    @staticmethod
+    def _meta_key(client_id: str) -> str:
+        return f"{SESSION_PREFIX}{client_id}:meta"
+
+    async def _load(self, client_id: str) -> Tuple[str, List[Dict[str, Any]]]:
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hget(self._meta_key(client_id), "summary")
+            pipe.lrange(self._turns_key(client_id), 0, -1)
+            summary, raw_turns = await pipe.execute()
+        if isinstance(summary, bytes):
+            summary = summary.decode()
+        return summary or "", [json.loads(turn) for turn in raw_turns]
+
+    async def get_context(self, client_id: str) -> Tuple[str, List[Dict[str, str]]]:
+        """(summary, newest messages) that together fit the token budget"""
+        summary, turns = await self._load(client_id)
+        budget = self.token_budget - estimate_tokens(summary)
+        selected: List[Dict[str, Any]] = []
+        for turn in reversed(turns):
+            if turn["n"] > budget:
+                break
+            budget -= turn["n"]
+            selected.append(turn)
+        selected.reverse()
+        # The Messages API expects the conversation to open with a user turn
+        while selected and selected[0]["r"] != "u":
+            selected.pop(0)
+        return summary, [
+            {"role": ROLES[turn["r"]], "content": turn["t"]} for turn in selected
+        ]
+
+    async def append(self, client_id: str, user_text: str, assistant_text: str) -> None:
+        """Record one exchange, refresh the idle timeout and compact if over budget"""
+        turns = [
+            {"r": role, "t": text, "n": estimate_tokens(text)}
+            for role, text in (("u", user_text), ("a", assistant_text))
+        ]
+        meta_key = self._meta_key(client_id)
+        now = time.time()
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.rpush(
+                self._turns_key(client_id),
+                *(json.dumps(turn, separators=(",", ":")) for turn in turns),
+            )
+            pipe.hsetnx(meta_key, "created_at", now)
+            # Running token count of stored turns, so budget checks need no reload
+            pipe.hincrby(meta_key, "tokens", sum(turn["n"] for turn in turns))
+            pipe.hget(meta_key, "summary_tokens")
+            pipe.expire(self._turns_key(client_id), self.idle_ttl)
+            pipe.expire(meta_key, self.idle_ttl)
+            pipe.zadd(ACTIVE_SESSIONS_KEY, {client_id: now})
+            pipe.zcount(ACTIVE_SESSIONS_KEY, now - self.idle_ttl, "+inf")
+            results = await pipe.execute()
+        self._set_gauge(results[-1])
+        if results[2] + int(results[3] or 0) > self.token_budget:
+            self._schedule_compaction(client_id)
+
+    def _schedule_compaction(self, client_id: str) -> None:
+        if client_id in self._compacting:
+            return
+        self._compacting.add(client_id)
+        task = asyncio.ensure_future(self._compact(client_id))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _compact(self, client_id: str) -> None:
+        try:
+            summary, turns = await self._load(client_id)
+            total = estimate_tokens(summary) + sum(turn["n"] for turn in turns)
+            if total <= self.token_budget:
+                return
+            # Fold the oldest turns in until what is left fits half the budget
+            keep_budget = self.token_budget // 2
+            kept = 0
+            split = len(turns)
+            while split > 0 and kept + turns[split - 1]["n"] <= keep_budget:
+                split -= 1
+                kept += turns[split]["n"]
+            if split == 0:
+                return
+            new_summary = await self.summarize(summary, turns[:split])
+            await self._replace_prefix(client_id, summary, new_summary, turns[:split])
+        except Exception as e:
+            logger.warning(f"Chat session compaction failed for {client_id}: {e}")
+        finally:
+            self._compacting.discard(client_id)
+
+    async def _replace_prefix(
+        self,
+        client_id: str,
+        old_summary: str,
+        new_summary: str,
+        folded: List[Dict[str, Any]],
+    ) -> None:
+        """Swap the folded turns for the summary unless another replica did first"""
+        meta_key = self._meta_key(client_id)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(meta_key)
+                current = await pipe.hget(meta_key, "summary")
+                if isinstance(current, bytes):
+                    current = current.decode()
+                if (current or "") != old_summary:
+                    return
+                pipe.multi()
+                pipe.hset(
+                    meta_key,
+                    mapping={
+                        "summary": new_summary,
+                        "summary_tokens": estimate_tokens(new_summary),
+                    },
+                )
+                pipe.hincrby(meta_key, "tokens", -sum(turn["n"] for turn in folded))
+                pipe.ltrim(self._turns_key(client_id), len(folded), -1)
+                await pipe.execute()
+            except WatchError:
+                pass
+
+    async def summarize(self, summary: str, turns: List[Dict[str, Any]]) -> str:
+        transcript = "\n".join(f"{ROLES[turn['r']]}: {turn['t']}" for turn in turns)
+        if self.llm is not None and self.llm.available:
+            return await self.llm.complete(
+                tool="chat_summary",
+                prompt_version=SUMMARY_PROMPT_VERSION,
+                max_tokens=self.summary_max_tokens,
+                temperature=0,
+                system=SUMMARY_SYSTEM_PROMPT,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": (
+                            f"Summary so far:\n{summary or '(none)'}\n\n"
+                            f"New turns:\n{transcript}"
+                        ),
+                    }
+                ],
+            )
+        # Without an LLM keep the most recent text that fits the summary budget
+        combined = f"{summary}\n{transcript}".strip()
+        budget = self.summary_max_tokens * 4
+        return combined[-budget:]
+
+    async def delete(self, client_id: str) -> None:
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._turns_key(client_id), self._meta_key(client_id))
+            pipe.zrem(ACTIVE_SESSIONS_KEY, client_id)
+            await pipe.execute()
+        await self.evict_idle()
+
+    async def evict_idle(self) -> int:
+        """Drop sessions idle past the TTL from the active set; return the live count.
+
+        The session keys themselves are left to their idle_ttl EXPIRE: deleting
+        them here could race with a turn appended after the scan and wipe a
+        session that is active again.
+        """
+        cutoff = time.time() - self.idle_ttl
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.zremrangebyscore(ACTIVE_SESSIONS_KEY, "-inf", cutoff)
+            pipe.zcard(ACTIVE_SESSIONS_KEY)
+            _, live = await pipe.execute()
+        self._set_gauge(live)
+        return live
+
+    def _set_gauge(self, live: int) -> None:
+        if self.metrics is not None:
+            self.metrics.active_sessions.set(live)
+
+    async def _sweep(self) -> None:
+        while True:
+            try:
+                await self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Chat session sweep failed: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    def start(self) -> None:
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def close(self) -> None:
+        tasks = list(self._background)
+        if self._sweeper is not None:
+            tasks.append(self._sweeper)
+            self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
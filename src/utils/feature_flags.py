@@ -1,58 +1,237 @@
+import asyncio
 import hashlib
-from typing import Dict, Any
+import logging
+import os
+from typing import Dict, Optional, Set, Tuple
 
-class FeatureFlags:
-    def __init__(self):
-        self.flags = {
-            "genai_analysis": 1.0,  # 100% enabled
-            "multi_agent_system": 0.1,  # 10% gradual rollout
-            "conversational_ui": 0.5,  # 50% of users
-            "batch_processing": 0.2,  # 20% of users
-            "advanced_risk_scoring": 0.05,  # 5% beta testing
-            "real_time_compliance": 0.3,  # 30% of users
+from .cache import LocalCache, subscribe_forever
+
+logger = logging.getLogger(__name__)
+
+ROLLOUT_KEY = "feature_flags:rollout"
+VERSION_KEY = "feature_flags:version"
+FLAGS_CHANNEL = "feature_flags:updated"
+
+DEFAULT_FLAGS = {
+    "genai_analysis": 1.0,  # 100% enabled
+    "multi_agent_system": 0.1,  # 10% gradual rollout
+    "conversational_ui": 0.5,  # 50% of users
+    "batch_processing": 0.2,  # 20% of users
+    "advanced_risk_scoring": 0.05,  # 5% beta testing
+    "real_time_compliance": 0.3,  # 30% of users
+}
+
+
+class FlagSnapshot:
+    """Immutable, versioned rollout percentages with a fixed bit per flag"""
+
+    def __init__(
+        self,
+        version: int,
+        flags: Dict[str, float],
+        previous: Optional["FlagSnapshot"] = None,
+    ):
+        self.version = version
+        self.flags = dict(flags)
+        # Keep existing flags on their bits so a bitset stays readable across a reload
+        self.masks = {
+            f: mask
+            for f, mask in (previous.masks if previous else {}).items()
+            if f in self.flags
         }
-    
+        next_bit = max(self.masks.values(), default=0).bit_length()
+        for feature in sorted(self.flags):
+            if feature not in self.masks:
+                self.masks[feature] = 1 << next_bit
+                next_bit += 1
+
+
+class FeatureFlags:
+    """Percentage rollouts evaluated as one bitset per user.
+
+    The current FlagSnapshot lives in Redis (a hash of percentages plus a
+    version counter, updated in one transaction) and replicas reload it
+    when an update is announced over pub/sub. A user's hash buckets never
+    change, so they are computed once and kept in a bounded LRU together
+    with the bitset for the snapshot version they were evaluated against;
+    after the first call every flag check for that user is a dict lookup
+    and a bit test.
+    """
+
+    def __init__(self, redis_client=None, user_cache_size: Optional[int] = None):
+        self.redis_client = redis_client
+        self.snapshot = FlagSnapshot(0, DEFAULT_FLAGS)
+        # user_id -> (buckets by feature, snapshot version, bitset)
+        self._users = LocalCache(
+            max_entries=(
+                user_cache_size
+                if user_cache_size is not None
+                else int(os.getenv("FEATURE_FLAG_USER_CACHE_SIZE", "50000"))
+            ),
+            ttl=float("inf"),
+        )
+        self._listener_task: Optional[asyncio.Task] = None
+        self._pending_updates: Set[asyncio.Task] = set()
+
+    @property
+    def flags(self) -> Dict[str, float]:
+        return self.snapshot.flags
+
+    def evaluate(self, user_id: str) -> int:
+        """Bitset of the flags enabled for a user under the current snapshot"""
+        snapshot = self.snapshot
+        found, entry = self._users.get(user_id)
+        if found and entry[1] == snapshot.version:
+            return entry[2]
+
+        buckets = dict(entry[0]) if found else {}
+        bits = 0
+        for feature, rollout_percentage in snapshot.flags.items():
+            # If 100% rollout, always enabled; if 0% rollout, always disabled
+            if rollout_percentage >= 1.0:
+                enabled = True
+            elif rollout_percentage <= 0.0:
+                enabled = False
+            else:
+                if feature not in buckets:
+                    buckets[feature] = self._hash_user_feature(user_id, feature)
+                enabled = buckets[feature] < rollout_percentage
+            if enabled:
+                bits |= snapshot.masks[feature]
+        self._users.set(user_id, (buckets, snapshot.version, bits))
+        return bits
+
+    def is_set(self, bits: int, feature: str) -> bool:
+        """Test a flag in a bitset returned by evaluate"""
+        mask = self.snapshot.masks.get(feature)
+        return mask is not None and bool(bits & mask)
+
     def is_enabled(self, feature: str, user_id: str) -> bool:
         """Check if feature is enabled for a specific user"""
-        if feature not in self.flags:
+        if feature not in self.snapshot.masks:
             return False
-        
-        # Get the rollout percentage for this feature
-        rollout_percentage = self.flags[feature]
-        
-        # If 100% rollout, always enabled
-        if rollout_percentage >= 1.0:
-            return True
-        
-        # If 0% rollout, always disabled
-        if rollout_percentage <= 0.0:
-            return False
-        
-        # Use consistent hashing for gradual rollout
-        hash_value = self._hash_user_feature(user_id, feature)
-        return hash_value < rollout_percentage
-    
+        return self.is_set(self.evaluate(user_id), feature)
+
     def _hash_user_feature(self, user_id: str, feature: str) -> float:
         """Generate consistent hash for user+feature combination"""
         combined = f"{user_id}:{feature}"
         hash_bytes = hashlib.md5(combined.encode()).digest()
-        hash_int = int.from_bytes(hash_bytes[:4], byteorder='big')
+        hash_int = int.from_bytes(hash_bytes[:4], byteorder="big")
         return hash_int / (2**32)  # Normalize to 0-1 range
-    
+
     def update_flag(self, feature: str, percentage: float) -> bool:
-        """Update feature flag percentage"""
-        if 0.0 <= percentage <= 1.0:
-            self.flags[feature] = percentage
+        """Update feature flag percentage on every replica.
+
+        Stays synchronous for existing callers: without Redis the local
+        snapshot changes at once, with Redis the shared write is scheduled on
+        the running loop. Await publish_flag to know the update has landed.
+        """
+        if not 0.0 <= percentage <= 1.0:
+            return False
+        if self.redis_client is None:
+            self._apply_local(feature, percentage)
+            return True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            raise RuntimeError(
+                "update_flag with Redis needs a running event loop; "
+                "await publish_flag instead"
+            ) from None
+        task = loop.create_task(self.publish_flag(feature, percentage))
+        self._pending_updates.add(task)
+        task.add_done_callback(self._update_done)
+        return True
+
+    def _update_done(self, task: asyncio.Task) -> None:
+        self._pending_updates.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Feature flag update failed: {task.exception()}")
+
+    def _apply_local(self, feature: str, percentage: float) -> None:
+        self.snapshot = FlagSnapshot(
+            self.snapshot.version + 1,
+            {**self.snapshot.flags, feature: percentage},
+            self.snapshot,
+        )
+
+    async def publish_flag(self, feature: str, percentage: float) -> bool:
+        """Update feature flag percentage and wait until it is shared"""
+        if not 0.0 <= percentage <= 1.0:
+            return False
+        if self.redis_client is None:
+            self._apply_local(feature, percentage)
             return True
-        return False
-    
+
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(ROLLOUT_KEY, feature, percentage)
+            pipe.incr(VERSION_KEY)
+            _, version = await pipe.execute()
+        await self.redis_client.publish(FLAGS_CHANNEL, version)
+        await self.load()
+        return True
+
+    async def load(self) -> FlagSnapshot:
+        """Load the shared snapshot, seeding Redis with the defaults on first use"""
+        if self.redis_client is None:
+            return self.snapshot
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            for feature, percentage in DEFAULT_FLAGS.items():
+                pipe.hsetnx(ROLLOUT_KEY, feature, percentage)
+            pipe.hgetall(ROLLOUT_KEY)
+            pipe.get(VERSION_KEY)
+            results = await pipe.execute()
+        flags, version = self._decode(results[-2], results[-1])
+        # Pub/sub and reloads can race; never go back to an older snapshot
+        if version >= self.snapshot.version:
+            self.snapshot = FlagSnapshot(version, flags, self.snapshot)
+        return self.snapshot
+
+    @staticmethod
+    def _decode(raw_flags, raw_version) -> Tuple[Dict[str, float], int]:
+        flags = {
+            (k.decode() if isinstance(k, bytes) else k): float(v)
+            for k, v in raw_flags.items()
+        }
+        return flags, int(raw_version or 0)
+
+    def start_listener(self) -> None:
+        """Reload the snapshot whenever another replica announces an update"""
+        if self.redis_client is None:
+            return
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen_for_updates())
+
+    async def _listen_for_updates(self) -> None:
+        # Every (re)subscribe reloads, catching up on anything published before it
+        await subscribe_forever(
+            self.redis_client,
+            FLAGS_CHANNEL,
+            self._on_update,
+            on_subscribed=lambda reconnected: self.load(),
+            name="Feature flag",
+        )
+
+    async def _on_update(self, data) -> None:
+        if int(data) > self.snapshot.version:
+            await self.load()
+
+    async def close(self) -> None:
+        if self._pending_updates:
+            await asyncio.gather(*self._pending_updates, return_exceptions=True)
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+
     def get_all_flags(self) -> Dict[str, float]:
         """Get all feature flags"""
-        return self.flags.copy()
-    
+        return self.snapshot.flags.copy()
+
     def get_user_flags(self, user_id: str) -> Dict[str, bool]:
         """Get all flags for a specific user"""
-        return {
-            feature: self.is_enabled(feature, user_id)
-            for feature in self.flags
-        }
+        bits = self.evaluate(user_id)
+        return {feature: self.is_set(bits, feature) for feature in self.snapshot.flags}
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+LLM_CACHE_PREFIX = "llm"
+
+# Seconds a response is reused, per calling tool; override with LLM_CACHE_TTLS as JSON
+DEFAULT_TTLS = {
+    "document_analysis": int(os.getenv("LLM_CHUNK_CACHE_TTL", str(7 * 86400))),
+    "risk_insights": 86400,
+    "chat": 3600,
+}
+
+# Request parameters that only change transport behaviour, not the answer
+_IGNORED_PARAMS = {
+    "stream",
+    "timeout",
+    "extra_headers",
+    "extra_query",
+    "extra_body",
+    "metadata",
+}
+
+
+def is_cacheable(params: Dict[str, Any]) -> bool:
+    """Only greedy decoding is deterministic enough to reuse; the API default is 1"""
+    return params.get("temperature") == 0 and not params.get("stream")
+
+
+def llm_cache_key(tool: str, params: Dict[str, Any], prompt_version: str = "") -> str:
+    """Canonical hash of model, prompt version, system prompt, messages and sampling"""
+    canonical = json.dumps(
+        {
+            "prompt_version": prompt_version,
+            **{k: v for k, v in params.items() if k not in _IGNORED_PARAMS},
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=str,
+    )
+    return f"{LLM_CACHE_PREFIX}:{tool}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+class LLMResponseCache:
+    """Response cache for deterministic LLM calls.
+
+    Entries live in the shared CacheManager, whose L1 keeps hot replies
+    in process (and drops them on pub/sub invalidation) and whose
+    single-flight collapses concurrent identical prompts into one call.
+    Lookups are recorded as hit, miss, coalesced (waited on another
+    caller's call) or bypass. Entries hold the reply text and its token
+    usage so hits can be reported as tokens saved.
+    """
+
+    def __init__(self, cache, metrics=None, ttls: Optional[Dict[str, int]] = None):
+        self.cache = cache
+        self.metrics = metrics
+        self.ttls = {
+            **DEFAULT_TTLS,
+            **json.loads(os.getenv("LLM_CACHE_TTLS", "{}")),
+            **(ttls or {}),
+        }
+
+    def ttl_for(self, tool: str) -> int:
+        return int(self.ttls.get(tool, os.getenv("LLM_CACHE_DEFAULT_TTL", "3600")))
+
+    def _record(
+        self, tool: str, result: str, entry: Optional[Dict[str, Any]] = None
+    ) -> None:
+        if self.metrics is None:
+            return
+        self.metrics.record_llm_cache(
+            tool,
+            result,
+            input_tokens=entry.get("input_tokens", 0) if entry else 0,
+            output_tokens=entry.get("output_tokens", 0) if entry else 0,
+        )
+
+    async def lookup(
+        self, tool: str, params: Dict[str, Any], prompt_version: str
+    ) -> Optional[Dict[str, Any]]:
+        """Cached entry for a request, or None; for callers that fill it with store()"""
+        if not is_cacheable(params):
+            self._record(tool, "bypass")
+            return None
+        entry = await self.cache.get(llm_cache_key(tool, params, prompt_version))
+        self._record(tool, "miss" if entry is None else "hit", entry)
+        return entry
+
+    async def store(
+        self,
+        tool: str,
+        params: Dict[str, Any],
+        prompt_version: str,
+        entry: Dict[str, Any],
+    ) -> None:
+        if not is_cacheable(params):
+            return
+        key = llm_cache_key(tool, params, prompt_version)
+        await self.cache.set(key, entry, ttl=self.ttl_for(tool))
+
+    async def get_or_complete(
+        self,
+        tool: str,
+        params: Dict[str, Any],
+        prompt_version: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Tuple[Dict[str, Any], bool]:
+        """(entry, reused); compute returns {"text", "input_tokens", "output_tokens"}"""
+        if not is_cacheable(params):
+            self._record(tool, "bypass")
+            return await compute(), False
+
+        key = llm_cache_key(tool, params, prompt_version)
+        entry = await self.cache.get(key)
+        if entry is not None:
+            self._record(tool, "hit", entry)
+            return entry, True
+
+        computed = False
+
+        async def compute_once():
+            nonlocal computed
+            computed = True
+            return await compute()
+
+        entry = await self.cache.get_or_compute(
+            key, compute_once, ttl=self.ttl_for(tool)
+        )
+        # Single-flight followers share the leader's call without reading the cache
+        self._record(tool, "miss" if computed else "coalesced")
+        return entry, not computed
@@ -0,0 +1,594 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from anthropic import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncAnthropic,
+)
+
+from .llm_cache import LLMResponseCache
+from .text_chunker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Provider statuses that mean "too much load": back off and shrink concurrency
+OVERLOAD_STATUSES = {429, 503, 529}
+
+
+class TokenBucket:
+    """Refills rate units per second up to capacity; waiters are served in order"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def try_acquire(self, amount: float) -> bool:
+        if self._lock.locked():
+            return False
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens < amount:
+            return False
+        self.tokens -= amount
+        return True
+
+    async def acquire(self, amount: float) -> None:
+        # A request larger than the bucket would never fit; let it drain the bucket
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def refund(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit.
+
+    Each success raises the limit by 1/limit (about +1 per round of
+    requests) up to max_limit; an overload signal from the provider
+    multiplies it by backoff, down to min_limit.
+    """
+
+    def __init__(
+        self,
+        initial: float,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        backoff: float = 0.5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.limit = max(min_limit, min(initial, max_limit))
+        self.in_flight = 0
+        self._waiters: deque = deque()
+
+    def try_acquire(self) -> bool:
+        if self._waiters or self.in_flight >= int(self.limit):
+            return False
+        self.in_flight += 1
+        return True
+
+    async def acquire(self) -> None:
+        if self.try_acquire():
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as we were cancelled; pass it on
+                self.release_slot()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self, overloaded: bool = False) -> None:
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self.release_slot()
+
+    def release_slot(self) -> None:
+        """Give a slot back without counting it as a success or an overload"""
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class LatencyTracker:
+    """Recent request latencies, for picking when to hedge"""
+
+    def __init__(
+        self, window: int = 256, quantile: float = 0.95, min_samples: int = 20
+    ):
+        self.samples: deque = deque(maxlen=window)
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self._cached: Optional[float] = None
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._cached = None
+
+    def threshold(self) -> Optional[float]:
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._cached is None:
+            ordered = sorted(self.samples)
+            self._cached = ordered[
+                min(len(ordered) - 1, int(len(ordered) * self.quantile))
+            ]
+        return self._cached
+
+
+class ModelLimits:
+    """Rate limits, adaptive concurrency and latency history for one model"""
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        max_concurrency: int,
+        hedge_quantile: float,
+    ):
+        self.requests = TokenBucket(requests_per_minute / 60, requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+        self.concurrency = AdaptiveLimiter(
+            initial=max_concurrency, max_limit=max_concurrency
+        )
+        self.latency = LatencyTracker(quantile=hedge_quantile)
+        # Set from a provider Retry-After so every caller pauses, not just the one told
+        self.blocked_until = 0.0
+
+    async def reserve(self, tokens: int) -> None:
+        delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+        await self.concurrency.acquire()
+
+    def try_reserve(self, tokens: int) -> bool:
+        """Reserve only if it needs no wait, so a hedge never queues behind real work"""
+        if self.blocked_until > time.monotonic() or not self.concurrency.try_acquire():
+            return False
+        if not self.requests.try_acquire(1):
+            self.concurrency.release_slot()
+            return False
+        if not self.tokens.try_acquire(tokens):
+            self.requests.refund(1)
+            self.concurrency.release_slot()
+            return False
+        return True
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, APIStatusError):
+        return error.status_code in OVERLOAD_STATUSES or error.status_code >= 500
+    return isinstance(error, APIConnectionError)
+
+
+def _is_overload(error: Exception) -> bool:
+    if isinstance(error, APIStatusError):
+        return error.status_code in OVERLOAD_STATUSES
+    return isinstance(error, APITimeoutError)
+
+
+class LLMGateway:
+    """One pooled Anthropic client shared by every tool.
+
+    Each model gets request and token buckets (LLM_REQUESTS_PER_MINUTE,
+    LLM_TOKENS_PER_MINUTE, overridable per model with LLM_MODEL_LIMITS as
+    JSON) and an AIMD concurrency limit capped at LLM_MAX_CONCURRENCY.
+    Overloaded, 5xx and connection failures are retried with full-jitter
+    exponential backoff, honouring Retry-After. A request still running
+    after the model's recent p95 latency is hedged with a second attempt
+    when a slot and rate budget are free right away and the hedge budget
+    (LLM_HEDGE_BUDGET, a fraction of requests) allows; the first answer
+    wins and the other attempt is cancelled.
+
+    Given a cache, complete() reuses replies to identical deterministic
+    (temperature 0) requests through an LLMResponseCache.
+    """
+
+    def __init__(
+        self,
+        client: Optional[AsyncAnthropic] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        default_model: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        hedge_budget: Optional[float] = None,
+        cache=None,
+        metrics=None,
+    ):
+        self.default_model = default_model or os.getenv(
+            "ANTHROPIC_MODEL", "claude-3-sonnet-20240229"
+        )
+        self.max_concurrency = max_concurrency or int(
+            os.getenv("LLM_MAX_CONCURRENCY", "4")
+        )
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        )
+        self.base_backoff = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+        self.max_backoff = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+        self.hedge_budget = (
+            hedge_budget
+            if hedge_budget is not None
+            else float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+        )
+        self.hedge_quantile = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+        self.requests_per_minute = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "50"))
+        self.tokens_per_minute = float(os.getenv("LLM_TOKENS_PER_MINUTE", "40000"))
+        self.model_overrides: Dict[str, Dict[str, float]] = json.loads(
+            os.getenv("LLM_MODEL_LIMITS", "{}")
+        )
+        self._limits: Dict[str, ModelLimits] = {}
+        self.response_cache = (
+            LLMResponseCache(cache, metrics) if cache is not None else None
+        )
+        self.counters = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "overloaded": 0,
+            "failures": 0,
+        }
+
+        self.http_client = None
+        if client is None:
+            api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+            if api_key:
+                # One keep-alive pool for every tool; retries are ours, not the SDK's
+                self.http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+                        max_keepalive_connections=int(
+                            os.getenv("LLM_MAX_KEEPALIVE", "20")
+                        ),
+                    ),
+                    timeout=httpx.Timeout(
+                        float(os.getenv("LLM_TIMEOUT", "60")), connect=5.0
+                    ),
+                )
+                client = AsyncAnthropic(
+                    api_key=api_key,
+                    base_url=base_url or os.getenv("ANTHROPIC_BASE_URL"),
+                    http_client=self.http_client,
+                    max_retries=0,
+                )
+        self.client = client
+
+    @property
+    def available(self) -> bool:
+        return self.client is not None
+
+    def limits(self, model: str) -> ModelLimits:
+        limits = self._limits.get(model)
+        if limits is None:
+            override = self.model_overrides.get(model, {})
+            limits = ModelLimits(
+                requests_per_minute=override.get(
+                    "requests_per_minute", self.requests_per_minute
+                ),
+                tokens_per_minute=override.get(
+                    "tokens_per_minute", self.tokens_per_minute
+                ),
+                max_concurrency=int(
+                    override.get("max_concurrency", self.max_concurrency)
+                ),
+                hedge_quantile=self.hedge_quantile,
+            )
+            self._limits[model] = limits
+        return limits
+
+    @staticmethod
+    def estimate_request_tokens(params: Dict[str, Any]) -> int:
+        text = params.get("system") or ""
+        for message in params.get("messages", []):
+            content = message.get("content")
+            if isinstance(content, str):
+                text += content
+            else:
+                text += "".join(block.get("text", "") for block in content or [])
+        return estimate_tokens(text) + params.get("max_tokens", 0)
+
+    async def create_message(self, hedge: bool = True, **params) -> Any:
+        """messages.create through the rate limits, retries and hedging.
+
+        Pass hedge=False for calls that must not be sent twice.
+        """
+        if self.client is None:
+            raise RuntimeError(
+                "LLM gateway has no client configured (set ANTHROPIC_API_KEY)"
+            )
+        params.setdefault("model", self.default_model)
+        limits = self.limits(params["model"])
+        tokens = self.estimate_request_tokens(params)
+        self.counters["requests"] += 1
+
+        attempt = 0
+        while True:
+            try:
+                return await self._hedged(limits, params, tokens, hedge)
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                attempt += 1
+                await self._wait_before_retry(limits, params["model"], e, attempt)
+
+    async def _wait_before_retry(
+        self, limits: ModelLimits, model: str, error: Exception, attempt: int
+    ) -> None:
+        self.counters["retries"] += 1
+        delay = _retry_after(error)
+        if delay is not None:
+            limits.blocked_until = max(limits.blocked_until, time.monotonic() + delay)
+        else:
+            delay = random.uniform(
+                0, min(self.max_backoff, self.base_backoff * 2**attempt)
+            )
+        logger.warning(
+            f"LLM call to {model} failed ({error}); retry {attempt} in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+    async def complete(
+        self,
+        tool: Optional[str] = None,
+        prompt_version: str = "",
+        hedge: bool = True,
+        **params,
+    ) -> str:
+        """Text of the reply's text blocks.
+
+        tool names the caller for the response cache (its TTL and metric
+        labels); without it, or without a cache, every call reaches the LLM.
+        """
+
+        async def compute() -> Dict[str, Any]:
+            response = await self.create_message(hedge=hedge, **params)
+            usage = getattr(response, "usage", None)
+            return {
+                "text": "".join(
+                    block.text for block in response.content if block.type == "text"
+                ),
+                "input_tokens": usage.input_tokens if usage else 0,
+                "output_tokens": usage.output_tokens if usage else 0,
+            }
+
+        if tool is None or self.response_cache is None:
+            return (await compute())["text"]
+        params.setdefault("model", self.default_model)
+        entry, _ = await self.response_cache.get_or_complete(
+            tool, params, prompt_version, compute
+        )
+        return entry["text"]
+
+    async def stream(
+        self, tool: Optional[str] = None, prompt_version: str = "", **params
+    ) -> AsyncIterator[str]:
+        """Yield reply text deltas as the model produces them.
+
+        Goes through the same rate limits and concurrency slots as
+        create_message. Failures before the first delta are retried;
+        after it they are raised, since the caller has already sent text
+        on. Closing the generator early (e.g. the client disconnected)
+        closes the upstream HTTP stream and frees the slot at once. A
+        cached reply is yielded as one delta; a completed stream fills
+        the cache. Streams are never hedged.
+        """
+        if self.client is None:
+            raise RuntimeError(
+                "LLM gateway has no client configured (set ANTHROPIC_API_KEY)"
+            )
+        params.setdefault("model", self.default_model)
+        cache = self.response_cache if tool is not None else None
+        if cache is not None:
+            entry = await cache.lookup(tool, params, prompt_version)
+            if entry is not None:
+                yield entry["text"]
+                return
+
+        limits = self.limits(params["model"])
+        tokens = self.estimate_request_tokens(params)
+        self.counters["requests"] += 1
+        attempt = 0
+        while True:
+            await limits.reserve(tokens)
+            self.counters["attempts"] += 1
+            parts: List[str] = []
+            start = time.monotonic()
+            try:
+                async with self.client.messages.stream(**params) as upstream:
+                    async for text in upstream.text_stream:
+                        parts.append(text)
+                        yield text
+                    message = await upstream.get_final_message()
+            except Exception as e:
+                overloaded = _is_overload(e)
+                if overloaded:
+                    self.counters["overloaded"] += 1
+                limits.concurrency.release(overloaded)
+                if parts or not _is_retryable(e) or attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                attempt += 1
+                await self._wait_before_retry(limits, params["model"], e, attempt)
+                continue
+            except BaseException:
+                # Cancelled or closed by the consumer
+                limits.concurrency.release_slot()
+                raise
+            break
+
+        limits.concurrency.release()
+        limits.latency.record(time.monotonic() - start)
+        usage = message.usage
+        limits.tokens.refund(max(0, tokens - usage.input_tokens - usage.output_tokens))
+        if cache is not None:
+            await cache.store(
+                tool,
+                params,
+                prompt_version,
+                {
+                    "text": "".join(parts),
+                    "input_tokens": usage.input_tokens,
+                    "output_tokens": usage.output_tokens,
+                },
+            )
+
+    async def _hedged(
+        self, limits: ModelLimits, params: Dict[str, Any], tokens: int, hedge: bool
+    ) -> Any:
+        await limits.reserve(tokens)
+        primary = asyncio.ensure_future(self._send(limits, params, tokens))
+        delay = limits.latency.threshold() if hedge and self.hedge_budget > 0 else None
+        if delay is None:
+            return await primary
+
+        attempts: List[asyncio.Future] = [primary]
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=delay)
+            if not done and self._may_hedge() and limits.try_reserve(tokens):
+                self.counters["hedges"] += 1
+                attempts.append(
+                    asyncio.ensure_future(self._send(limits, params, tokens))
+                )
+            pending = set(attempts)
+            while True:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    if winner is not primary:
+                        self.counters["hedge_wins"] += 1
+                    return winner.result()
+                if not pending:
+                    # Both failed; surface the primary's error for the retry decision
+                    return primary.result()
+        finally:
+            losers = [task for task in attempts if not task.done()]
+            for task in losers:
+                task.cancel()
+            # Let the cancelled attempts hand their slots back before returning
+            await asyncio.gather(*losers, return_exceptions=True)
+
+    def _may_hedge(self) -> bool:
+        return self.counters["hedges"] < self.hedge_budget * self.counters["requests"]
+
+    async def _send(
+        self, limits: ModelLimits, params: Dict[str, Any], tokens: int
+    ) -> Any:
+        """One attempt; the caller has already reserved rate budget and a slot"""
+        self.counters["attempts"] += 1
+        start = time.monotonic()
+        try:
+            response = await self.client.messages.create(**params)
+        except asyncio.CancelledError:
+            # A cancelled hedge or caller says nothing about provider health
+            limits.concurrency.release_slot()
+            raise
+        except Exception as e:
+            overloaded = _is_overload(e)
+            if overloaded:
+                self.counters["overloaded"] += 1
+            limits.concurrency.release(overloaded)
+            raise
+        limits.concurrency.release()
+        limits.latency.record(time.monotonic() - start)
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            # Return what the estimate over-reserved (mostly unused max_tokens)
+            limits.tokens.refund(
+                max(0, tokens - usage.input_tokens - usage.output_tokens)
+            )
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            "models": {
+                model: {
+                    "concurrency_limit": round(limits.concurrency.limit, 2),
+                    "in_flight": limits.concurrency.in_flight,
+                    "hedge_after": limits.latency.threshold(),
+                }
+                for model, limits in self._limits.items()
+            },
+        }
+
+    async def close(self) -> None:
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+
+_shared_gateway: Optional[LLMGateway] = None
+
+
+def get_shared_gateway(**kwargs) -> LLMGateway:
+    """Get (or create) the process-wide gateway used by tools not given their own.
+
+    kwargs (e.g. cache, metrics) only apply when the gateway is first created.
+    """
+    global _shared_gateway
+    if _shared_gateway is None:
+        _shared_gateway = LLMGateway(**kwargs)
+    return _shared_gateway
+
+
+async def close_shared_gateway() -> None:
+    global _shared_gateway
+    gateway, _shared_gateway = _shared_gateway, None
+    if gateway is not None:
+        await gateway.close()
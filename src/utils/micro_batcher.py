@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Pending = Tuple[Sequence[float], asyncio.Future]
+
+
+class MicroBatcherClosedError(RuntimeError):
+    """Raised to callers whose rows were still queued when the batcher stopped"""
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into vectorized batches.
+
+    Callers submit feature rows and await their score. A collector task
+    waits for the first row, then keeps gathering until max_batch_size rows
+    or max_wait seconds, stacks them into one matrix and runs predict_fn in
+    a worker thread. While one batch is being scored the next one fills up;
+    at most max_inflight_batches run at once.
+
+    close() lets batches already being scored finish and fails rows that
+    were still queued with MicroBatcherClosedError.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: Optional[int] = None,
+        max_wait: Optional[float] = None,
+        max_inflight_batches: int = 2,
+        dtype=np.float32,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size or int(
+            os.getenv("MICROBATCH_MAX_SIZE", "64")
+        )
+        self.max_wait = (
+            max_wait
+            if max_wait is not None
+            else float(os.getenv("MICROBATCH_MAX_WAIT", "0.002"))
+        )
+        self.dtype = dtype
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._inflight = asyncio.Semaphore(max_inflight_batches)
+        self._batches: Set[asyncio.Task] = set()
+
+    def _ensure_collector(self) -> asyncio.Queue:
+        if self._collector is None or self._collector.done():
+            self._queue = asyncio.Queue()
+            self._collector = asyncio.create_task(self._collect())
+            self._collector.add_done_callback(self._collector_done)
+        return self._queue
+
+    def _collector_done(self, collector: asyncio.Task) -> None:
+        if collector.cancelled():
+            return
+        # The collector only exits on an unexpected error; rows still queued
+        # would never be scored, so fail them rather than leave callers hanging
+        error = collector.exception()
+        logger.error(f"Micro-batch collector died: {error!r}")
+        if collector is self._collector:
+            self._fail_queued(
+                MicroBatcherClosedError(f"Micro-batch collector died: {error!r}")
+            )
+
+    def _fail_queued(self, error: Exception) -> None:
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(error)
+
+    async def submit(self, row: Sequence[float]) -> float:
+        """Score one feature row"""
+        future = asyncio.get_running_loop().create_future()
+        self._ensure_collector().put_nowait((row, future))
+        return await future
+
+    async def submit_many(self, rows: Sequence[Sequence[float]]) -> np.ndarray:
+        """Score many rows; large requests bypass the queue as their own batch"""
+        if len(rows) >= self.max_batch_size:
+            matrix = np.asarray(rows, dtype=self.dtype)
+            async with self._inflight:
+                return await asyncio.to_thread(self.predict_fn, matrix)
+        return np.asarray(await asyncio.gather(*(self.submit(row) for row in rows)))
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        batch: List[Pending] = []
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                await self._gather_batch(batch, loop.time() + self.max_wait)
+                await self._inflight.acquire()
+                task = asyncio.create_task(self._run_batch(batch))
+                batch = []
+                self._batches.add(task)
+                task.add_done_callback(self._batch_done)
+        except BaseException as e:
+            # Rows taken off the queue but not yet handed to a batch
+            error = (
+                MicroBatcherClosedError("Micro-batcher closed")
+                if isinstance(e, asyncio.CancelledError)
+                else e
+            )
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            raise
+
+    async def _gather_batch(self, batch: List[Pending], deadline: float) -> None:
+        """Add queued rows to batch until it is full or deadline passes"""
+        loop = asyncio.get_running_loop()
+        while len(batch) < self.max_batch_size:
+            # Drain whatever is already queued before waiting on the clock
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    def _batch_done(self, task: asyncio.Task) -> None:
+        self._batches.discard(task)
+        self._inflight.release()
+
+    async def _run_batch(self, batch: List[Pending]) -> None:
+        try:
+            matrix = np.asarray([row for row, _ in batch], dtype=self.dtype)
+            scores = await asyncio.to_thread(self.predict_fn, matrix)
+        except Exception as e:
+            logger.error(f"Micro-batch of {len(batch)} rows failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(float(score))
+
+    async def close(self) -> None:
+        """Stop collecting, fail queued rows and wait for running batches"""
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            except Exception:
+                pass  # Already logged by _collector_done
+            self._collector = None
+        self._fail_queued(MicroBatcherClosedError("Micro-batcher closed"))
+        self._queue = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
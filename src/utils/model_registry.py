@@ -0,0 +1,323 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import joblib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.joblib"
+META_FILE = "meta.json"
+COMPILED_DIR = "compiled"
+STAGES = ("active", "candidate")
+
+
+class LoadedModel:
+    """A loaded version, swapped as one reference.
+
+    compiled holds an optional inference-optimized form of the model that
+    the on_load hook may attach. compiled_dir is where a compiled form
+    written at publish time lives, None when there is none.
+    """
+
+    __slots__ = (
+        "version",
+        "model",
+        "metadata",
+        "loaded_at",
+        "compiled",
+        "compiled_dir",
+    )
+
+    def __init__(
+        self,
+        version: str,
+        model: Any,
+        metadata: Dict[str, Any],
+        compiled_dir: Optional[str] = None,
+    ):
+        self.version = version
+        self.model = model
+        self.metadata = metadata
+        self.loaded_at = time.time()
+        self.compiled = None
+        self.compiled_dir = compiled_dir
+
+
+def _write_atomic(path: str, content: str) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """Versioned on-disk models with atomic hot swaps.
+
+    Layout under root: one directory per version holding model.joblib,
+    meta.json and optionally compiled/, plus ACTIVE and
+    CANDIDATE pointer files naming a version. Publishing writes the version
+    directory under a temporary name and renames it, then rewrites the
+    pointer with a rename, so readers never see a partial model. watch()
+    polls the pointers and swaps the loaded model reference without a
+    restart; in-flight predictions keep the LoadedModel they started with.
+
+    model.joblib is written uncompressed and loaded with mmap_mode, but
+    estimators that copy their arrays on unpickle (sklearn trees do) still
+    end up private to each process. compiled/ holds an inference form saved
+    as plain .npy files by its own save(directory); the on_load hook opens
+    it with np.load(mmap_mode=...) so its pages are shared between workers.
+    """
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        mmap_mode: Optional[str] = None,
+        poll_interval: Optional[float] = None,
+        on_load: Optional[Callable[[LoadedModel], None]] = None,
+    ):
+        self.root = root or os.getenv("MODEL_REGISTRY_DIR", "models/risk")
+        mode = mmap_mode if mmap_mode is not None else os.getenv("MODEL_MMAP_MODE", "r")
+        self.mmap_mode = mode or None
+        self.poll_interval = poll_interval or float(
+            os.getenv("MODEL_REGISTRY_POLL_INTERVAL", "30")
+        )
+        # Raise from on_load to reject a version (e.g. a feature schema mismatch)
+        # or attach a compiled form before the version is swapped in
+        self.on_load = on_load
+        self.active: Optional[LoadedModel] = None
+        self.candidate: Optional[LoadedModel] = None
+        self._lock = threading.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def _pointer_path(self, stage: str) -> str:
+        return os.path.join(self.root, stage.upper())
+
+    def read_pointer(self, stage: str) -> Optional[str]:
+        try:
+            with open(self._pointer_path(stage)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def set_pointer(self, stage: str, version: Optional[str]) -> None:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown model stage: {stage}")
+        os.makedirs(self.root, exist_ok=True)
+        if version is None:
+            try:
+                os.unlink(self._pointer_path(stage))
+            except FileNotFoundError:
+                pass
+            return
+        if not os.path.exists(os.path.join(self.root, version, MODEL_FILE)):
+            raise ValueError(f"Model version {version} is not in the registry")
+        _write_atomic(self._pointer_path(stage), version)
+
+    def publish(
+        self,
+        model: Any,
+        version: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        stage: Optional[str] = "active",
+        compiled: Any = None,
+    ) -> str:
+        """Write a new version and point stage ('active', 'candidate' or None) at it.
+
+        compiled, if given, is saved with compiled.save(directory) under
+        compiled/ in the version directory.
+        """
+        version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        target = os.path.join(self.root, version)
+        if os.path.exists(target):
+            raise ValueError(f"Model version {version} already exists")
+        os.makedirs(self.root, exist_ok=True)
+
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".publish-")
+        try:
+            joblib.dump(model, os.path.join(staging, MODEL_FILE))
+            if compiled is not None:
+                compiled.save(os.path.join(staging, COMPILED_DIR))
+            with open(os.path.join(staging, META_FILE), "w") as f:
+                json.dump(
+                    {**(metadata or {}), "version": version, "created_at": time.time()},
+                    f,
+                )
+            os.rename(staging, target)
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if stage is not None:
+            self.set_pointer(stage, version)
+        return version
+
+    def load_version(self, version: str) -> LoadedModel:
+        path = os.path.join(self.root, version)
+        try:
+            with open(os.path.join(path, META_FILE)) as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            metadata = {}
+        model = joblib.load(os.path.join(path, MODEL_FILE), mmap_mode=self.mmap_mode)
+        compiled_dir = os.path.join(path, COMPILED_DIR)
+        loaded = LoadedModel(
+            version,
+            model,
+            metadata,
+            compiled_dir=compiled_dir if os.path.isdir(compiled_dir) else None,
+        )
+        if self.on_load is not None:
+            self.on_load(loaded)
+        return loaded
+
+    def refresh(self) -> bool:
+        """Load whatever the pointers name now; returns True if anything changed"""
+        with self._lock:
+            changed = False
+            for stage in STAGES:
+                version = self.read_pointer(stage)
+                current = getattr(self, stage)
+                if version == (current.version if current else None):
+                    continue
+                if version is None:
+                    # A missing ACTIVE pointer never unloads the model being served
+                    if stage == "candidate":
+                        self.candidate = None
+                        changed = True
+                    continue
+                try:
+                    loaded = self.load_version(version)
+                except Exception as e:
+                    # Keep serving the previous model rather than failing requests
+                    logger.error(f"Failed to load {stage} model {version}: {e}")
+                    continue
+                setattr(self, stage, loaded)
+                logger.info(f"Loaded {stage} model version {version}")
+                changed = True
+            return changed
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.error(f"Model registry refresh failed: {e}")
+
+    def start_watching(self) -> None:
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self.watch())
+
+    async def stop_watching(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+class ShadowScorer:
+    """Scores a candidate model on live traffic off the request path.
+
+    Primary scores are returned to callers as soon as they are computed;
+    the candidate runs on one background thread and only its agreement
+    with the primary is recorded. When max_pending batches are already
+    waiting, new batches are dropped instead of queueing unbounded work.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[LoadedModel, np.ndarray], np.ndarray],
+        max_pending: Optional[int] = None,
+    ):
+        self.predict_fn = predict_fn
+        self.max_pending = max_pending or int(os.getenv("SHADOW_MAX_PENDING", "4"))
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def submit(
+        self, candidate: LoadedModel, features: np.ndarray, primary_scores: np.ndarray
+    ) -> bool:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._record(candidate.version, dropped=len(features))
+                return False
+            self._pending += 1
+        self._executor.submit(self._score, candidate, features, primary_scores)
+        return True
+
+    def _score(
+        self, candidate: LoadedModel, features: np.ndarray, primary_scores: np.ndarray
+    ) -> None:
+        try:
+            scores = np.asarray(self.predict_fn(candidate, features), dtype=np.float64)
+            diff = np.abs(scores - primary_scores)
+            with self._lock:
+                self._record(
+                    candidate.version,
+                    rows=len(diff),
+                    abs_diff=float(diff.sum()),
+                    max_abs_diff=float(diff.max(initial=0.0)),
+                )
+        except Exception as e:
+            logger.warning(f"Shadow scoring with model {candidate.version} failed: {e}")
+            with self._lock:
+                self._record(candidate.version, errors=1)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _record(
+        self,
+        version: str,
+        rows: int = 0,
+        abs_diff: float = 0.0,
+        max_abs_diff: float = 0.0,
+        errors: int = 0,
+        dropped: int = 0,
+    ) -> None:
+        stats = self._stats.setdefault(
+            version,
+            {
+                "rows": 0,
+                "abs_diff": 0.0,
+                "max_abs_diff": 0.0,
+                "errors": 0,
+                "dropped": 0,
+            },
+        )
+        stats["rows"] += rows
+        stats["abs_diff"] += abs_diff
+        stats["max_abs_diff"] = max(stats["max_abs_diff"], max_abs_diff)
+        stats["errors"] += errors
+        stats["dropped"] += dropped
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                version: {
+                    "rows": s["rows"],
+                    "mean_abs_diff": s["abs_diff"] / s["rows"] if s["rows"] else None,
+                    "max_abs_diff": s["max_abs_diff"],
+                    "errors": s["errors"],
+                    "dropped_rows": s["dropped"],
+                }
+                for version, s in self._stats.items()
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+OCR_CACHE_PREFIX = "ocr:v1:"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+class OCRQueueFullError(RuntimeError):
+    """Raised when the OCR queue is full and a document is rejected"""
+
+
+def otsu_threshold(image: Image.Image) -> int:
+    """Global binarization threshold maximizing between-class variance"""
+    histogram = image.histogram()
+    total = sum(histogram)
+    weighted_total = sum(i * count for i, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_threshold, best_variance = 127, -1.0
+    for threshold, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += threshold * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = threshold, variance
+    return best_threshold
+
+
+def preprocess_image(image: Image.Image, max_dimension: int) -> Image.Image:
+    """Grayscale, downscale to max_dimension and binarize for tesseract"""
+    image = ImageOps.exif_transpose(image).convert("L")
+    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+    image = ImageOps.autocontrast(image)
+    threshold = otsu_threshold(image)
+    return image.point(lambda p: 255 if p > threshold else 0, mode="1")
+
+
+def load_preprocessed(
+    source: str,
+    page_index: Optional[int],
+    cache_path: str,
+    max_dimension: int,
+    dpi: int,
+) -> Image.Image:
+    """Load the preprocessed page image, rendering and caching it on first use"""
+    if os.path.exists(cache_path):
+        return Image.open(cache_path)
+
+    if page_index is None:
+        with Image.open(source) as raw:
+            image = preprocess_image(raw, max_dimension)
+    else:
+        from pdf2image import convert_from_path
+
+        raw = convert_from_path(
+            source,
+            dpi=dpi,
+            first_page=page_index + 1,
+            last_page=page_index + 1,
+            grayscale=True,
+        )[0]
+        image = preprocess_image(raw, max_dimension)
+
+    # Write then rename so concurrent workers never read a partial file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix=".png")
+    os.close(fd)
+    image.save(tmp_path, format="PNG", optimize=False)
+    os.replace(tmp_path, cache_path)
+    return image
+
+
+def ocr_page(
+    source: str,
+    page_index: Optional[int],
+    cache_path: str,
+    max_dimension: int,
+    dpi: int,
+    lang: str,
+) -> str:
+    """Worker: OCR an image file, or one page of a PDF when page_index is set"""
+    import pytesseract
+
+    image = load_preprocessed(source, page_index, cache_path, max_dimension, dpi)
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+class OCREngine:
+    """Tesseract OCR in a bounded process pool with admission control.
+
+    At most max_workers pages are OCR'd at once. Beyond that up to
+    max_queue pages wait their turn, and further requests are rejected
+    with OCRQueueFullError instead of piling up behind a CPU-bound backlog.
+    Preprocessed page images are kept in cache_dir (keyed by source
+    content hash) so they are rendered once, and recognized text is kept in
+    the shared cache.
+    """
+
+    def __init__(
+        self,
+        cache=None,
+        max_workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        cache_dir: Optional[str] = None,
+        max_dimension: Optional[int] = None,
+        dpi: Optional[int] = None,
+        lang: Optional[str] = None,
+        timeout: Optional[float] = None,
+        text_cache_ttl: Optional[int] = None,
+        max_cached_images: Optional[int] = None,
+    ):
+        self.cache = cache
+        self.max_workers = max_workers or int(
+            os.getenv("OCR_WORKERS", str(min(2, os.cpu_count() or 1)))
+        )
+        self.max_queue = max_queue or int(
+            os.getenv("OCR_MAX_QUEUE", str(self.max_workers * 8))
+        )
+        self.cache_dir = cache_dir or os.getenv(
+            "OCR_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ocr-cache")
+        )
+        self.max_dimension = max_dimension or int(
+            os.getenv("OCR_MAX_DIMENSION", "2480")
+        )
+        self.dpi = dpi or int(os.getenv("OCR_DPI", "200"))
+        self.lang = lang or os.getenv("OCR_LANG", "eng")
+        self.timeout = timeout or float(os.getenv("OCR_PAGE_TIMEOUT", "60"))
+        self.text_cache_ttl = text_cache_ttl or int(
+            os.getenv("OCR_TEXT_CACHE_TTL", str(7 * 86400))
+        )
+        self.max_cached_images = max_cached_images or int(
+            os.getenv("OCR_MAX_CACHED_IMAGES", "2000")
+        )
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        self._admitted = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _image_cache_path(self, source_hash: str) -> str:
+        return os.path.join(
+            self.cache_dir, f"{source_hash}-{self.max_dimension}-{self.dpi}.png"
+        )
+
+    async def ocr_image(self, path: str, source_hash: str) -> str:
+        """OCR a standalone image file identified by its content hash"""
+        return await self._ocr(path, None, source_hash)
+
+    async def ocr_pdf_page(self, path: str, page_index: int, page_hash: str) -> str:
+        """OCR one (zero-based) page of a scanned PDF identified by its fingerprint"""
+        return await self._ocr(path, page_index, page_hash)
+
+    async def _ocr(
+        self, source: str, page_index: Optional[int], source_hash: str
+    ) -> str:
+        text_key = f"{OCR_CACHE_PREFIX}{self.lang}:{source_hash}"
+        if self.cache is not None:
+            cached = await self.cache.get(text_key)
+            if cached is not None:
+                return cached
+
+        if self._admitted >= self.max_workers + self.max_queue:
+            raise OCRQueueFullError("OCR capacity exceeded, retry later")
+        self._admitted += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                future = asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(),
+                    ocr_page,
+                    source,
+                    page_index,
+                    self._image_cache_path(source_hash),
+                    self.max_dimension,
+                    self.dpi,
+                    self.lang,
+                )
+            except BaseException:
+                self._semaphore.release()
+                raise
+        except BaseException:
+            self._admitted -= 1
+            raise
+        # A timed-out or cancelled caller cannot stop the worker process, so
+        # the slot is only given back once the page is actually finished
+        future.add_done_callback(self._release_slot)
+        text = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+
+        if self.cache is not None:
+            await self.cache.set(text_key, text, ttl=self.text_cache_ttl)
+        return text
+
+    def _release_slot(self, future: asyncio.Future) -> None:
+        self._semaphore.release()
+        self._admitted -= 1
+        if not future.cancelled():
+            # Mark retrieved; the caller may have stopped waiting for it
+            future.exception()
+
+    def prune_image_cache(self) -> int:
+        """Drop the least recently written preprocessed images beyond the cap"""
+        entries = [
+            entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".png")
+        ]
+        if len(entries) <= self.max_cached_images:
+            return 0
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        stale = entries[: len(entries) - self.max_cached_images]
+        for entry in stale:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+        return len(stale)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
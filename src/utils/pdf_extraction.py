@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import PyPDF2
+
+logger = logging.getLogger(__name__)
+
+
+def count_pages(path: str) -> int:
+    """Worker: number of pages in a PDF"""
+    with open(path, "rb") as file:
+        return len(PyPDF2.PdfReader(file).pages)
+
+
+def _form_has_images(form) -> bool:
+    resources = form.get("/Resources")
+    xobjects = resources.get_object().get("/XObject") if resources else None
+    if xobjects is None:
+        return False
+    xobjects = xobjects.get_object()
+    return any(
+        xobjects[name].get_object().get("/Subtype") == "/Image" for name in xobjects
+    )
+
+
+def inspect_page(page) -> Tuple[str, bool]:
+    """(fingerprint, has_images) for a page; see page_fingerprint"""
+    digest = hashlib.sha256()
+    has_images = False
+    contents = page.get_contents()
+    if contents is not None:
+        digest.update(contents.get_data())
+
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources is not None else {}
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for name in sorted(fonts):
+            font = fonts[name].get_object()
+            digest.update(str(name).encode())
+            for attr in ("/Subtype", "/BaseFont", "/Encoding"):
+                digest.update(str(font.get(attr)).encode())
+            to_unicode = font.get("/ToUnicode")
+            if to_unicode is not None:
+                digest.update(to_unicode.get_object().get_data())
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            xobject = xobjects[name].get_object()
+            digest.update(str(name).encode())
+            if xobject.get("/Subtype") == "/Form":
+                digest.update(xobject.get_data())
+                # Some scanners wrap the page image in a form XObject
+                has_images = has_images or _form_has_images(xobject)
+            elif xobject.get("/Subtype") == "/Image":
+                # Scanned pages differ only in image data
+                try:
+                    digest.update(xobject.get_data())
+                except NotImplementedError:
+                    # Filters PyPDF2 cannot decode (e.g. JBIG2) get a unique
+                    # fingerprint, so the page never matches cached OCR text
+                    digest.update(os.urandom(16))
+                has_images = True
+    return digest.hexdigest(), has_images
+
+
+def page_fingerprint(page) -> str:
+    """Hash everything PyPDF2 text extraction reads from a page.
+
+    Covers the content stream, font encodings/ToUnicode maps and form and
+    image XObjects, so an unchanged page hashes the same across documents.
+    """
+    return inspect_page(page)[0]
+
+
+def read_page_range(path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Worker: {"page", "text", "hash", "images"} for pages [start, end).
+
+    The file is opened and parsed once per chunk; parsing costs about as
+    much as extracting the text, so both happen in the same pass.
+    """
+    records = []
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        for i in range(start, end):
+            page = reader.pages[i]
+            page_hash, has_images = inspect_page(page)
+            records.append(
+                {
+                    "page": i + 1,
+                    "text": page.extract_text() or "",
+                    "hash": page_hash,
+                    "images": has_images,
+                }
+            )
+    return records
+
+
+class PdfExtractionPool:
+    """Extracts PDF text in a bounded process pool, off the event loop.
+
+    Pages are processed in chunks of pages_per_chunk, each worker re-opening
+    the file so no parsed state crosses process boundaries. Every page comes
+    back with a fingerprint, so callers can reuse expensive per-page work
+    (OCR) for pages seen before, e.g. an amended pack where only the
+    signature page changed. Only max_concurrent_documents documents are in
+    flight at once, and at most max_workers chunks per document, so memory
+    stays flat however large the file is.
+
+    The timeout is soft: it stops the caller waiting and drops queued chunks,
+    but a chunk already running in a worker runs to completion, since the
+    pool is shared with other documents and a worker cannot be interrupted
+    mid-page.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        pages_per_chunk: Optional[int] = None,
+        max_pages: Optional[int] = None,
+        timeout: Optional[float] = None,
+        max_concurrent_documents: Optional[int] = None,
+    ):
+        self.max_workers = max_workers or int(
+            os.getenv("PDF_POOL_WORKERS", str(min(4, os.cpu_count() or 1)))
+        )
+        self.pages_per_chunk = pages_per_chunk or int(
+            os.getenv("PDF_PAGES_PER_CHUNK", "16")
+        )
+        self.max_pages = max_pages or int(os.getenv("PDF_MAX_PAGES", "500"))
+        self.timeout = timeout or float(os.getenv("PDF_EXTRACTION_TIMEOUT", "120"))
+        self._semaphore = asyncio.Semaphore(
+            max_concurrent_documents
+            or int(os.getenv("PDF_MAX_CONCURRENT_DOCUMENTS", str(self.max_workers * 2)))
+        )
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Created lazily so importing the server does not spawn processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._get_executor(), func, *args
+        )
+
+    async def iter_pages(self, path: str) -> AsyncIterator[Dict[str, Any]]:
+        """Yield {"page", "text", "hash", "images"} records in page order.
+
+        images is True when the page draws image XObjects, i.e. it may be
+        scanned and worth OCR when its text layer is empty.
+
+        Capped at max_pages; raises TimeoutError once the document as a whole
+        exceeds timeout. Chunks already running when it fires still finish in
+        their worker; only queued chunks are cancelled.
+        """
+        async with self._semaphore:
+            deadline = time.monotonic() + self.timeout
+            page_count = await self._run(count_pages, path)
+            if page_count > self.max_pages:
+                logger.warning(
+                    f"{path} has {page_count} pages, extracting first {self.max_pages}"
+                )
+                page_count = self.max_pages
+
+            starts = deque(range(0, page_count, self.pages_per_chunk))
+            window: deque = deque()
+            try:
+                while starts or window:
+                    # Keep up to max_workers chunks in flight ahead of the consumer
+                    while starts and len(window) < self.max_workers:
+                        start = starts.popleft()
+                        end = min(start + self.pages_per_chunk, page_count)
+                        window.append(
+                            asyncio.ensure_future(
+                                self._run(read_page_range, path, start, end)
+                            )
+                        )
+                    remaining = deadline - time.monotonic()
+                    try:
+                        records = await asyncio.wait_for(
+                            asyncio.shield(window[0]), max(remaining, 0)
+                        )
+                    except asyncio.TimeoutError:
+                        raise TimeoutError(
+                            f"PDF extraction timed out after {self.timeout}s: {path}"
+                        )
+                    window.popleft()
+                    for record in records:
+                        yield record
+            finally:
+                # Queued work is dropped; chunks already running finish in the worker
+                for task in window:
+                    task.cancel()
+
+    async def extract_text(self, path: str) -> str:
+        """Extract the whole document as one string, pages separated by newlines"""
+        return "\n".join([record["text"] async for record in self.iter_pages(path)])
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def get_field(data: Dict[str, Any], path: str) -> Any:
+    """Read a dotted field path, returning _MISSING when any level is absent"""
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _is_blank(value) -> bool:
+    return (
+        value is _MISSING
+        or value is None
+        or (isinstance(value, (str, list, dict)) and not value)
+    )
+
+
+def _is_absent(value) -> bool:
+    return value is _MISSING or value is None
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool) or _is_blank(value):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _compile_predicate(op: str, expected: Any) -> Callable[[Any], bool]:
+    """Turn one declarative comparison into a predicate over a field value"""
+    if op == "required":
+        return lambda value: not _is_blank(value)
+    if op == "equals":
+        return lambda value: value is not _MISSING and value == expected
+    if op == "not_equals":
+        return lambda value: value is _MISSING or value != expected
+    if op == "in":
+        allowed = set(expected)
+        return lambda value: value is not _MISSING and value in allowed
+    if op == "not_in":
+        blocked = set(expected)
+        return lambda value: value is _MISSING or value not in blocked
+    if op == "min":
+        return lambda value: _number(value) is not None and _number(value) >= expected
+    if op == "max":
+        return lambda value: _number(value) is not None and _number(value) <= expected
+    if op == "min_items":
+        return lambda value: isinstance(value, list) and len(value) >= expected
+    if op == "regex":
+        pattern = re.compile(expected)
+        return (
+            lambda value: isinstance(value, str)
+            and pattern.fullmatch(value) is not None
+        )
+    raise ValueError(f"Unknown rule operator: {op}")
+
+
+class Rule:
+    """One compiled check: field op value, optionally only when a condition holds"""
+
+    def __init__(self, spec: Dict[str, Any], jurisdiction: str):
+        self.id = spec["id"]
+        self.jurisdiction = jurisdiction
+        self.description = spec.get("description", "")
+        self.severity = spec.get("severity", "medium")
+        self.field = spec["field"]
+        self.op = spec["op"]
+        self.message = spec.get("message") or f"{self.field} failed {self.op} check"
+        self.predicate = _compile_predicate(self.op, spec.get("value"))
+
+        self.conditions = []
+        when = spec.get("when")
+        for condition in ([when] if isinstance(when, dict) else when or []):
+            self.conditions.append(
+                (
+                    condition["field"],
+                    _compile_predicate(condition["op"], condition.get("value")),
+                )
+            )
+
+        # Top-level client_data keys this rule reads; the unit of indexing and diffing
+        self.fields: Set[str] = {self.field.split(".")[0]} | {
+            field.split(".")[0] for field, _ in self.conditions
+        }
+        if self.conditions:
+            self.triggers = {field.split(".")[0] for field, _ in self.conditions}
+        elif self.op == "required":
+            # Must run even when the field is absent, which is exactly the failure
+            self.triggers = None
+        else:
+            self.triggers = {self.field.split(".")[0]}
+
+    def applies(self, data: Dict[str, Any]) -> bool:
+        return all(
+            predicate(get_field(data, field)) for field, predicate in self.conditions
+        )
+
+    def missing_fields(self, data: Dict[str, Any]) -> Set[str]:
+        """Fields this rule needs to reach a verdict that data does not supply"""
+        missing = {
+            field for field, _ in self.conditions if _is_absent(get_field(data, field))
+        }
+        if missing:
+            return missing
+        if self.applies(data) and _is_absent(get_field(data, self.field)):
+            return {self.field}
+        return set()
+
+    def evaluate(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        passed = self.predicate(get_field(data, self.field))
+        finding = {
+            "rule_id": self.id,
+            "description": self.description,
+            "severity": self.severity,
+            "field": self.field,
+            "passed": passed,
+        }
+        if not passed:
+            finding["message"] = self.message
+        return finding
+
+
+class RulePack:
+    """A jurisdiction's rules, indexed by the client_data fields that trigger them.
+
+    Rules without a trigger (unconditional 'required' checks) always run;
+    every other rule is only looked at when one of its trigger fields is
+    present in the supplied data, and only reported when its conditions
+    hold. missing_fields covers the rules that were skipped: any field a
+    rule needs, to decide whether it applies or to check it, that the data
+    lacks is reported rather than silently passed. dependents maps each
+    field to every rule that reads it, so an edit only needs the rules
+    depending on the changed fields re-run.
+    """
+
+    def __init__(self, jurisdiction: str, rules: Iterable[Rule], version: str = ""):
+        self.jurisdiction = jurisdiction
+        self.version = version
+        self.rules: Dict[str, Rule] = {}
+        self.always: List[Rule] = []
+        self.index: Dict[str, List[Rule]] = {}
+        # Every field a rule reads (target or condition), for diff-driven re-evaluation
+        self.dependents: Dict[str, List[Rule]] = {}
+        for rule in rules:
+            if rule.id in self.rules:
+                raise ValueError(
+                    f"Duplicate rule id {rule.id} in {jurisdiction} rule pack"
+                )
+            self.rules[rule.id] = rule
+            if rule.triggers is None:
+                self.always.append(rule)
+            else:
+                for field in rule.triggers:
+                    self.index.setdefault(field, []).append(rule)
+            for field in rule.fields:
+                self.dependents.setdefault(field, []).append(rule)
+
+    @classmethod
+    def from_file(cls, path: str) -> "RulePack":
+        with open(path) as f:
+            spec = json.load(f)
+        jurisdiction = spec["jurisdiction"]
+        return cls(
+            jurisdiction,
+            (Rule(rule, jurisdiction) for rule in spec["rules"]),
+            spec.get("version", ""),
+        )
+
+    def candidate_rules(self, fields: Iterable[str]) -> List[Rule]:
+        """Rules that may apply given the set of supplied top-level fields"""
+        selected = {rule.id: rule for rule in self.always}
+        for field in fields:
+            for rule in self.index.get(field, ()):
+                selected[rule.id] = rule
+        return list(selected.values())
+
+    def rules_depending_on(self, fields: Iterable[str]) -> List[Rule]:
+        """Rules whose outcome may change when any of these top-level fields change"""
+        selected = {}
+        for field in fields:
+            for rule in self.dependents.get(field, ()):
+                selected[rule.id] = rule
+        return list(selected.values())
+
+    def evaluate(
+        self, data: Dict[str, Any], rules: Optional[Iterable[Rule]] = None
+    ) -> Dict[str, Any]:
+        """Findings keyed by rule id for the applicable candidate rules"""
+        if rules is None:
+            rules = self.candidate_rules(data.keys())
+        return {
+            rule.id: rule.evaluate(data)
+            for rule in rules
+            if (rule.triggers is None or not rule.triggers.isdisjoint(data))
+            and rule.applies(data)
+        }
+
+    def missing_fields(self, data: Dict[str, Any]) -> List[str]:
+        """Sorted fields the pack's rules depend on that are absent from data"""
+        missing: Set[str] = set()
+        for rule in self.rules.values():
+            missing |= rule.missing_fields(data)
+        return sorted(missing)
+
+
+def changed_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Set[str]:
+    """Top-level keys added, removed or changed between two versions of a record"""
+    return {
+        key
+        for key in old.keys() | new.keys()
+        if old.get(key, _MISSING) != new.get(key, _MISSING)
+    }
+
+
+def load_rule_packs(directory: str) -> Dict[str, RulePack]:
+    packs = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json"):
+            pack = RulePack.from_file(os.path.join(directory, name))
+            packs[pack.jurisdiction] = pack
+            logger.info(
+                f"Loaded {len(pack.rules)} {pack.jurisdiction} compliance rules"
+            )
+    return packs
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List
+
+STREAM_MEDIA_TYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class StreamStalled(Exception):
+    """The consumer stopped reading for longer than the stall timeout"""
+
+
+def encode_event(fmt: str, event: str, data: Dict[str, Any]) -> str:
+    """One Server-Sent Event, or one NDJSON line with the event name under "event" """
+    if fmt == "ndjson":
+        return json.dumps({"event": event, **data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def relay(
+    source: AsyncIterator[str], max_pending: int = 64, stall_timeout: float = 30.0
+) -> AsyncIterator[str]:
+    """Pull text from source in a background task through a bounded buffer.
+
+    Everything that arrived since the consumer last read is yielded as one
+    string, so a slow client gets fewer, larger writes rather than a
+    growing backlog. Once max_pending pieces are waiting the source is no
+    longer read; if the consumer does not catch up within stall_timeout
+    the source is closed and StreamStalled raised. Closing the relay
+    (e.g. the client disconnected) cancels the reader, which closes the
+    source and with it the upstream request.
+    """
+    pending: List[str] = []
+    has_data = asyncio.Event()
+    has_room = asyncio.Event()
+    has_room.set()
+    outcome: Dict[str, Any] = {"done": False, "error": None}
+
+    async def produce():
+        try:
+            async for text in source:
+                pending.append(text)
+                has_data.set()
+                if len(pending) >= max_pending:
+                    has_room.clear()
+                    # Narrow try: a TimeoutError raised by the source itself
+                    # must reach the consumer unchanged, not as a stall
+                    try:
+                        await asyncio.wait_for(has_room.wait(), stall_timeout)
+                    except asyncio.TimeoutError:
+                        outcome["error"] = StreamStalled(
+                            f"Consumer did not read for {stall_timeout}s"
+                        )
+                        return
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            outcome["done"] = True
+            has_data.set()
+            aclose = getattr(source, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    reader = asyncio.ensure_future(produce())
+    try:
+        while True:
+            if pending:
+                chunk = "".join(pending)
+                pending.clear()
+                has_room.set()
+                yield chunk
+                continue
+            if outcome["done"]:
+                if outcome["error"] is not None:
+                    raise outcome["error"]
+                return
+            has_data.clear()
+            await has_data.wait()
+    finally:
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
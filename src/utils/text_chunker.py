@@ -0,0 +1,121 @@
+import hashlib
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List
+
+# Rough token estimate for English prose; errs on the side of smaller chunks
+CHARS_PER_TOKEN = 4
+
+# Blank lines, or lines that look like numbered/upper-case section headings
+_SECTION_BREAK = re.compile(
+    r"\n\s*\n|\n(?=(?:\d+(?:\.\d+)*\.?\s+[A-Z]|[A-Z][A-Z \-]{3,}\n))"
+)
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Split one page on section breaks, falling back to lines, then characters"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces: List[str] = []
+    for section in _SECTION_BREAK.split(text):
+        if len(section) <= max_chars:
+            pieces.append(section)
+            continue
+        for line in section.split("\n"):
+            for start in range(0, len(line), max_chars):
+                stop = start + max_chars
+                pieces.append(line[start:stop])
+
+    # Re-pack the small pieces up to the budget
+    packed: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 1 > max_chars:
+            packed.append(current)
+            current = piece
+        else:
+            current = f"{current}\n{piece}" if current else piece
+    if current:
+        packed.append(current)
+    return packed
+
+
+class ChunkPacker:
+    """Incremental page packer behind chunk_pages and iter_chunks.
+
+    Holds at most one chunk's worth of page text at a time, so chunks can
+    be produced while pages are still being extracted.
+    """
+
+    def __init__(self, max_tokens: int):
+        self.max_tokens = max_tokens
+        self.parts: List[str] = []
+        self.first_page = self.last_page = None
+        self.size = 0
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Close the chunk being packed, if any"""
+        if not self.parts:
+            return []
+        text = "\n".join(self.parts)
+        chunk = {
+            "first_page": self.first_page,
+            "last_page": self.last_page,
+            "text": text,
+            "hash": hashlib.sha256(text.encode()).hexdigest(),
+        }
+        self.parts, self.first_page, self.size = [], None, 0
+        return [chunk]
+
+    def add(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Add a page record and return any chunks it completed"""
+        text = page["text"]
+        if not text.strip():
+            return []
+        tokens = estimate_tokens(text)
+        if tokens > self.max_tokens:
+            done = self.flush()
+            for piece in _split_oversized(text, self.max_tokens):
+                self.first_page = self.last_page = page["page"]
+                self.parts = [piece]
+                done.extend(self.flush())
+            return done
+        done = self.flush() if self.size + tokens > self.max_tokens else []
+        if self.first_page is None:
+            self.first_page = page["page"]
+        self.last_page = page["page"]
+        self.parts.append(text)
+        self.size += tokens
+        return done
+
+
+def chunk_pages(
+    pages: Iterable[Dict[str, Any]], max_tokens: int
+) -> List[Dict[str, Any]]:
+    """Pack page records into chunks of at most max_tokens (estimated).
+
+    Whole pages are kept together where they fit; a page larger than the
+    budget is split on section boundaries. Each chunk is
+    {"first_page", "last_page", "text", "hash"}, where hash covers the text
+    only, so identical chunks in different documents share cached results.
+    """
+    packer = ChunkPacker(max_tokens)
+    chunks: List[Dict[str, Any]] = []
+    for page in pages:
+        chunks.extend(packer.add(page))
+    chunks.extend(packer.flush())
+    return chunks
+
+
+async def iter_chunks(
+    pages: AsyncIterable[Dict[str, Any]], max_tokens: int
+) -> AsyncIterator[Dict[str, Any]]:
+    """chunk_pages over an async stream of pages, yielding each chunk once it is full"""
+    packer = ChunkPacker(max_tokens)
+    async for page in pages:
+        for chunk in packer.add(page):
+            yield chunk
+    for chunk in packer.flush():
+        yield chunk
@@ -0,0 +1,219 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+# Node arrays written by FlatForest.save, one .npy file each. children and
+# is_leaf are derived but stored too, so a memory-mapped load allocates no
+# per-node arrays of its own.
+NODE_ARRAYS = (
+    "feature",
+    "threshold",
+    "left",
+    "right",
+    "missing_left",
+    "value",
+    "roots",
+    "children",
+    "is_leaf",
+)
+FOREST_META_FILE = "forest.json"
+
+
+class FlatForest:
+    """A tree ensemble flattened into contiguous node arrays.
+
+    All trees share one set of arrays indexed by global node id: split
+    feature, threshold, left/right child, whether missing values go left,
+    and per-class leaf probabilities. Traversal advances every (row, tree)
+    pair one level per vectorized step, dropping pairs as they reach a
+    leaf, with no per-node Python and no sklearn in the hot path.
+    predict_proba matches sklearn's forest average of normalized leaf
+    class fractions. save() and load() keep the arrays as .npy files that
+    worker processes can memory-map and share.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        missing_left: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        n_features: int,
+        classes: np.ndarray,
+        children: Optional[np.ndarray] = None,
+        is_leaf: Optional[np.ndarray] = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.n_features = n_features
+        self.classes_ = classes
+        self.is_leaf = left == np.arange(len(left)) if is_leaf is None else is_leaf
+        # Interleaved (left, right) pairs: one gather picks the child for each pair
+        if children is None:
+            children = np.stack([left, right], axis=1).ravel()
+        self.children = children
+        self.has_missing_routing = bool(missing_left.any())
+        self.row_chunk = int(os.getenv("FLAT_FOREST_ROW_CHUNK", "4096"))
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in NODE_ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, FOREST_META_FILE), "w") as f:
+            json.dump(
+                {"n_features": self.n_features, "classes": self.classes_.tolist()}, f
+            )
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: Optional[str] = "r") -> "FlatForest":
+        """Load a saved forest; with mmap_mode the node arrays are np.memmap views"""
+        arrays = {
+            name: np.load(
+                os.path.join(directory, f"{name}.npy"),
+                mmap_mode=mmap_mode,
+                allow_pickle=False,
+            )
+            for name in NODE_ARRAYS
+        }
+        with open(os.path.join(directory, FOREST_META_FILE)) as f:
+            meta = json.load(f)
+        return cls(
+            n_features=meta["n_features"], classes=np.asarray(meta["classes"]), **arrays
+        )
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Global leaf node id reached in every tree, shape (n_rows, n_trees)"""
+        n_rows, n_trees = len(X), self.n_trees
+        flat_x = np.ascontiguousarray(X).ravel()
+        nodes = np.tile(self.roots, n_rows)
+        # Offset of each (row, tree) pair's row in the flattened matrix
+        row_offsets = np.repeat(
+            np.arange(n_rows, dtype=np.int64) * self.n_features, n_trees
+        )
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        # Step only the pairs still at a split, so shallow leaves stop costing work
+        while active.size:
+            current = nodes[active]
+            x = flat_x[row_offsets[active] + self.feature[current]]
+            go_left = x <= self.threshold[current]
+            if self.has_missing_routing:
+                go_left |= np.isnan(x) & self.missing_left[current]
+            current = self.children[2 * current + ~go_left]
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+        return nodes.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[None, :]
+        if X.shape[1] != self.n_features:
+            raise ValueError(
+                f"X has {X.shape[1]} features, but the model expects {self.n_features}"
+            )
+        if len(X) <= self.row_chunk:
+            return self.value[self.apply(X)].mean(axis=1)
+        # Bound the (rows x trees) working set on very large batches
+        return np.concatenate(
+            [
+                self.value[self.apply(rows)].mean(axis=1)
+                for rows in np.split(X, range(self.row_chunk, len(X), self.row_chunk))
+            ]
+        )
+
+
+def export_forest(model) -> FlatForest:
+    """Flatten a fitted sklearn tree classifier or forest of them.
+
+    Raises ValueError for estimators that are not supported (regressors,
+    boosted ensembles, multi-output) and for unfitted models.
+    """
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None:
+        if not hasattr(model, "tree_"):
+            raise ValueError(
+                f"Cannot export {type(model).__name__}: not a fitted tree classifier"
+            )
+        estimators = [model]
+    if not hasattr(model, "classes_") or getattr(model, "n_outputs_", 1) != 1:
+        raise ValueError(
+            f"Cannot export {type(model).__name__}: only single-output classifiers"
+        )
+    if not all(
+        hasattr(estimator, "tree_") and hasattr(estimator, "classes_")
+        for estimator in estimators
+    ):
+        # e.g. gradient boosting, whose stages are regression trees on log-odds
+        raise ValueError(
+            f"Cannot export {type(model).__name__}: members are not tree classifiers"
+        )
+
+    features, thresholds, lefts, rights, missing, values, roots = (
+        [],
+        [],
+        [],
+        [],
+        [],
+        [],
+        [],
+    )
+    offset = 0
+    for estimator in estimators:
+        tree = estimator.tree_
+        n = tree.node_count
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+
+        own = np.arange(n) + offset
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        lefts.append(np.where(is_leaf, own, left + offset))
+        rights.append(np.where(is_leaf, own, right + offset))
+        missing.append(
+            np.asarray(getattr(tree, "missing_go_to_left", np.zeros(n)), dtype=bool)
+            & ~is_leaf
+        )
+        leaf_values = tree.value[:, 0, :].astype(np.float64)
+        totals = leaf_values.sum(axis=1, keepdims=True)
+        values.append(
+            np.divide(
+                leaf_values, totals, out=np.zeros_like(leaf_values), where=totals > 0
+            )
+        )
+        roots.append(offset)
+        offset += n
+
+    index_dtype = np.int32 if offset < 2**31 else np.int64
+    return FlatForest(
+        feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+        threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+        left=np.ascontiguousarray(np.concatenate(lefts), dtype=index_dtype),
+        right=np.ascontiguousarray(np.concatenate(rights), dtype=index_dtype),
+        missing_left=np.ascontiguousarray(np.concatenate(missing)),
+        value=np.ascontiguousarray(np.concatenate(values)),
+        roots=np.asarray(roots, dtype=index_dtype),
+        n_features=int(model.n_features_in_),
+        classes=np.asarray(model.classes_),
+    )
+
+
+def try_export_forest(model) -> Optional[FlatForest]:
+    try:
+        return export_forest(model)
+    except (ValueError, AttributeError):
+        return None
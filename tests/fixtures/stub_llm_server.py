@@ -0,0 +1,148 @@
+"""
+Local stand-in for the Anthropic Messages API, for tests and load tests.
+
+Answers POST /v1/messages with a deterministic JSON analysis of the user
+message after an optional artificial latency, and records every call and
+the peak number of concurrent requests on app.state. Every slow_every-th
+call takes slow_latency instead (a latency tail), and while
+app.state.fail_next is positive calls are answered with fail_status
+(429 carries a Retry-After), for exercising rate limits and retries.
+Requests with "stream": true get the reply as Messages API server-sent
+events, one small text delta every token_latency seconds (non-streamed
+replies take as long in total); streams the client abandons are counted
+in app.state.streams_cancelled.
+
+    python -m tests.fixtures.stub_llm_server --port 8088 --latency 0.5
+    ANTHROPIC_BASE_URL=http://localhost:8088 ANTHROPIC_API_KEY=stub uvicorn src.server:app
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import uuid
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+RISK_WORDS = ("sanction", "pep", "politically exposed", "offshore", "risk")
+
+
+def stub_analysis(text: str) -> dict:
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    return {
+        "summary": (lines[0] if lines else "")[:120],
+        "document_types": ["stub_document"],
+        "entities": [{"name": name, "type": "person"}
+                     for name in dict.fromkeys(re.findall(r"\b[A-Z][a-z]+ [A-Z][a-z]+\b", text))][:5],
+        "risk_flags": [line for line in lines if any(word in line.lower() for word in RISK_WORDS)][:5],
+        "missing_information": [],
+    }
+
+
+def _message_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if block.get("type") == "text")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps({'type': event, **data})}\n\n"
+
+
+async def _stream_reply(state, model: str, reply: str, input_tokens: int, delay: float):
+    finished = False
+    try:
+        yield _sse("message_start", {"message": {
+            "id": f"msg_stub_{uuid.uuid4().hex[:12]}", "type": "message", "role": "assistant",
+            "model": model, "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 0}}})
+        if delay:
+            await asyncio.sleep(delay)
+        yield _sse("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+        for start in range(0, len(reply), 16):
+            if start and state.token_latency:
+                await asyncio.sleep(state.token_latency)
+            yield _sse("content_block_delta", {
+                "index": 0, "delta": {"type": "text_delta", "text": reply[start:start + 16]}})
+        yield _sse("content_block_stop", {"index": 0})
+        yield _sse("message_delta", {"delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                     "usage": {"output_tokens": len(reply) // 4}})
+        yield _sse("message_stop", {})
+        finished = True
+    finally:
+        state.in_flight -= 1
+        if not finished:
+            state.streams_cancelled += 1
+
+
+def create_app(latency: float = 0.0, slow_every: int = 0, slow_latency: float = 0.0,
+               token_latency: float = 0.0) -> Starlette:
+    async def messages(request: Request):
+        body = await request.json()
+        state = request.app.state
+        state.calls.append(body)
+        if state.fail_next > 0:
+            state.fail_next -= 1
+            headers = {"retry-after": "0.05"} if state.fail_status == 429 else {}
+            return JSONResponse(
+                {"type": "error", "error": {"type": "overloaded_error", "message": "stub failure"}},
+                status_code=state.fail_status, headers=headers)
+        state.in_flight += 1
+        state.max_in_flight = max(state.max_in_flight, state.in_flight)
+        slow = state.slow_every and len(state.calls) % state.slow_every == 0
+        delay = state.slow_latency if slow else state.latency
+        if body.get("stream"):
+            text = _message_text(body["messages"][-1]["content"])
+            return StreamingResponse(
+                _stream_reply(state, body.get("model", "stub"), json.dumps(stub_analysis(text)),
+                              len(text) // 4, delay),
+                media_type="text/event-stream")
+        try:
+            text = _message_text(body["messages"][-1]["content"])
+            reply = json.dumps(stub_analysis(text))
+            # Same total generation time as streaming the reply in 16-character deltas
+            delay += state.token_latency * ((len(reply) - 1) // 16)
+            if delay:
+                await asyncio.sleep(delay)
+        finally:
+            state.in_flight -= 1
+        return JSONResponse({
+            "id": f"msg_stub_{uuid.uuid4().hex[:12]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "stub"),
+            "content": [{"type": "text", "text": reply}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": len(text) // 4, "output_tokens": len(reply) // 4},
+        })
+
+    app = Starlette(routes=[Route("/v1/messages", messages, methods=["POST"])])
+    app.state.latency = latency
+    app.state.slow_every = slow_every
+    app.state.slow_latency = slow_latency
+    app.state.token_latency = token_latency
+    app.state.streams_cancelled = 0
+    app.state.fail_next = 0
+    app.state.fail_status = 529
+    app.state.calls = []
+    app.state.in_flight = 0
+    app.state.max_in_flight = 0
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--slow-every", type=int, default=0)
+    parser.add_argument("--slow-latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.slow_every, args.slow_latency, args.token_latency),
+                host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,63 @@
+"""Minimal text-layer PDF writer for benchmarks and tests (no extra dependencies)."""
+
+from typing import Callable, Collection, Optional
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def default_page_text(page: int, line: int) -> str:
+    return f"Page {page + 1} line {line + 1}: account holder balance statement transfer"
+
+
+def write_text_pdf(path: str, pages: int, lines_per_page: int = 40,
+                   page_text: Optional[Callable[[int, int], str]] = None,
+                   image_pages: Collection[int] = ()) -> None:
+    """Write a PDF with `pages` pages of Helvetica text.
+
+    Pages in image_pages (zero-based) instead draw one full-page grey image
+    and carry no text, like a scanned page.
+    """
+    page_text = page_text or default_page_text
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once page object ids are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray "
+        b"/BitsPerComponent 8 /Length 1 >>\nstream\n\x80\nendstream",
+    ]
+    page_ids = []
+    for page in range(pages):
+        if page in image_pages:
+            stream = b"q 612 0 0 792 0 0 cm /Im1 Do Q"
+            resources = b"<< /XObject << /Im1 4 0 R >> >>"
+        else:
+            lines = [b"BT /F1 10 Tf 12 TL 50 780 Td"]
+            for line in range(lines_per_page):
+                lines.append(f"({_escape(page_text(page, line))}) '".encode("latin-1"))
+            lines.append(b"ET")
+            stream = b"\n".join(lines)
+            resources = b"<< /Font << /F1 3 0 R >> >>"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources %s /Contents %d 0 R >>" % (resources, content_id)
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as file:
+        file.write(out)
@@ -0,0 +1,37 @@
+import threading
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+from fakeredis import TcpFakeServer
+from src.utils.llm_gateway import LLMGateway
+
+@pytest.fixture(autouse=True)
+def no_live_llm(monkeypatch):
+    """Keep unit tests off the real LLM API even when credentials are exported"""
+    monkeypatch.delenv("ANTHROPIC_API_KEY", raising=False)
+    monkeypatch.delenv("ANTHROPIC_BASE_URL", raising=False)
+
+@pytest.fixture
+def tcp_redis_url():
+    """A fake Redis reached over a real socket, so client socket timeouts apply"""
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def stub_gateway():
+    """Build LLMGateways that call a stub LLM app in-process, with SDK retries off"""
+    def make(app, **kwargs):
+        client = AsyncAnthropic(
+            api_key="test",
+            base_url="http://stub-llm",
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub-llm"),
+        )
+        gateway = LLMGateway(client=client, **kwargs)
+        gateway.base_backoff = 0.01
+        return gateway
+    return make
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import time
+import fakeredis
+import pytest
+import redis.asyncio as redis
+from fastapi import HTTPException
+from jose import jwt
+from src.security import auth_manager as auth_module
+from src.security.auth_manager import AuthManager, UserModel
+from src.utils.cache import create_fake_client
+
+def make_token(sub="alice", ttl=3600):
+    return jwt.encode({"sub": sub, "exp": int(time.time()) + ttl}, AuthManager.SECRET_KEY, algorithm="HS256")
+
+@pytest.mark.asyncio
+async def test_verified_tokens_are_cached_until_expiry(monkeypatch):
+    decodes = []
+    real_decode = auth_module.jwt.decode
+    monkeypatch.setattr(auth_module.jwt, "decode", lambda *a, **kw: decodes.append(1) or real_decode(*a, **kw))
+    manager = AuthManager()
+    token = make_token()
+
+    for _ in range(5):
+        assert (await manager.authenticate(token)).username == "alice"
+    assert len(decodes) == 1
+
+    short = make_token(ttl=1)
+    await manager.authenticate(short)
+    # jose compares exp against whole seconds
+    await asyncio.sleep(2.1)
+    with pytest.raises(HTTPException) as exc:
+        await manager.authenticate(short)
+    assert exc.value.status_code == 401
+
+@pytest.mark.asyncio
+async def test_revocation_reaches_every_replica():
+    server = fakeredis.FakeServer()
+    first = AuthManager(redis_client=create_fake_client(server=server))
+    second = AuthManager(redis_client=create_fake_client(server=server))
+    second.start_revocation_listener()
+    await asyncio.sleep(0.05)
+    token = make_token()
+    try:
+        await first.authenticate(token)
+        await second.authenticate(token)
+        await first.revoke(token)
+        await asyncio.sleep(0.05)
+        for manager in (first, second):
+            with pytest.raises(HTTPException):
+                await manager.authenticate(token)
+        # A fresh replica checks the deny-list when it verifies the token
+        with pytest.raises(HTTPException):
+            await AuthManager(redis_client=create_fake_client(server=server)).authenticate(token)
+    finally:
+        await second.close()
+
+@pytest.mark.asyncio
+async def test_idle_revocation_listener_keeps_token_cache(tcp_redis_url):
+    pool = redis.BlockingConnectionPool.from_url(tcp_redis_url, socket_timeout=0.2)
+    manager = AuthManager(redis_client=redis.Redis(connection_pool=pool))
+    manager.start_revocation_listener()
+    token = make_token()
+    await manager.authenticate(token)
+
+    await asyncio.sleep(1.0)
+
+    assert manager.token_cache.get(auth_module.token_digest(token))[0]
+    await manager.close()
+    await pool.disconnect()
+
+@pytest.mark.asyncio
+async def test_concurrent_user_misses_share_one_load():
+    loads = []
+    release = threading.Event()
+
+    class SlowAuth(AuthManager):
+        def get_user_from_db(self, username):
+            loads.append(username)
+            release.wait(5)
+            return UserModel(username=username)
+
+    manager = SlowAuth()
+    token = make_token("bob")
+    tasks = [asyncio.create_task(manager.authenticate(token)) for _ in range(10)]
+    await asyncio.sleep(0.05)
+    release.set()
+    users = await asyncio.gather(*tasks)
+    assert loads == ["bob"]
+    assert all(user is users[0] for user in users)
+
+@pytest.mark.asyncio
+async def test_cancelled_user_load_does_not_fail_waiters():
+    release = threading.Event()
+
+    class SlowAuth(AuthManager):
+        def get_user_from_db(self, username):
+            release.wait(5)
+            return UserModel(username=username)
+
+    manager = SlowAuth()
+    leader = asyncio.create_task(manager.get_user("bob"))
+    await asyncio.sleep(0.02)
+    follower = asyncio.create_task(manager.get_user("bob"))
+    await asyncio.sleep(0.02)
+    leader.cancel()
+    await asyncio.sleep(0.02)
+    release.set()
+
+    assert (await follower).username == "bob"
+    assert manager.user_cache.get("bob")[0]
+
+@pytest.mark.asyncio
+async def test_deny_list_outage_fails_closed():
+    class Broken:
+        async def exists(self, key):
+            raise ConnectionError("redis down")
+
+    with pytest.raises(HTTPException) as exc:
+        await AuthManager(redis_client=Broken()).authenticate(make_token())
+    assert exc.value.status_code == 503
@@ -0,0 +1,172 @@
+import asyncio
+import fakeredis
+import pytest
+import redis.asyncio as redis
+from src.utils.batch_jobs import DEAD_LETTER_STREAM, BatchJobManager
+from src.utils.cache import CacheManager, create_fake_client
+
+async def wait_for_job(manager, job_id, timeout=5.0):
+    async def finished():
+        async for job in manager.iter_progress(job_id, interval=0.01):
+            last = job
+        return last
+    return await asyncio.wait_for(finished(), timeout)
+
+@pytest.mark.asyncio
+async def test_batch_job_retries_then_dead_letters():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+    attempts = {}
+
+    async def handler(request, username):
+        attempts[request["document_path"]] = attempts.get(request["document_path"], 0) + 1
+        if request["document_path"] == "broken.pdf":
+            raise RuntimeError("corrupt PDF")
+        if attempts[request["document_path"]] == 1:
+            return {"status": "error", "message": "transient"}
+        return {"status": "success", "analysis": request["document_path"]}
+
+    manager = BatchJobManager(redis_client, handler, max_attempts=2)
+    job_id = await manager.submit("bank-a", "alice", [{"document_path": "a.pdf"}, {"document_path": "broken.pdf"}])
+    manager.start_workers(2)
+    try:
+        job = await wait_for_job(manager, job_id)
+    finally:
+        await manager.stop()
+
+    assert job["status"] == "completed_with_errors"
+    assert (job["completed"], job["failed"]) == (1, 1)
+    assert attempts == {"a.pdf": 2, "broken.pdf": 2}
+    results = (await manager.get_job(job_id, include_results=True))["results"]
+    assert results[0] == {"status": "success", "analysis": "a.pdf"}
+    assert results[1]["status"] == "error"
+    assert await redis_client.xlen(DEAD_LETTER_STREAM) == 1
+
+@pytest.mark.asyncio
+async def test_retries_rerun_cached_analysis():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+    cache = CacheManager(redis_client=redis_client)
+    outcomes = iter([{"status": "error", "message": "LLM timeout"}, {"status": "success"}])
+
+    async def analyze():
+        return next(outcomes)
+
+    async def handler(request, username):
+        result = await cache.get_or_compute(
+            "doc_analysis:a", analyze, ttl=60, cache_if=lambda r: r["status"] != "error")
+        if result["status"] == "error":
+            raise RuntimeError(result["message"])
+        return result
+
+    manager = BatchJobManager(redis_client, handler, max_attempts=2)
+    job_id = await manager.submit("bank-a", "alice", [{"document_path": "a.pdf"}])
+    manager.start_workers(1)
+    try:
+        job = await wait_for_job(manager, job_id)
+    finally:
+        await manager.stop()
+
+    assert job["status"] == "completed"
+    assert await redis_client.xlen(DEAD_LETTER_STREAM) == 0
+
+@pytest.mark.asyncio
+async def test_tenants_are_served_round_robin():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+    order = []
+
+    async def handler(request, username):
+        order.append(username)
+        return {"status": "success"}
+
+    manager = BatchJobManager(redis_client, handler)
+    big = await manager.submit("bank-a", "alice", [{"document_path": f"{i}.pdf"} for i in range(10)])
+    small = await manager.submit("bank-b", "bob", [{"document_path": f"{i}.pdf"} for i in range(2)])
+    manager.start_workers(1)
+    try:
+        await wait_for_job(manager, big)
+        await wait_for_job(manager, small)
+    finally:
+        await manager.stop()
+
+    assert order.count("bob") == 2
+    assert order.index("bob") < 2 and order[:4].count("bob") == 2
+
+def test_read_block_stays_below_socket_timeout():
+    async def handler(request, username):
+        return {"status": "success"}
+
+    pool = redis.BlockingConnectionPool.from_url("redis://localhost:6379/0", socket_timeout=0.4)
+    assert BatchJobManager(redis.Redis(connection_pool=pool), handler).block_ms == 200
+    no_timeout = redis.BlockingConnectionPool.from_url("redis://localhost:6379/0")
+    assert BatchJobManager(redis.Redis(connection_pool=no_timeout), handler).block_ms == 500
+
+async def read_entries(redis_client, tenant, consumer, count):
+    response = await redis_client.xreadgroup(
+        "batch-workers", consumer, {f"batch:queue:{tenant}": ">"}, count=count)
+    return [(stream.decode(), entry_id, fields) for stream, entries in response for entry_id, fields in entries]
+
+@pytest.mark.asyncio
+async def test_finished_job_is_never_reopened():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+    release = asyncio.Event()
+
+    async def handler(request, username):
+        await release.wait()
+        return {"status": "success"}
+
+    manager = BatchJobManager(redis_client, handler)
+    job_id = await manager.submit("bank-a", "alice", [{"document_path": "a.pdf"}, {"document_path": "b.pdf"}])
+    entries = await read_entries(redis_client, "bank-a", "w", 2)
+    # Both workers finish the last items at the same moment
+    running = [asyncio.create_task(manager.process_entry(*entry, "w")) for entry in entries]
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*running)
+    assert (await manager.get_job(job_id))["status"] == "completed"
+
+    # A late duplicate of an item (e.g. reclaimed after a stall) does not reopen it
+    stream, entry_id, fields = entries[0]
+    await manager.process_entry(stream, b"0-1", fields, "w")
+    job = await manager.get_job(job_id)
+    assert job["status"] == "completed"
+
+@pytest.mark.asyncio
+async def test_heartbeat_keeps_long_items_from_being_reclaimed():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+    calls = []
+
+    async def handler(request, username):
+        calls.append(request["document_path"])
+        await asyncio.sleep(0.5)
+        return {"status": "success"}
+
+    manager = BatchJobManager(redis_client, handler, visibility_timeout=0.15)
+    job_id = await manager.submit("bank-a", "alice", [{"document_path": "slow.pdf"}])
+    [entry] = await read_entries(redis_client, "bank-a", "worker-1", 1)
+    running = asyncio.create_task(manager.process_entry(*entry, "worker-1"))
+    for _ in range(4):
+        await asyncio.sleep(0.1)
+        await manager._reclaim({"batch:queue:bank-a": ">"}, "worker-2")
+    await running
+
+    assert calls == ["slow.pdf"]
+    job = await manager.get_job(job_id)
+    assert (job["status"], job["completed"]) == ("completed", 1)
+
+@pytest.mark.asyncio
+async def test_drained_tenants_are_pruned():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+
+    async def handler(request, username):
+        return {"status": "success"}
+
+    manager = BatchJobManager(redis_client, handler)
+    done = await manager.submit("bank-a", "alice", [{"document_path": "a.pdf"}])
+    await manager.submit("bank-b", "bob", [{"document_path": "b.pdf"}])
+    [entry] = await read_entries(redis_client, "bank-a", "w", 1)
+    await manager.process_entry(*entry, "w")
+    assert (await manager.get_job(done))["status"] == "completed"
+
+    await manager._prune_tenants(["bank-a", "bank-b"])
+    assert await redis_client.smembers("batch:tenants") == {b"bank-b"}
+    await manager.submit("bank-a", "alice", [{"document_path": "c.pdf"}])
+    assert await redis_client.smembers("batch:tenants") == {b"bank-a", b"bank-b"}
@@ -0,0 +1,221 @@
+import asyncio
+import pytest
+import fakeredis
+import redis.asyncio as redis
+from src.utils.cache import CacheCodec, CacheManager, LocalCache, create_fake_client
+
+@pytest.fixture
+def cache():
+    return CacheManager(redis_client=create_fake_client(server=fakeredis.FakeServer()))
+
+@pytest.mark.asyncio
+async def test_set_and_get(cache):
+    assert await cache.set("doc_analysis:1", {"status": "success"}, ttl=60)
+    assert await cache.get("doc_analysis:1") == {"status": "success"}
+    assert await cache.get("doc_analysis:missing") is None
+
+@pytest.mark.asyncio
+async def test_get_many_and_set_many(cache):
+    await cache.set_many({"a": 1, "b": [2, 3]}, ttl=60)
+
+    found = await cache.get_many(["a", "b", "c"])
+
+    assert found == {"a": 1, "b": [2, 3]}
+
+@pytest.mark.asyncio
+async def test_get_or_compute_only_computes_on_miss(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"analysis": "done"}
+
+    first = await cache.get_or_compute("k", compute, ttl=60)
+    second = await cache.get_or_compute("k", compute, ttl=60)
+
+    assert first == second == {"analysis": "done"}
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_get_or_compute_does_not_store_uncacheable_results(cache):
+    results = iter([{"status": "error"}, {"status": "success"}, {"status": "error"}])
+
+    async def compute():
+        return next(results)
+
+    def ok(result):
+        return result["status"] != "error"
+
+    assert await cache.get_or_compute("k", compute, ttl=60, cache_if=ok) == {"status": "error"}
+    assert await cache.get("k") is None
+    assert await cache.get_or_compute("k", compute, ttl=60, cache_if=ok) == {"status": "success"}
+    assert await cache.get_or_compute("k", compute, ttl=60, cache_if=ok) == {"status": "success"}
+
+def test_local_cache_evicts_least_recently_used():
+    evictions = []
+    local = LocalCache(max_entries=2, ttl=60, on_evict=lambda: evictions.append(1))
+    local.set("a", 1)
+    local.set("b", 2)
+    local.get("a")
+    local.set("c", 3)
+
+    assert local.get("b") == (False, None)
+    assert local.get("a") == (True, 1)
+    assert len(evictions) == 1
+
+@pytest.mark.asyncio
+async def test_l1_serves_repeat_reads_without_redis(cache):
+    await cache.set("doc_analysis:1", {"status": "success"}, ttl=60)
+    await cache.redis_client.delete("doc_analysis:1")
+
+    assert await cache.get("doc_analysis:1") == {"status": "success"}
+
+@pytest.mark.asyncio
+async def test_delete_invalidates_other_replicas_l1():
+    server = fakeredis.FakeServer()
+    replica_a = CacheManager(redis_client=create_fake_client(server=server))
+    replica_b = CacheManager(redis_client=create_fake_client(server=server))
+    replica_b.start_invalidation_listener()
+    await asyncio.sleep(0.05)
+
+    await replica_a.set("doc_analysis:1", {"v": 1}, ttl=60)
+    assert await replica_b.get("doc_analysis:1") == {"v": 1}
+
+    await replica_a.delete("doc_analysis:1")
+    for _ in range(50):
+        if not replica_b.local.get("doc_analysis:1")[0]:
+            break
+        await asyncio.sleep(0.01)
+
+    assert await replica_b.get("doc_analysis:1") is None
+    await replica_b.close()
+
+@pytest.mark.asyncio
+async def test_idle_invalidation_listener_keeps_l1(tcp_redis_url):
+    pool = redis.BlockingConnectionPool.from_url(tcp_redis_url, socket_timeout=0.2)
+    cache = CacheManager(redis_client=redis.Redis(connection_pool=pool))
+    cache.start_invalidation_listener()
+    await cache.set("doc_analysis:1", {"v": 1}, ttl=60)
+
+    # Several socket timeouts' worth of silence on the channel
+    await asyncio.sleep(1.0)
+
+    assert cache.local.get("doc_analysis:1") == (True, {"v": 1})
+    await cache.close()
+    await pool.disconnect()
+
+@pytest.mark.asyncio
+async def test_get_or_compute_coalesces_concurrent_misses(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"analysis": "done"}
+
+    results = await asyncio.gather(*(cache.get_or_compute("hot", compute, ttl=60) for _ in range(20)))
+
+    assert all(result == {"analysis": "done"} for result in results)
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_fail_followers(cache):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"analysis": "done"}
+
+    leader = asyncio.create_task(cache.get_or_compute("hot", compute, ttl=60))
+    await asyncio.sleep(0.01)
+    follower = asyncio.create_task(cache.get_or_compute("hot", compute, ttl=60))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == {"analysis": "done"}
+    assert leader.cancelled()
+    assert len(calls) == 1
+    assert await cache.get("hot") == {"analysis": "done"}
+
+@pytest.mark.asyncio
+async def test_get_or_compute_lease_blocks_other_replicas():
+    server = fakeredis.FakeServer()
+    replica_a = CacheManager(redis_client=create_fake_client(server=server))
+    replica_b = CacheManager(redis_client=create_fake_client(server=server))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"analysis": "done"}
+
+    results = await asyncio.gather(
+        replica_a.get_or_compute("hot", compute, ttl=60),
+        replica_b.get_or_compute("hot", compute, ttl=60),
+    )
+
+    assert results == [{"analysis": "done"}, {"analysis": "done"}]
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_get_or_compute_serves_stale_while_revalidating(cache):
+    versions = iter([1, 2])
+
+    async def compute():
+        return {"version": next(versions)}
+
+    await cache.get_or_compute("doc", compute, ttl=0, stale_ttl=60)
+    stale = await cache.get_or_compute("doc", compute, ttl=0, stale_ttl=60)
+    await asyncio.gather(*cache._background)
+
+    assert stale == {"version": 1}
+    assert await cache.get("doc") == {"version": 2}
+
+@pytest.mark.asyncio
+async def test_clear_pattern_scans_in_batches(cache):
+    await cache.set_many({f"doc_analysis:{i}": i for i in range(250)}, ttl=60)
+    await cache.set("risk:1", 1, ttl=60)
+
+    progress = cache.start_clear_pattern("doc_analysis:*", batch_size=50)
+    await asyncio.gather(*cache._background)
+
+    assert progress["done"] and progress["error"] is None
+    assert progress["deleted"] == 250
+    assert progress["batches"] > 1
+    assert await cache.get("doc_analysis:7") is None
+    assert await cache.get("risk:1") == 1
+
+@pytest.mark.asyncio
+async def test_invalidate_namespace_bumps_generation(cache):
+    assert await cache.get_generation("doc_analysis:model:1") == 0
+
+    await cache.invalidate_namespace("doc_analysis:model:1")
+
+    assert await cache.get_generation("doc_analysis:model:1") == 1
+
+@pytest.mark.parametrize("serializer", ["json", "orjson", "msgpack"])
+@pytest.mark.parametrize("compression", ["none", "zlib", "zstd", "lz4"])
+def test_codec_round_trip(serializer, compression):
+    pytest.importorskip({"json": "json", "orjson": "orjson", "msgpack": "msgpack"}[serializer])
+    pytest.importorskip({"none": "zlib", "zlib": "zlib", "zstd": "zstandard", "lz4": "lz4"}[compression])
+    codec = CacheCodec(serializer=serializer, compression=compression, compress_threshold=64)
+    value = {"status": "success", "analysis": "x" * 1000, "pages": [1, 2, 3]}
+
+    encoded = codec.encode(value)
+
+    assert codec.decode(encoded) == value
+    if compression != "none":
+        assert len(encoded) < 1000
+
+def test_codec_reads_legacy_json_entries():
+    codec = CacheCodec()
+
+    assert codec.decode(b'{"status": "success"}') == {"status": "success"}
+    assert codec.decode(b"3") == 3
+
+@pytest.mark.asyncio
+async def test_unreadable_entry_is_a_miss(cache):
+    await cache.redis_client.set("corrupt", bytes((CacheCodec.CODEC_MAGIC, 0x12)) + b"garbage")
+
+    assert await cache.get("corrupt") is None
@@ -0,0 +1,28 @@
+import pytest
+from src.utils.cache_keys import document_analysis_key
+
+@pytest.mark.asyncio
+async def test_same_content_under_different_paths_shares_key(tmp_path):
+    first = tmp_path / "statement.pdf"
+    renamed = tmp_path / "statement-final.pdf"
+    first.write_bytes(b"%PDF-1.4 identical bytes")
+    renamed.write_bytes(b"%PDF-1.4 identical bytes")
+
+    key_a = await document_analysis_key(str(first), "KYC ", "model:1")
+    key_b = await document_analysis_key(str(renamed), "kyc", "model:1")
+
+    assert key_a == key_b
+    assert key_a.startswith("doc_analysis:model:1:0:kyc:")
+
+@pytest.mark.asyncio
+async def test_key_changes_with_content_and_version(tmp_path):
+    document = tmp_path / "statement.pdf"
+    document.write_bytes(b"original")
+    original = await document_analysis_key(str(document), None, "model:1")
+
+    document.write_bytes(b"amended with a signature page")
+    amended = await document_analysis_key(str(document), None, "model:1")
+    new_version = await document_analysis_key(str(document), None, "model:2")
+
+    assert original.split(":")[-2] == "general"
+    assert len({original, amended, new_version}) == 3
@@ -0,0 +1,90 @@
+import asyncio
+import fakeredis
+import pytest
+from tests.fixtures.stub_llm_server import create_app as create_stub_app
+from src.tools.conversational_assistant import ConversationalOnboardingTool
+from src.utils.cache import create_fake_client
+from src.security.auth_manager import UserModel
+from src.utils.chat_sessions import ACTIVE_SESSIONS_KEY, ChatSessionStore, session_id
+from src.utils.text_chunker import estimate_tokens
+
+class Gauge:
+    value = None
+
+    def set(self, value):
+        self.value = value
+
+class Metrics:
+    def __init__(self):
+        self.active_sessions = Gauge()
+
+@pytest.mark.asyncio
+async def test_turns_carry_context_per_client(stub_gateway):
+    app = create_stub_app()
+    sessions = ChatSessionStore(create_fake_client(server=fakeredis.FakeServer()))
+    tool = ConversationalOnboardingTool(llm=stub_gateway(app), sessions=sessions)
+
+    alice = UserModel("alice")
+    await tool.execute({"message": "I am Jane Tan", "client_id": "c1"}, alice)
+    await tool.execute({"message": "Which documents do I need?", "client_id": "c1"}, alice)
+    streamed = [text async for text in tool.stream({"message": "And for my company?", "client_id": "c1"}, alice)]
+    await tool.execute({"message": "Hello", "client_id": "c2"}, alice)
+
+    assert [m["role"] for m in app.state.calls[1]["messages"]] == ["user", "assistant", "user"]
+    assert app.state.calls[1]["messages"][0]["content"] == "I am Jane Tan"
+    assert len(app.state.calls[2]["messages"]) == 5
+    assert len(app.state.calls[3]["messages"]) == 1
+    _, history = await sessions.get_context(session_id("alice", "c1"))
+    assert history[-1] == {"role": "assistant", "content": "".join(streamed)}
+
+@pytest.mark.asyncio
+async def test_sessions_are_scoped_to_the_authenticated_user(stub_gateway):
+    app = create_stub_app()
+    sessions = ChatSessionStore(create_fake_client(server=fakeredis.FakeServer()))
+    tool = ConversationalOnboardingTool(llm=stub_gateway(app), sessions=sessions)
+
+    await tool.execute({"message": "My passport number is X1234567", "client_id": "c1"}, UserModel("alice"))
+    await tool.execute({"message": "What did I tell you?", "client_id": "c1"}, UserModel("mallory"))
+    await tool.execute({"message": "Hello", "client_id": "c1"})
+
+    assert len(app.state.calls[1]["messages"]) == 1
+    assert len(app.state.calls[2]["messages"]) == 1
+    assert session_id("a:b", "c") != session_id("a", "b:c")
+
+@pytest.mark.asyncio
+async def test_history_is_compacted_to_the_token_budget():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+    sessions = ChatSessionStore(redis_client, token_budget=100)
+    for i in range(30):
+        await sessions.append("c1", f"Question {i} about my source of funds", f"Answer {i} " * 5)
+        await asyncio.gather(*sessions._background)
+
+    summary, history = await sessions.get_context("c1")
+    stored = await redis_client.llen(sessions._turns_key("c1"))
+    tokens = int(await redis_client.hget(sessions._meta_key("c1"), "tokens"))
+
+    assert summary and "Answer 29" not in summary
+    assert history[-1]["content"].startswith("Answer 29")
+    assert history[0]["role"] == "user"
+    assert estimate_tokens(summary) + sum(estimate_tokens(m["content"]) for m in history) <= 100
+    assert stored < 60 and tokens <= 100
+    await sessions.close()
+
+@pytest.mark.asyncio
+async def test_idle_sessions_are_evicted_and_counted():
+    redis_client = create_fake_client(server=fakeredis.FakeServer())
+    metrics = Metrics()
+    sessions = ChatSessionStore(redis_client, metrics=metrics, idle_ttl=60)
+    await sessions.append("c1", "hi", "hello")
+    await sessions.append("c2", "hi", "hello")
+    assert metrics.active_sessions.value == 2
+
+    await redis_client.zadd(ACTIVE_SESSIONS_KEY, {"c1": 0})
+    assert await sessions.evict_idle() == 1
+    assert metrics.active_sessions.value == 1
+    # Keys are left to expire, so a turn racing the sweep is never wiped
+    await sessions.append("c1", "back again", "welcome back")
+    _, history = await sessions.get_context("c1")
+    assert len(history) == 4
+    assert await redis_client.ttl(sessions._turns_key("c1")) > 0
+    assert metrics.active_sessions.value == 2
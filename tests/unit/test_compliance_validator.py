@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from src.tools import compliance_validator
+from src.tools.compliance_validator import ComplianceValidatorTool
+from src.utils.rule_engine import Rule, RulePack
+
+COMPLETE_INDIVIDUAL = {
+    "full_name": "Tan Wei Ming",
+    "customer_type": "individual",
+    "id_number": "S1234567D",
+    "date_of_birth": "1985-04-12",
+    "nationality": "SG",
+    "address": {"line1": "1 Raffles Place", "country": "SG"},
+    "age": 39,
+    "country": "SG",
+    "is_pep": False,
+    "sanctions_match": False,
+}
+
+def test_rule_pack_only_evaluates_rules_triggered_by_supplied_fields():
+    pack = RulePack("TEST", [
+        Rule({"id": "R1", "field": "name", "op": "required"}, "TEST"),
+        Rule({"id": "R2", "field": "owners", "op": "min_items", "value": 1,
+              "when": {"field": "type", "op": "equals", "value": "corporate"}}, "TEST"),
+        Rule({"id": "R3", "field": "age", "op": "min", "value": 18}, "TEST"),
+    ])
+    assert {rule.id for rule in pack.candidate_rules([])} == {"R1"}
+    assert {rule.id for rule in pack.candidate_rules(["type"])} == {"R1", "R2"}
+
+    findings = pack.evaluate({"type": "individual", "age": 16})
+    assert set(findings) == {"R1", "R3"}
+    assert not findings["R1"]["passed"] and not findings["R3"]["passed"]
+    assert pack.evaluate({"name": "x", "type": "corporate", "owners": ["a"]})["R2"]["passed"]
+
+@pytest.mark.asyncio
+async def test_findings_are_kept_per_rule_and_jurisdiction():
+    tool = ComplianceValidatorTool()
+    client = {**COMPLETE_INDIVIDUAL, "is_pep": True, "enhanced_due_diligence": True}
+    result = await tool.execute({"jurisdictions": ["MAS", "HKMA", "MAS", "XYZ"], "client_data": client})
+
+    assert result["status"] == "success"
+    assert set(result["results"]) == {"MAS", "HKMA"}
+    mas = result["results"]["MAS"]
+    assert mas["status"] == "non_compliant"
+    assert mas["failed_rules"] == ["MAS-EDD-002"]
+    assert "MAS-CDD-010" not in {finding["rule_id"] for finding in mas["findings"]}
+    assert "HKMA-EDD-001" in result["results"]["HKMA"]["failed_rules"]
+    assert result["overall_status"] == "non_compliant"
+
+    clean = await tool.execute({"jurisdictions": ["MAS"], "client_data": COMPLETE_INDIVIDUAL})
+    assert clean["overall_status"] == "compliant"
+
+@pytest.mark.asyncio
+async def test_fields_rules_depend_on_are_reported_missing():
+    tool = ComplianceValidatorTool()
+    profile = {key: value for key, value in COMPLETE_INDIVIDUAL.items() if key not in ("customer_type", "age")}
+    result = await tool.execute({"jurisdictions": ["MAS"], "client_data": profile})
+
+    mas = result["results"]["MAS"]
+    assert mas["status"] == "incomplete" and mas["failed_rules"] == []
+    assert mas["missing_fields"] == ["age", "customer_type"]
+    assert result["overall_status"] != "compliant"
+
+@pytest.mark.asyncio
+async def test_jurisdictions_run_concurrently_under_a_deadline(monkeypatch):
+    monkeypatch.setattr(compliance_validator, "CHECK_TIMEOUT", 0.2)
+    tool = ComplianceValidatorTool()
+
+    def delayed(checker, delay):
+        original = checker.check
+
+        async def check(client_data, rules=None):
+            await asyncio.sleep(delay)
+            return await original(client_data, rules)
+        checker.check = check
+
+    delayed(tool.frameworks["SEC"], 0.15)
+    delayed(tool.frameworks["MAS"], 0.15)
+    delayed(tool.frameworks["HKMA"], 10)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await tool.execute({"jurisdictions": ["SEC", "MAS", "HKMA"], "client_data": COMPLETE_INDIVIDUAL})
+
+    assert loop.time() - start < 0.3
+    assert result["results"]["HKMA"] == {
+        "status": "incomplete", "rule_pack_version": "2024-01", "rules_evaluated": 0,
+        "failed_rules": [], "findings": [], "error": "timeout",
+    }
+    assert result["results"]["MAS"]["status"] == "compliant"
+    assert result["overall_status"] == "non_compliant"
+
+@pytest.mark.asyncio
+async def test_edits_only_reevaluate_rules_reading_changed_fields():
+    tool = ComplianceValidatorTool()
+    draft = {"full_name": "Acme Pte Ltd", "customer_type": "corporate", "address": {"country": "SG"}}
+    first = await tool.execute({"jurisdictions": ["MAS", "SEC"], "client_data": draft, "client_id": "c-1"})
+    assert "MAS-CDD-011" in first["results"]["MAS"]["failed_rules"]
+
+    edited = {**draft, "beneficial_owners": [{"name": "Lee Ah Kow", "share": 0.6}]}
+    second = await tool.execute({"jurisdictions": ["MAS", "SEC"], "client_data": edited, "client_id": "c-1"})
+    mas = second["results"]["MAS"]
+    assert mas["rules_reevaluated"] == 1
+    assert "MAS-CDD-011" not in mas["failed_rules"]
+    assert "MAS-CDD-010" in mas["failed_rules"]
+
+    # Switching customer type drops the corporate findings and adds the individual ones
+    individual = {**COMPLETE_INDIVIDUAL, "full_name": "Acme Pte Ltd"}
+    third = await tool.execute({"jurisdictions": ["MAS"], "client_data": individual, "client_id": "c-1"})
+    full = await tool.execute({"jurisdictions": ["MAS"], "client_data": individual})
+    assert third["results"]["MAS"]["findings"] == full["results"]["MAS"]["findings"]
+    assert third["results"]["MAS"]["status"] == "compliant"
@@ -1,7 +1,15 @@
 import pytest
 import os
 import tempfile
+import asyncio
+import fakeredis
+from tests.fixtures.stub_llm_server import create_app as create_stub_app
+from tests.fixtures.synthetic_pdf import default_page_text, write_text_pdf
 from src.tools.document_analyzer import DocumentAnalyzerTool
+from src.utils import pdf_extraction
+from src.utils.cache import CacheManager, create_fake_client
+from src.utils.pdf_extraction import PdfExtractionPool
+from src.utils.text_chunker import chunk_pages, estimate_tokens
 
 @pytest.mark.asyncio
 async def test_document_analysis():
@@ -36,3 +44,162 @@ async def test_document_analysis_file_not_found():
     
     assert result["status"] == "error"
     assert "Document not found" in result["message"]
+
+@pytest.mark.asyncio
+async def test_pdf_extraction_runs_in_pool_with_page_cap(tmp_path):
+    path = tmp_path / "statement.pdf"
+    write_text_pdf(str(path), pages=5, lines_per_page=2)
+    pool = PdfExtractionPool(max_workers=1, pages_per_chunk=2, max_pages=3)
+
+    try:
+        pages = [record async for record in pool.iter_pages(str(path))]
+    finally:
+        pool.shutdown()
+
+    assert [record["page"] for record in pages] == [1, 2, 3]
+    assert pages[0]["text"].startswith("Page 1 line 1")
+    assert pages[2]["text"].startswith("Page 3 line 1")
+
+@pytest.mark.asyncio
+async def test_pdf_extraction_times_out(tmp_path, monkeypatch):
+    path = tmp_path / "statement.pdf"
+    write_text_pdf(str(path), pages=4, lines_per_page=2)
+    pool = PdfExtractionPool(max_workers=1, pages_per_chunk=2, timeout=0.1)
+
+    async def hung_worker(func, *args):
+        if func is pdf_extraction.count_pages:
+            return 4
+        await asyncio.sleep(5)
+
+    monkeypatch.setattr(pool, "_run", hung_worker)
+    started = asyncio.get_running_loop().time()
+    with pytest.raises(TimeoutError):
+        [record async for record in pool.iter_pages(str(path))]
+    assert asyncio.get_running_loop().time() - started < 1.0
+
+@pytest.mark.asyncio
+async def test_pdf_extraction_does_not_block_event_loop(tmp_path):
+    path = tmp_path / "statement.pdf"
+    write_text_pdf(str(path), pages=60, lines_per_page=40)
+    pool = PdfExtractionPool(max_workers=1, pages_per_chunk=20)
+    loop = asyncio.get_running_loop()
+    gaps = []
+
+    async def ticker():
+        last = loop.time()
+        while True:
+            await asyncio.sleep(0.01)
+            gaps.append(loop.time() - last)
+            last = loop.time()
+
+    ticks = asyncio.create_task(ticker())
+    try:
+        pages = [record async for record in pool.iter_pages(str(path))]
+    finally:
+        ticks.cancel()
+        pool.shutdown()
+
+    assert len(pages) == 60
+    assert len(gaps) > 10
+    assert max(gaps) < 0.1
+
+@pytest.mark.asyncio
+async def test_chunks_are_fingerprinted_and_extracted_in_one_pass(tmp_path, monkeypatch):
+    original = tmp_path / "pack.pdf"
+    amended = tmp_path / "pack-signed.pdf"
+    write_text_pdf(str(original), pages=4, lines_per_page=2)
+    write_text_pdf(str(amended), pages=4, lines_per_page=2, page_text=lambda page, line: (
+        "Signed by client" if page == 3 else default_page_text(page, line)))
+    pool = PdfExtractionPool(max_workers=1, pages_per_chunk=2)
+    calls = []
+
+    async def run_inline(func, *args):
+        calls.append(func)
+        return func(*args)
+
+    # Run workers inline so every worker call is visible to the test
+    monkeypatch.setattr(pool, "_run", run_inline)
+    first = [record async for record in pool.iter_pages(str(original))]
+    calls.clear()
+    second = [record async for record in pool.iter_pages(str(amended))]
+
+    assert [r["hash"] for r in first[:3]] == [r["hash"] for r in second[:3]]
+    assert first[3]["hash"] != second[3]["hash"]
+    assert second[3]["text"].startswith("Signed by client")
+    assert calls == [pdf_extraction.count_pages] + [pdf_extraction.read_page_range] * 2
+@pytest.mark.asyncio
+async def test_only_image_pages_without_text_are_ocred(tmp_path, monkeypatch):
+    path = tmp_path / "pack.pdf"
+    # Page 2 is blank, page 3 a short signature line, page 4 a scan
+    write_text_pdf(str(path), pages=4, lines_per_page=1, image_pages={3}, page_text=lambda page, line: (
+        "" if page == 1 else "Signed" if page == 2 else default_page_text(page, line)))
+    analyzer = DocumentAnalyzerTool()
+    ocred = []
+
+    async def fake_ocr(document_path, page_index, digest):
+        ocred.append(page_index)
+        return "Scanned passport page"
+
+    monkeypatch.setattr(analyzer.ocr, "ocr_pdf_page", fake_ocr)
+    try:
+        pages = [record async for record in analyzer.extract_text(str(path))]
+    finally:
+        analyzer.pdf_pool.shutdown()
+
+    assert ocred == [3]
+    assert [record.get("ocr", False) for record in pages] == [False, False, False, True]
+    assert pages[3]["text"] == "Scanned passport page"
+
+@pytest.mark.asyncio
+async def test_llm_analysis_is_chunked_bounded_and_cached(monkeypatch, stub_gateway):
+    app = create_stub_app(latency=0.02)
+    cache = CacheManager(redis_client=create_fake_client(server=fakeredis.FakeServer()))
+    gateway = stub_gateway(app, max_concurrency=2, cache=cache)
+    analyzer = DocumentAnalyzerTool(cache=cache, llm=gateway)
+    analyzer.max_chunk_tokens = 50
+    pages = [
+        {"page": i + 1, "text": f"Statement page {i + 1} for Jane Tan. " * 4, "hash": str(i)}
+        for i in range(6)
+    ]
+    pages[4]["text"] += "\nClient is a PEP with offshore accounts."
+
+    result = await analyzer.analyze_with_llm(pages, {"extraction_mode": "kyc"})
+    calls = len(app.state.calls)
+    await analyzer.analyze_with_llm(pages, {"extraction_mode": "kyc"})
+
+    assert result["status"] == "success"
+    assert result["chunks"] == calls > 1
+    assert app.state.max_in_flight <= 2
+    assert len(app.state.calls) == calls
+    assert result["analysis"]["entities"] == [{"name": "Jane Tan", "type": "person"}]
+    assert result["analysis"]["risk_flags"][0]["pages"] == [[5, 5]]
+
+@pytest.mark.asyncio
+async def test_streamed_pages_are_analyzed_while_extraction_runs(stub_gateway):
+    app = create_stub_app(latency=0.01)
+    gateway = stub_gateway(app, max_concurrency=2)
+    analyzer = DocumentAnalyzerTool(llm=gateway)
+    analyzer.max_chunk_tokens = 50
+    calls_when_extracted = {}
+
+    async def pages():
+        for i in range(40):
+            calls_when_extracted[i + 1] = len(app.state.calls)
+            yield {"page": i + 1, "text": f"Statement page {i + 1} for Jane Tan. " * 4, "hash": str(i)}
+            await asyncio.sleep(0)
+
+    result = await analyzer.analyze_with_llm(pages(), {"extraction_mode": "kyc"})
+
+    assert result["chunks"] == len(app.state.calls) > 10
+    # The last pages were extracted after most chunks had been analyzed
+    assert calls_when_extracted[40] >= result["chunks"] - 2 * gateway.max_concurrency
+
+def test_chunk_pages_respects_token_budget():
+    pages = [{"page": 1, "text": "a" * 100}, {"page": 2, "text": "b" * 100},
+             {"page": 3, "text": ("SECTION\n" + "c" * 300 + "\n\n") * 3}]
+
+    chunks = chunk_pages(pages, max_tokens=60)
+
+    assert [(c["first_page"], c["last_page"]) for c in chunks][:1] == [(1, 2)]
+    assert all(estimate_tokens(c["text"]) <= 60 for c in chunks)
+    assert {c["first_page"] for c in chunks[1:]} == {3}
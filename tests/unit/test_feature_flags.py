@@ -0,0 +1,82 @@
+import asyncio
+import fakeredis
+import pytest
+import redis.asyncio as redis
+from src.utils.cache import create_fake_client
+from src.utils.feature_flags import FeatureFlags
+
+def test_bitset_matches_per_flag_hashing():
+    flags = FeatureFlags()
+    for user_id in (f"user{i}" for i in range(200)):
+        bits = flags.evaluate(user_id)
+        for feature, percentage in flags.get_all_flags().items():
+            expected = percentage >= 1.0 or flags._hash_user_feature(user_id, feature) < percentage
+            assert flags.is_set(bits, feature) == expected == flags.is_enabled(feature, user_id)
+    assert not flags.is_enabled("document_analyzer", "user1")
+
+def test_buckets_are_hashed_once_per_user(monkeypatch):
+    flags = FeatureFlags()
+    calls = []
+    original = flags._hash_user_feature
+    monkeypatch.setattr(flags, "_hash_user_feature", lambda *args: calls.append(args) or original(*args))
+    flags.get_user_flags("alice")
+    first = len(calls)
+    for _ in range(10):
+        flags.get_user_flags("alice")
+        flags.is_enabled("batch_processing", "alice")
+    assert len(calls) == first
+
+@pytest.mark.asyncio
+async def test_updates_reach_every_replica():
+    server = fakeredis.FakeServer()
+    writer = FeatureFlags(redis_client=create_fake_client(server=server))
+    reader = FeatureFlags(redis_client=create_fake_client(server=server))
+    reader.start_listener()
+    try:
+        for _ in range(100):
+            if reader.snapshot.version == 0 and reader.get_all_flags():
+                break
+            await asyncio.sleep(0.01)
+        old_bits = reader.evaluate("alice")
+        assert not reader.is_enabled("new_dashboard", "alice")
+
+        assert await writer.publish_flag("new_dashboard", 1.0)
+        assert not await writer.publish_flag("new_dashboard", 1.5)
+        for _ in range(100):
+            if reader.snapshot.version == 1:
+                break
+            await asyncio.sleep(0.01)
+        assert reader.is_enabled("new_dashboard", "alice")
+        # Bits of existing flags are stable across the reload
+        for feature in ("genai_analysis", "batch_processing"):
+            assert reader.is_set(old_bits, feature) == reader.is_enabled(feature, "alice")
+    finally:
+        await reader.close()
+
+@pytest.mark.asyncio
+async def test_sync_update_flag_still_takes_effect():
+    local = FeatureFlags(user_cache_size=0)
+    assert local.update_flag("new_dashboard", 1.0)
+    assert local.is_enabled("new_dashboard", "alice")
+    assert len(local._users) == 0
+
+    shared = FeatureFlags(redis_client=create_fake_client(server=fakeredis.FakeServer()))
+    assert shared.update_flag("new_dashboard", 1.0)
+    assert not shared.update_flag("new_dashboard", 1.5)
+    await shared.close()
+    assert shared.is_enabled("new_dashboard", "alice")
+
+@pytest.mark.asyncio
+async def test_idle_listener_does_not_reload(tcp_redis_url, monkeypatch):
+    pool = redis.BlockingConnectionPool.from_url(tcp_redis_url, socket_timeout=0.2)
+    flags = FeatureFlags(redis_client=redis.Redis(connection_pool=pool))
+    loads = []
+    original = flags.load
+    monkeypatch.setattr(flags, "load", lambda: loads.append(1) or original())
+    flags.start_listener()
+
+    await asyncio.sleep(1.0)
+
+    assert len(loads) == 1
+    await flags.close()
+    await pool.disconnect()
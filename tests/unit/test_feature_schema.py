@@ -0,0 +1,65 @@
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+from src.tools.risk_predictor import RiskPredictorTool
+from src.utils.feature_schema import (
+    CategoricalFeature, DateDeltaFeature, FeatureSchema, HashedFeature, NumericFeature
+)
+
+AS_OF = datetime(2024, 1, 31, tzinfo=timezone.utc)
+
+SCHEMA = FeatureSchema([
+    NumericFeature("income", default=-1.0),
+    CategoricalFeature("customer_type", ["individual", "corporate"]),
+    HashedFeature("address.country", buckets=8, name="country"),
+    DateDeltaFeature("opened_at", default=-1.0),
+])
+
+def test_schema_fills_contiguous_float32_matrix():
+    profiles = [
+        {"income": 1000, "customer_type": "corporate", "address": {"country": "SG"}, "opened_at": "2024-01-01"},
+        {"income": None, "customer_type": "unknown", "opened_at": "2024-01-30T12:00:00Z"},
+        {"income": "n/a", "address": "not a dict", "opened_at": "garbage"},
+    ]
+    matrix = SCHEMA.transform(profiles, as_of=AS_OF)
+
+    assert matrix.dtype == np.float32 and matrix.flags["C_CONTIGUOUS"]
+    assert matrix.shape == (3, SCHEMA.width) == (3, 1 + 3 + 8 + 1)
+    assert matrix[:, 0].tolist() == [1000.0, -1.0, -1.0]
+    # individual, corporate, __other__
+    assert matrix[:, 1:4].tolist() == [[0, 1, 0], [0, 0, 1], [0, 0, 1]]
+    assert matrix[0, 4:12].sum() == 1 and matrix[1:, 4:12].sum() == 0
+    assert matrix[:, 12].tolist() == [30.0, 0.5, -1.0]
+    assert SCHEMA.column_names[1] == "customer_type=individual"
+
+def test_unhashable_categorical_values_fall_into_other():
+    schema = FeatureSchema([CategoricalFeature("industry", ["crypto", "banking"])])
+    profiles = [{"industry": ["crypto"]}, {"industry": {"name": "crypto"}}, {"industry": "banking"}]
+    matrix = schema.transform(profiles, as_of=AS_OF)
+
+    assert matrix.tolist() == [[0, 0, 1], [0, 0, 1], [0, 1, 0]]
+
+def test_hash_buckets_and_fingerprint_are_stable():
+    again = FeatureSchema([
+        NumericFeature("income", default=-1.0),
+        CategoricalFeature("customer_type", ["individual", "corporate"]),
+        HashedFeature("address.country", buckets=8, name="country"),
+        DateDeltaFeature("opened_at", default=-1.0),
+    ])
+    profile = {"address": {"country": "HK"}}
+    assert again.fingerprint == SCHEMA.fingerprint
+    assert np.array_equal(again.transform_one(profile, AS_OF), SCHEMA.transform_one(profile, AS_OF))
+    assert FeatureSchema([NumericFeature("income")]).fingerprint != SCHEMA.fingerprint
+
+@pytest.mark.asyncio
+async def test_training_and_serving_share_the_schema(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tool = RiskPredictorTool()
+    profiles = [{"annual_income": i * 1000, "sanctions_match": i % 2} for i in range(40)]
+    model = tool.train(profiles, [i % 2 for i in range(40)])
+
+    assert model.n_features_in_ == tool.feature_extractor.schema.width
+    assert model.feature_schema_ == tool.feature_extractor.fingerprint
+    result = await tool.execute({"client_profile": {"annual_income": 5000, "sanctions_match": 1}})
+    assert result["status"] == "success" and result["risk_level"] == "high"
+    await tool.batcher.close()
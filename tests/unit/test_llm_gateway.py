@@ -0,0 +1,138 @@
+import asyncio
+import time
+import fakeredis
+import pytest
+from tests.fixtures.stub_llm_server import create_app as create_stub_app
+from src.utils.cache import CacheManager, create_fake_client
+from src.utils.llm_cache import llm_cache_key
+from src.utils.llm_gateway import TokenBucket
+
+async def ask(gateway, text="Jane Tan"):
+    return await gateway.complete(max_tokens=64, messages=[{"role": "user", "content": text}])
+
+@pytest.mark.asyncio
+async def test_token_bucket_paces_requests():
+    bucket = TokenBucket(rate=20, capacity=2)
+    start = time.monotonic()
+    for _ in range(6):
+        await bucket.acquire(1)
+    assert time.monotonic() - start >= 0.18
+    assert not bucket.try_acquire(1)
+
+@pytest.mark.asyncio
+async def test_overload_is_retried_and_shrinks_concurrency(stub_gateway):
+    app = create_stub_app()
+    gateway = stub_gateway(app, max_concurrency=8)
+    app.state.fail_next = 2
+
+    reply = await ask(gateway)
+
+    assert "Jane Tan" in reply
+    assert len(app.state.calls) == 3
+    assert gateway.counters["retries"] == 2
+    assert gateway.stats()["models"][gateway.default_model]["concurrency_limit"] < 8
+
+@pytest.mark.asyncio
+async def test_rate_limit_honours_retry_after_and_gives_up(stub_gateway):
+    app = create_stub_app()
+    gateway = stub_gateway(app, max_retries=1)
+    app.state.fail_status = 429
+    app.state.fail_next = 1
+    start = time.monotonic()
+    await ask(gateway)
+    assert time.monotonic() - start >= 0.05
+
+    app.state.fail_next = 2
+    with pytest.raises(Exception) as error:
+        await ask(gateway)
+    assert getattr(error.value, "status_code", None) == 429
+    assert gateway.counters["failures"] == 1
+
+@pytest.mark.asyncio
+async def test_slow_tail_request_is_hedged(stub_gateway):
+    app = create_stub_app(latency=0.01)
+    gateway = stub_gateway(app, hedge_budget=0.1)
+    await asyncio.gather(*(ask(gateway) for _ in range(20)))
+    assert gateway.counters["hedges"] == 0
+
+    # The next call (the 21st) is slow; its hedge (the 22nd) is not
+    app.state.slow_every = 21
+    app.state.slow_latency = 2.0
+    start = time.monotonic()
+    await ask(gateway)
+
+    assert time.monotonic() - start < 1.0
+    assert gateway.counters["hedges"] == gateway.counters["hedge_wins"] == 1
+    assert gateway.stats()["models"][gateway.default_model]["in_flight"] == 0
+
+class RecordingMetrics:
+    def __init__(self):
+        self.events = []
+
+    def record_llm_cache(self, tool, result, input_tokens=0, output_tokens=0):
+        self.events.append((tool, result, input_tokens, output_tokens))
+
+    def record_cache_event(self, tier, event):
+        pass
+
+@pytest.mark.asyncio
+async def test_deterministic_replies_are_cached_per_prompt_version(stub_gateway):
+    app = create_stub_app()
+    metrics = RecordingMetrics()
+    cache = CacheManager(redis_client=create_fake_client(server=fakeredis.FakeServer()))
+    gateway = stub_gateway(app, cache=cache, metrics=metrics)
+    request = dict(max_tokens=64, temperature=0, messages=[{"role": "user", "content": "Which ID do I need?"}])
+
+    first = await gateway.complete(tool="chat", prompt_version="1", **request)
+    second = await gateway.complete(tool="chat", prompt_version="1", **request)
+    await gateway.complete(tool="chat", prompt_version="2", **request)
+
+    assert first == second
+    assert len(app.state.calls) == 2
+    assert [event[1] for event in metrics.events] == ["miss", "hit", "miss"]
+    assert metrics.events[1][2] > 0 and metrics.events[1][3] > 0
+
+    # A fresh replica (empty local tier) is served from Redis
+    other = stub_gateway(app, cache=CacheManager(redis_client=cache.redis_client), metrics=metrics)
+    assert await other.complete(tool="chat", prompt_version="1", **request) == first
+    assert len(app.state.calls) == 2
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_prompts_are_coalesced_not_hits(stub_gateway):
+    app = create_stub_app(latency=0.05)
+    metrics = RecordingMetrics()
+    cache = CacheManager(redis_client=create_fake_client(server=fakeredis.FakeServer()))
+    gateway = stub_gateway(app, cache=cache, metrics=metrics)
+    request = dict(tool="chat", max_tokens=64, temperature=0, messages=[{"role": "user", "content": "Which ID do I need?"}])
+
+    replies = await asyncio.gather(*(gateway.complete(**request) for _ in range(5)))
+    assert len(set(replies)) == 1 and len(app.state.calls) == 1
+    assert sorted(event[1] for event in metrics.events) == ["coalesced"] * 4 + ["miss"]
+
+    # Invalidation through the CacheManager reaches the gateway: no second in-process copy
+    await cache.clear_pattern("llm:chat:*")
+    metrics.events.clear()
+    await gateway.complete(**request)
+    assert [event[1] for event in metrics.events] == ["miss"]
+    assert len(app.state.calls) == 2
+
+@pytest.mark.asyncio
+async def test_sampled_requests_bypass_the_cache(stub_gateway):
+    app = create_stub_app()
+    metrics = RecordingMetrics()
+    cache = CacheManager(redis_client=create_fake_client(server=fakeredis.FakeServer()))
+    gateway = stub_gateway(app, cache=cache, metrics=metrics)
+
+    for _ in range(2):
+        await gateway.complete(tool="chat", max_tokens=64, messages=[{"role": "user", "content": "Hi"}])
+
+    assert len(app.state.calls) == 2
+    assert [event[1] for event in metrics.events] == ["bypass", "bypass"]
+
+def test_cache_key_is_canonical():
+    a = {"model": "m", "temperature": 0, "max_tokens": 10, "messages": [{"role": "user", "content": "x"}]}
+    b = {"messages": [{"content": "x", "role": "user"}], "max_tokens": 10, "temperature": 0, "model": "m"}
+
+    assert llm_cache_key("chat", a, "1") == llm_cache_key("chat", {**b, "timeout": 5}, "1")
+    assert llm_cache_key("chat", a, "1") != llm_cache_key("chat", {**a, "max_tokens": 11}, "1")
+    assert llm_cache_key("chat", a, "1") != llm_cache_key("risk_insights", a, "1")
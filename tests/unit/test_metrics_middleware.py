@@ -0,0 +1,98 @@
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+from prometheus_client import CollectorRegistry
+from src.monitoring.metrics import MetricsCollector
+from src.monitoring.middleware import MetricsMiddleware
+
+def make_app(max_endpoints=None):
+    metrics = MetricsCollector(registry=CollectorRegistry(), max_endpoints=max_endpoints)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+
+    @app.get("/mcp/jobs/{job_id}")
+    async def get_job(job_id: str):
+        if job_id == "missing":
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"job_id": job_id}
+
+    @app.post("/mcp/tools/chat")
+    async def chat():
+        return {"response": "hi"}
+
+    @app.post("/mcp/tools/chat/stream")
+    async def chat_stream():
+        return {"response": "hi"}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app, metrics
+
+def sample(metrics, name, **labels):
+    return metrics.registry.get_sample_value(name, labels) or 0.0
+
+def client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False),
+                             base_url="http://test")
+
+@pytest.mark.asyncio
+async def test_requests_are_labelled_by_route_template():
+    app, metrics = make_app()
+    async with client(app) as http:
+        for job_id in ("a", "b", "c"):
+            assert (await http.get(f"/mcp/jobs/{job_id}")).status_code == 200
+        assert (await http.get("/mcp/jobs/missing")).status_code == 404
+
+    assert sample(metrics, "http_requests_total",
+                  method="GET", endpoint="/mcp/jobs/{job_id}", status_code="200") == 3
+    assert sample(metrics, "http_requests_total",
+                  method="GET", endpoint="/mcp/jobs/{job_id}", status_code="404") == 1
+    assert sample(metrics, "http_requests_total",
+                  method="GET", endpoint="/mcp/jobs/a", status_code="200") == 0
+
+@pytest.mark.asyncio
+async def test_unmatched_paths_share_one_series():
+    app, metrics = make_app()
+    async with client(app) as http:
+        for i in range(20):
+            assert (await http.get(f"/wp-admin/{i}.php")).status_code == 404
+
+    assert sample(metrics, "http_requests_total",
+                  method="GET", endpoint="unmatched", status_code="404") == 20
+    endpoints = {s.labels["endpoint"] for m in metrics.registry.collect()
+                 if m.name == "http_requests" for s in m.samples}
+    assert endpoints == {"unmatched"}
+
+@pytest.mark.asyncio
+async def test_latency_histogram_per_tool():
+    app, metrics = make_app()
+    async with client(app) as http:
+        await http.post("/mcp/tools/chat")
+        await http.post("/mcp/tools/chat/stream")
+        await http.get("/mcp/jobs/a")
+
+    assert sample(metrics, "http_request_duration_seconds_count", tool="chat") == 2
+    assert sample(metrics, "http_request_duration_seconds_count", tool="none") == 1
+    assert sample(metrics, "http_request_duration_seconds_bucket", tool="chat", le="120.0") == 2
+
+@pytest.mark.asyncio
+async def test_unhandled_error_recorded_as_500():
+    app, metrics = make_app()
+    async with client(app) as http:
+        assert (await http.get("/boom")).status_code == 500
+
+    assert sample(metrics, "http_requests_total", method="GET", endpoint="/boom", status_code="500") == 1
+
+def test_endpoint_label_cap():
+    metrics = MetricsCollector(registry=CollectorRegistry(), max_endpoints=2)
+    for i in range(5):
+        metrics.record_request("GET", f"/route/{i}", 200, 0.01)
+    for i in range(50):
+        metrics.record_request(f"BREW{i}", "/route/0", 200, 0.01)
+
+    assert sample(metrics, "http_requests_total", method="GET", endpoint="/route/1", status_code="200") == 1
+    assert sample(metrics, "http_requests_total", method="GET", endpoint="other", status_code="200") == 3
+    assert sample(metrics, "http_requests_total", method="OTHER", endpoint="/route/0", status_code="200") == 50
+    assert len(metrics._request_series) == 3
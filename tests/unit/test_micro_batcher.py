@@ -0,0 +1,88 @@
+import asyncio
+import numpy as np
+import pytest
+import time
+from src.utils.micro_batcher import MicroBatcher, MicroBatcherClosedError
+
+@pytest.mark.asyncio
+async def test_concurrent_rows_are_scored_in_one_batch():
+    batch_sizes = []
+
+    def predict(matrix):
+        batch_sizes.append(len(matrix))
+        return matrix.sum(axis=1)
+
+    batcher = MicroBatcher(predict, max_batch_size=64, max_wait=0.01)
+    try:
+        scores = await asyncio.gather(*(batcher.submit([i, 1.0]) for i in range(20)))
+    finally:
+        await batcher.close()
+
+    assert scores == [i + 1.0 for i in range(20)]
+    assert batch_sizes == [20]
+
+@pytest.mark.asyncio
+async def test_batches_are_capped_and_errors_reach_every_caller():
+    def predict(matrix):
+        if len(matrix) > 4:
+            raise AssertionError("batch too large")
+        raise ValueError("model not fitted")
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait=0.01)
+    try:
+        results = await asyncio.gather(*(batcher.submit([1.0]) for i in range(10)), return_exceptions=True)
+    finally:
+        await batcher.close()
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+@pytest.mark.asyncio
+async def test_submit_many_returns_scores_in_order():
+    batcher = MicroBatcher(lambda matrix: matrix[:, 0] * 2, max_batch_size=8, max_wait=0.001)
+    try:
+        small = await batcher.submit_many([[1.0], [2.0], [3.0]])
+        large = await batcher.submit_many([[float(i)] for i in range(100)])
+    finally:
+        await batcher.close()
+
+    assert small.tolist() == [2.0, 4.0, 6.0]
+    assert np.allclose(large, np.arange(100) * 2)
+
+@pytest.mark.asyncio
+async def test_close_finishes_running_batch_and_fails_queued_rows():
+    def predict(matrix):
+        time.sleep(0.1)
+        return matrix[:, 0]
+
+    batcher = MicroBatcher(predict, max_batch_size=2, max_wait=0.001, max_inflight_batches=1)
+    submitted = [asyncio.create_task(batcher.submit([float(i)])) for i in range(6)]
+    await asyncio.sleep(0.02)
+    await batcher.close()
+    results = await asyncio.gather(*submitted, return_exceptions=True)
+
+    assert results[:2] == [0.0, 1.0]
+    assert all(isinstance(result, MicroBatcherClosedError) for result in results[2:])
+
+@pytest.mark.asyncio
+async def test_dead_collector_fails_its_queued_rows_and_is_replaced(monkeypatch, caplog):
+    batcher = MicroBatcher(lambda matrix: matrix[:, 0], max_batch_size=1, max_wait=0.001)
+    original = batcher._gather_batch
+    calls = []
+
+    async def gather_once_then_crash(batch, deadline):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("collector bug")
+        await original(batch, deadline)
+
+    monkeypatch.setattr(batcher, "_gather_batch", gather_once_then_crash)
+    try:
+        first = await asyncio.gather(*(batcher.submit([float(i)]) for i in range(3)), return_exceptions=True)
+        await asyncio.sleep(0)
+        assert isinstance(first[0], RuntimeError)
+        assert await batcher.submit([7.0]) == 7.0
+        assert all(isinstance(result, MicroBatcherClosedError) for result in first[1:])
+    finally:
+        await batcher.close()
+
+    assert "Micro-batch collector died" in caplog.text
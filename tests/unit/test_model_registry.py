@@ -0,0 +1,96 @@
+import asyncio
+import threading
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from src.tools.risk_predictor import RiskPredictorTool
+from src.utils.model_registry import LoadedModel, ModelRegistry, ShadowScorer
+from src.utils.tree_ensemble import NODE_ARRAYS
+
+def fitted(flip=False):
+    X = np.array([[0.0], [1.0], [2.0], [3.0]])
+    y = np.array([1, 1, 0, 0]) if flip else np.array([0, 0, 1, 1])
+    return LogisticRegression().fit(X, y)
+
+def test_publish_and_hot_swap(tmp_path):
+    writer = ModelRegistry(root=str(tmp_path))
+    reader = ModelRegistry(root=str(tmp_path))
+    v1 = writer.publish(fitted(), version="v1")
+    assert reader.refresh() and reader.active.version == v1
+    serving = reader.active
+
+    writer.publish(fitted(flip=True), version="v2")
+    assert reader.refresh() and reader.active.version == "v2"
+    # A request that captured the old model keeps using it
+    assert serving.model.predict([[3.0]])[0] == 1
+    assert reader.active.model.predict([[3.0]])[0] == 0
+
+    # Dropping the pointer or publishing a broken version keeps the current model
+    writer.set_pointer("active", None)
+    assert not reader.refresh() and reader.active.version == "v2"
+    (tmp_path / "v3").mkdir()
+    (tmp_path / "v3" / "model.joblib").write_bytes(b"not a model")
+    (tmp_path / "ACTIVE").write_text("v3")
+    reader.refresh()
+    assert reader.active.version == "v2"
+
+@pytest.mark.asyncio
+async def test_schema_mismatch_is_rejected_and_candidate_is_shadow_scored(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_REGISTRY_DIR", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    tool = RiskPredictorTool()
+    profiles = [{"annual_income": i * 1000, "sanctions_match": i % 2} for i in range(40)]
+    labels = [i % 2 for i in range(40)]
+    tool.train(profiles, labels)
+    active = tool.registry.active.version
+
+    tool.registry.publish(fitted(), version="wrong-schema", metadata={"feature_schema": "other"})
+    tool.registry.refresh()
+    assert tool.registry.active.version == active
+
+    tool.train(profiles, [1 - label for label in labels], stage="candidate")
+    candidate = tool.registry.candidate.version
+    try:
+        result = await tool.execute_many({"client_profiles": profiles})
+        assert result["status"] == "success"
+        for _ in range(100):
+            if tool.shadow.stats().get(candidate, {}).get("rows"):
+                break
+            await asyncio.sleep(0.01)
+        status = tool.model_status()
+        assert status["active"] == active and status["candidate"] == candidate
+        assert status["shadow"][candidate]["rows"] == 40
+        assert status["shadow"][candidate]["mean_abs_diff"] > 0.5
+    finally:
+        await tool.close()
+
+def test_compiled_forest_is_memory_mapped(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_REGISTRY_DIR", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    writer, reader = RiskPredictorTool(), RiskPredictorTool()
+    profiles = [{"annual_income": i * 1000, "sanctions_match": i % 2} for i in range(40)]
+    writer.train(profiles, [i % 2 for i in range(40)])
+
+    loaded = reader.load_or_train_model()
+    assert loaded.compiled is not None
+    for name in NODE_ARRAYS:
+        assert isinstance(getattr(loaded.compiled, name), np.memmap), name
+    features = reader.feature_extractor.extract_many(profiles)
+    np.testing.assert_allclose(
+        loaded.compiled.predict_proba(features), loaded.model.predict_proba(features))
+
+def test_shadow_scorer_drops_when_backlogged():
+    gate = threading.Event()
+
+    def slow_predict(loaded, features):
+        gate.wait(5)
+        return features[:, 0]
+
+    scorer = ShadowScorer(slow_predict, max_pending=1)
+    candidate = LoadedModel("slow", None, {})
+    features = np.zeros((3, 1))
+    assert scorer.submit(candidate, features, features[:, 0])
+    assert not scorer.submit(candidate, features, features[:, 0])
+    gate.set()
+    scorer.shutdown()
+    assert scorer.stats()["slow"]["dropped_rows"] == 3
@@ -0,0 +1,69 @@
+import asyncio
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from PIL import Image, ImageDraw
+from src.utils import ocr
+from src.utils.ocr import OCREngine, OCRQueueFullError, preprocess_image
+
+def scanned_page(width=3000, height=4000):
+    image = Image.new("RGB", (width, height), (235, 230, 220))
+    draw = ImageDraw.Draw(image)
+    for row in range(20):
+        draw.text((100, 100 + row * 150), "ACCOUNT HOLDER STATEMENT", fill=(40, 40, 40))
+    return image
+
+def test_preprocess_downscales_and_binarizes():
+    image = preprocess_image(scanned_page(), max_dimension=1000)
+
+    assert max(image.size) == 1000
+    assert image.mode == "1"
+
+@pytest.mark.asyncio
+async def test_ocr_rejects_work_beyond_queue_limit(tmp_path):
+    engine = OCREngine(max_workers=1, max_queue=1, cache_dir=str(tmp_path))
+    engine._admitted = 2
+
+    with pytest.raises(OCRQueueFullError):
+        await engine.ocr_image(str(tmp_path / "id.png"), "digest")
+
+@pytest.mark.asyncio
+async def test_timed_out_page_keeps_its_slot_until_the_worker_finishes(tmp_path, monkeypatch):
+    engine = OCREngine(max_workers=1, max_queue=1, cache_dir=str(tmp_path), timeout=0.05)
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(engine, "_get_executor", lambda: executor)
+    monkeypatch.setattr(ocr, "ocr_page", lambda *args: time.sleep(0.3) or "text")
+
+    with pytest.raises(asyncio.TimeoutError):
+        await engine.ocr_image(str(tmp_path / "id.png"), "digest")
+    assert engine._admitted == 1 and engine._semaphore.locked()
+
+    await asyncio.sleep(0.4)
+    assert engine._admitted == 0 and not engine._semaphore.locked()
+    executor.shutdown()
+
+def test_prune_image_cache_keeps_newest(tmp_path):
+    engine = OCREngine(cache_dir=str(tmp_path), max_cached_images=2)
+    for i in range(4):
+        (tmp_path / f"page-{i}.png").write_bytes(b"png")
+
+    assert engine.prune_image_cache() == 2
+    assert len(list(tmp_path.iterdir())) == 2
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(shutil.which("tesseract") is None, reason="tesseract not installed")
+async def test_ocr_image_recognizes_text_and_caches_preprocessed_image(tmp_path):
+    path = tmp_path / "passport.png"
+    image = Image.new("L", (1200, 300), 255)
+    ImageDraw.Draw(image).text((50, 100), "PASSPORT", fill=0)
+    image.resize((2400, 600)).save(path)
+    engine = OCREngine(max_workers=1, cache_dir=str(tmp_path / "cache"))
+
+    try:
+        text = await engine.ocr_image(str(path), "digest")
+    finally:
+        engine.shutdown()
+
+    assert "PASSPORT" in text.upper()
+    assert len(list((tmp_path / "cache").iterdir())) == 1
@@ -0,0 +1,79 @@
+import random
+import pytest
+from prometheus_client import CollectorRegistry
+from src.monitoring.metrics import MetricsCollector
+from src.monitoring.windows import SlidingWindowStats
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_quantiles_within_bin_error():
+    rng = random.Random(7)
+    clock = Clock()
+    stats = SlidingWindowStats(clock=clock)
+    durations = [rng.lognormvariate(-3, 1) for _ in range(5000)]
+    for d in durations:
+        stats.record("chat", d, 200)
+    clock.now += 30
+
+    result = stats.stats("chat", "1m")
+    durations.sort()
+    for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        exact = durations[int(q * len(durations)) - 1]
+        assert result[name] == pytest.approx(exact, rel=0.05)
+    assert result["requests"] == 5000
+    assert result["throughput"] == pytest.approx(5000 / 30)
+    assert result["mean"] == pytest.approx(sum(durations) / len(durations))
+
+def test_old_requests_leave_the_window():
+    clock = Clock()
+    stats = SlidingWindowStats(clock=clock)
+    for _ in range(10):
+        stats.record("predict_risk", 0.5, 503)
+    clock.now += 120
+    for _ in range(30):
+        stats.record("predict_risk", 0.01, 200)
+
+    one_minute = stats.stats("predict_risk", "1m")
+    assert one_minute["requests"] == 30
+    assert one_minute["error_rate"] == 0.0
+    five_minutes = stats.stats("predict_risk", "5m")
+    assert five_minutes["requests"] == 40
+    assert five_minutes["error_rate"] == pytest.approx(0.25)
+    assert five_minutes["p99"] == pytest.approx(0.5, rel=0.05)
+
+    clock.now += 3600
+    assert stats.stats("predict_risk", "1h")["requests"] == 0
+    assert stats.stats("predict_risk", "1h")["p50"] is None
+
+def test_all_aggregates_every_tool():
+    stats = SlidingWindowStats(clock=Clock())
+    stats.record("chat", 1.0, 200)
+    stats.record("analyze_document", 2.0, 500)
+
+    snapshot = stats.snapshot()
+    assert set(snapshot) == {"1m", "5m", "1h"}
+    assert set(snapshot["5m"]) == {"all", "analyze_document", "chat"}
+    assert snapshot["5m"]["all"]["requests"] == 2
+    assert snapshot["5m"]["all"]["error_rate"] == 0.5
+
+@pytest.mark.asyncio
+async def test_dashboard_reports_recorded_requests():
+    metrics = MetricsCollector(registry=CollectorRegistry())
+    assert (await metrics.get_dashboard_data())["success_rate"] is None
+
+    metrics.document_processed.inc(3)
+    metrics.active_sessions.set(2)
+    for status in (200, 200, 200, 500):
+        metrics.record_request("POST", "/mcp/tools/chat", status, 0.2, tool="chat")
+
+    data = await metrics.get_dashboard_data()
+    assert data["documents_processed"] == 3
+    assert data["active_sessions"] == 2
+    assert data["success_rate"] == 0.75
+    assert data["avg_processing_time"] == pytest.approx(0.2)
+    assert data["requests"]["1m"]["chat"]["requests"] == 4
@@ -0,0 +1,105 @@
+import asyncio
+import fakeredis
+import pytest
+from tests.fixtures.stub_llm_server import create_app as create_stub_app
+from src.tools.conversational_assistant import ConversationalOnboardingTool
+from src.utils.cache import CacheManager, create_fake_client
+from src.utils.streaming import StreamStalled, encode_event, relay
+
+class Source:
+    def __init__(self, count=None, delay=0.0):
+        self.count = count
+        self.delay = delay
+        self.sent = 0
+        self.closed = False
+
+    async def __aiter__(self):
+        try:
+            while self.count is None or self.sent < self.count:
+                await asyncio.sleep(self.delay)
+                self.sent += 1
+                yield f"t{self.sent} "
+        finally:
+            self.closed = True
+
+    def iterate(self):
+        return self.__aiter__()
+
+@pytest.mark.asyncio
+async def test_relay_coalesces_for_slow_readers():
+    source = Source(count=20)
+    chunks = []
+    async for chunk in relay(source.iterate()):
+        chunks.append(chunk)
+        await asyncio.sleep(0.01)
+
+    assert "".join(chunks) == "".join(f"t{i} " for i in range(1, 21))
+    assert len(chunks) < 20
+
+@pytest.mark.asyncio
+async def test_relay_gives_up_on_a_stalled_reader():
+    source = Source()
+    stream = relay(source.iterate(), max_pending=4, stall_timeout=0.05)
+    await stream.__anext__()
+    await asyncio.sleep(0.2)
+
+    with pytest.raises(StreamStalled):
+        async for _ in stream:
+            pass
+    assert source.closed and source.sent <= 5
+
+@pytest.mark.asyncio
+async def test_source_timeouts_are_not_reported_as_stalls():
+    async def timing_out():
+        yield "t1 "
+        raise TimeoutError("upstream read timed out")
+
+    with pytest.raises(TimeoutError, match="upstream") as raised:
+        async for _ in relay(timing_out()):
+            pass
+    assert not isinstance(raised.value, StreamStalled)
+
+@pytest.mark.asyncio
+async def test_closing_the_relay_closes_the_source():
+    source = Source(delay=0.001)
+    stream = relay(source.iterate())
+    await stream.__anext__()
+    await stream.aclose()
+
+    assert source.closed
+    sent = source.sent
+    await asyncio.sleep(0.02)
+    assert source.sent == sent
+
+def test_event_encoding():
+    assert encode_event("sse", "token", {"text": "hi"}) == 'event: token\ndata: {"text": "hi"}\n\n'
+    assert encode_event("ndjson", "done", {}) == '{"event": "done"}\n'
+
+@pytest.mark.asyncio
+async def test_chat_streams_through_the_gateway_and_fills_the_cache(stub_gateway):
+    app = create_stub_app()
+    cache = CacheManager(redis_client=create_fake_client(server=fakeredis.FakeServer()))
+    gateway = stub_gateway(app, cache=cache)
+    tool = ConversationalOnboardingTool(llm=gateway)
+    request = {"message": "What does Jane Tan need to provide?", "client_id": "c1"}
+
+    pieces = [text async for text in tool.stream(request)]
+    replayed = [text async for text in tool.stream(request)]
+    reply = (await tool.execute(request))["response"]
+
+    assert len(pieces) > 1 and app.state.calls[0]["stream"] is True
+    assert replayed == ["".join(pieces)] == [reply]
+    assert len(app.state.calls) == 1
+
+@pytest.mark.asyncio
+async def test_abandoned_stream_frees_its_slot(stub_gateway):
+    app = create_stub_app()
+    gateway = stub_gateway(app, max_concurrency=1)
+    tool = ConversationalOnboardingTool(llm=gateway)
+
+    stream = tool.stream({"message": "Hello", "client_id": "c1"})
+    await stream.__anext__()
+    await stream.aclose()
+
+    assert gateway.stats()["models"][gateway.default_model]["in_flight"] == 0
+    assert [text async for text in tool.stream({"message": "Hello again", "client_id": "c1"})]
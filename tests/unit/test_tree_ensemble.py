@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+from src.tools.risk_predictor import RiskPredictorTool
+from src.utils.tree_ensemble import export_forest
+
+def dataset(n_classes=2, missing=False, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(600, 12)).astype(np.float32)
+    y = np.digitize(X[:, 0] + X[:, 1] * X[:, 2], np.linspace(-1, 1, n_classes - 1))
+    if missing:
+        X[rng.random(X.shape) < 0.1] = np.nan
+    return X, y
+
+@pytest.mark.parametrize("model,n_classes,missing", [
+    (RandomForestClassifier(n_estimators=25, random_state=0), 2, False),
+    (RandomForestClassifier(n_estimators=25, max_depth=4, random_state=0), 2, True),
+    (RandomForestClassifier(n_estimators=10, class_weight="balanced", random_state=0), 3, False),
+    (ExtraTreesClassifier(n_estimators=25, random_state=0), 2, False),
+    (DecisionTreeClassifier(random_state=0), 3, True),
+])
+def test_flat_forest_matches_sklearn(model, n_classes, missing):
+    X, y = dataset(n_classes, missing)
+    model.fit(X, y)
+    forest = export_forest(model)
+    X_test, _ = dataset(n_classes, missing, seed=1)
+
+    expected = model.predict_proba(X_test)
+    assert np.allclose(forest.predict_proba(X_test), expected, rtol=0, atol=1e-12)
+    assert np.allclose(forest.predict_proba(X_test[0]), expected[:1], rtol=0, atol=1e-12)
+    forest.row_chunk = 7
+    assert np.allclose(forest.predict_proba(X_test), expected, rtol=0, atol=1e-12)
+    assert list(forest.classes_) == list(model.classes_)
+
+def test_unsupported_models_are_rejected():
+    X, y = dataset()
+    with pytest.raises(ValueError):
+        export_forest(RandomForestClassifier())
+    with pytest.raises(ValueError):
+        export_forest(GradientBoostingClassifier(n_estimators=5).fit(X, y))
+    with pytest.raises(ValueError, match="features"):
+        export_forest(DecisionTreeClassifier().fit(X, y)).predict_proba(X[:, :5])
+
+def test_risk_predictor_scores_with_compiled_forest(tmp_path, monkeypatch):
+    monkeypatch.setenv("MODEL_REGISTRY_DIR", str(tmp_path))
+    tool = RiskPredictorTool()
+    profiles = [{"annual_income": i * 1000, "is_pep": i % 3 == 0} for i in range(60)]
+    tool.train(profiles, [int(i % 3 == 0) for i in range(60)])
+    loaded = tool.registry.active
+
+    assert loaded.compiled is not None
+    features = tool.feature_extractor.extract_many(profiles)
+    assert np.allclose(tool.predict_batch(features[:4]), loaded.model.predict_proba(features[:4])[:, 1])